@@ -1,13 +1,25 @@
 
 #### mini dashboard
 
-import yfinance as yf
-import pandas as pd
+import os
+import json
+from functools import cache
 import numpy as np
-import plotly.graph_objs as go
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, MATCH, ALL, ClientsideFunction
+from dash.exceptions import PreventUpdate
+from flask import jsonify
 import dash_bootstrap_components as dbc
+from pipeline import build_snapshot, portfolio_snapshot, series_figure, rolling_payload, period_stats, period_correlation_figure, relative_metrics, has_benchmark, ROLLING_WINDOW, figure_builders, ticker_figures, intraday_figure, whatif_moments, WHATIF_WINDOWS, tickers, weights, config, kpi_tickers, kpi_colors, pastel_colors, SHARED_DIR
+from loader import BackgroundLoader, market_hours_interval
+from streaming import stream_from_config
+from portfolio import weight_metrics
+from payload_cache import PayloadCache, install as install_payload_cache
+from callback_cache import CallbackCache
+import instrumentation
+import snapshot_artifact
+import tenants
+from tenants import PortfolioStore, TTLCache
 
 # Initialize app
 app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -16,115 +28,65 @@ app.title = "Mini Dashboard"
 
 
 
-# --- Utility Function ---
-def get_live_data():
-    tickers = ['JPM', 'NFLX', 'BA']
-    weights = [0.4, 0.3, 0.3]
-
-    raw_data = yf.download(tickers, period="10y", interval="1d", group_by='ticker', auto_adjust=True)
-
-    if isinstance(raw_data.columns, pd.MultiIndex):
-        price_data = pd.concat([raw_data[ticker]["Close"] for ticker in tickers], axis=1)
-        price_data.columns = tickers
-    else:
-        price_data = raw_data['Close']
-
-    price_data = price_data.dropna()
-    returns = price_data.pct_change().dropna()
-    cumulative_returns = (1 + returns).cumprod()
-    portfolio_prices = (price_data * weights).sum(axis=1)
-    portfolio_returns = portfolio_prices.pct_change().dropna()
-    portfolio_cumulative = (1 + portfolio_returns).cumprod()
-    drawdowns = cumulative_returns / cumulative_returns.cummax() - 1
-
-    latest_prices = price_data.iloc[-1]
-    daily_returns = returns.iloc[-1]
-    cumulative_returns_latest = cumulative_returns.iloc[-1]
-
-    return (
-        latest_prices, daily_returns, cumulative_returns, cumulative_returns_latest,
-        portfolio_cumulative, drawdowns, returns, price_data,
-        portfolio_prices, portfolio_returns
-    )
-
-(
-    latest_prices, daily_returns, cumulative_returns, cumulative_returns_latest,
-    portfolio_cumulative, drawdowns, returns, price_data,
-    portfolio_prices, portfolio_returns
-) = get_live_data()
-
-# 💡 Define rolling metrics cleanly here
-rolling_volatility = returns.rolling(window=30).std()
-rolling_volatility["Portfolio"] = portfolio_returns.rolling(window=30).std()
-
-rolling_sharpe = returns.rolling(window=30).mean() / returns.rolling(window=30).std()
-rolling_sharpe["Portfolio"] = portfolio_returns.rolling(window=30).mean() / portfolio_returns.rolling(window=30).std()
-
-rolling_var = returns.rolling(window=30).quantile(0.05)
-rolling_var["Portfolio"] = portfolio_returns.rolling(window=30).quantile(0.05)
-
-# Optional: precompute current + avg for KPIs
-latest_vol = rolling_volatility.iloc[-1]
-avg_vol = rolling_volatility.mean()
-
-latest_sharpe = rolling_sharpe.iloc[-1]
-avg_sharpe = rolling_sharpe.mean()
-
-latest_var = rolling_var.iloc[-1]
-avg_var = rolling_var.mean()
-
-
-
-
-# --- Color Themes ---
-kpi_colors = ["#364c84", "#95b1ee", "#fffdf5"]
-pastel_colors = ["#364c84", "#95b1ee", "#fffdf5"]
-ticker_colors = {
-    "JPM": "#b8b8f3",
-    "NFLX": "#7db9e8",
-    "BA": "#003f5c" }
-ticker_fillcolors = {
-    "JPM": "rgba(184, 184, 243, 0.2)",
-    "NFLX": "rgba(125, 185, 232, 0.2)",
-    "BA": "rgba(0, 63, 92, 0.2 )"
-}
-rolling_colors = {
-    "JPM": "#b8b8f3",
-    "NFLX": "#7db9e8",
-    "BA": "#003f5c",
-    "Portfolio": "#111111"
-}
-rolling_fillcolors = {
-    "JPM": "rgba(184, 184, 243, 0.2)",
-    "NFLX": "rgba(125, 185, 232, 0.2)",
-    "BA": "rgba(0, 63, 92, 0.2)",
-    "Portfolio": "rgba(0, 0, 0, 0.1)"
-}
-
-tickers = ['JPM', 'NFLX', 'BA']
-weights = [0.4, 0.3, 0.3]
-
-def calculate_drawdowns(cumulative_returns):
-    return (cumulative_returns / cumulative_returns.cummax()) - 1
-
 # --- KPI Cards ---
-def kpi_card(title, value, color):
+def kpi_card(title, value, color, value_id=None):
     return dbc.Card([
         dbc.CardBody([
             html.H6(title, className="card-title text-center mb-2"),
-            html.H4(value, className="card-text text-center")
+            html.H4(value, className="card-text text-center", **({"id": value_id} if value_id else {}))
         ])
     ], style={"backgroundColor": color, "border": "none", "borderRadius": "10px"})
 
-def generate_price_kpis():
+def kpi_width():
+    return max(2, 12 // len(kpi_tickers()))
+
+def weights_text(weights, separator=", "):
+    shown = [f"{t}: {weights[tickers.index(t)]:.0%}" for t in kpi_tickers()]
+    if len(shown) < len(tickers):
+        shown.append(f"and {len(tickers) - len(shown)} more")
+    return separator.join(shown)
+
+def universe_text():
+    # "3 stocks: JPM, NFLX and BA", listing the KPI tickers of a large universe
+    shown = kpi_tickers()
+    rest = len(tickers) - len(shown)
+    if rest:
+        listed = ", ".join(shown) + f" and {rest} more"
+    else:
+        listed = " and ".join([", ".join(shown[:-1]), shown[-1]]) if len(shown) > 1 else shown[0]
+    return f"{len(tickers)} stock{'s' if len(tickers) != 1 else ''}: {listed}"
+
+PERIOD_UNITS = {"d": "day", "wk": "week", "mo": "month", "y": "year"}
+
+def period_text(period):
+    # The configured yfinance period ("10y", "6mo", "ytd", "max") in words
+    if period == "ytd":
+        return "the year to date"
+    if period == "max":
+        return "the full available history"
+    count = period.rstrip("dwkmoy")
+    unit = period[len(count):]
+    if not count.isdigit() or unit not in PERIOD_UNITS:
+        return f"the period {period}"
+    return f"the past {PERIOD_UNITS[unit]}" if int(count) == 1 else f"the past {count} {PERIOD_UNITS[unit]}s"
+
+def rebalance_text(s):
+    if s.rebalance == "none":
+        return "buy and hold"
+    if s.rebalance == "threshold":
+        return f"rebalanced when a weight drifts {s.rebalance_threshold:.0%}"
+    return f"rebalanced {s.rebalance}"
+
+def generate_price_kpis(s):
     return dbc.Row([
-        dbc.Col(kpi_card(f"{ticker} Price", f"${latest_prices[ticker]:.2f}", kpi_colors[i]), width=4)
-        for i, ticker in enumerate(tickers)
+        dbc.Col(kpi_card(f"{ticker} Price", f"${s.latest_prices[ticker]:.2f}", kpi_colors[i % len(kpi_colors)],
+                         value_id={"type": "live-price", "ticker": ticker}), width=kpi_width())
+        for i, ticker in enumerate(kpi_tickers())
     ], justify="between", className="mb-4")
 
-def return_kpi_group(ticker, color):
-    cum_return = cumulative_returns_latest[ticker]
-    daily_return = daily_returns[ticker]
+def return_kpi_group(s, ticker, color):
+    cum_return = s.cumulative_returns_latest[ticker]
+    daily_return = s.daily_returns[ticker]
     return dbc.Card([
         dbc.CardBody([
             html.H6(f"{ticker} Returns", className="card-title text-center"),
@@ -133,29 +95,20 @@ def return_kpi_group(ticker, color):
         ])
     ], style={"backgroundColor": color, "border": "none", "borderRadius": "10px", "marginBottom": "20px", "height": "170px"})
 
-def stacked_return_kpis():
+def stacked_return_kpis(s):
     return dbc.Col([
-        return_kpi_group(tickers[0], pastel_colors[0]),
-        return_kpi_group(tickers[1], pastel_colors[1]),
-        return_kpi_group(tickers[2], pastel_colors[2])
+        return_kpi_group(s, ticker, pastel_colors[i % len(pastel_colors)])
+        for i, ticker in enumerate(kpi_tickers())
     ], width=2)
 
-def generate_metrics_horizontal_kpis():
-    return dbc.Row([
-        dbc.Col(kpi_card(
-            f"{ticker} Cumulative Return",
-            f"{(cumulative_returns_latest[ticker] - 1) * 100:.2f}%",
-            pastel_colors[i]
-        ), width=4)
-        for i, ticker in enumerate(tickers)
-    ], justify="between", className="mb-4")
-
-def return_kpi_group(ticker, color):
+def metrics_kpi_group(s, ticker, color):
     return dbc.Card([
         dbc.CardBody([
             html.H6(f"{ticker} Metrics", className="card-title text-center"),
-            html.P(f"Adj Close: ${latest_prices[ticker]:.2f}", className="card-text text-center mb-2"),
-            html.P(f"Drawdown: {drawdowns[ticker].iloc[-1] * 100:.2f}%", className="card-text text-center")
+            html.P(f"Adj Close: ${s.latest_prices[ticker]:.2f}", className="card-text text-center mb-2",
+                   id={"type": "live-close", "ticker": ticker}),
+            html.P(f"Drawdown: {s.drawdowns[ticker].iloc[-1] * 100:.2f}%", className="card-text text-center",
+                   id={"type": "live-drawdown", "ticker": ticker})
         ])
     ], style={
         "backgroundColor": color,
@@ -166,36 +119,17 @@ def return_kpi_group(ticker, color):
         "width":"100%"
     })
 
-def generate_metrics_vertical_kpis():
-    return dbc.Col([
-        return_kpi_group(tickers[0], pastel_colors[0]),
-        return_kpi_group(tickers[1], pastel_colors[1]),
-        return_kpi_group(tickers[2], pastel_colors[2])
-    ], width=2, style={"paddingRight": "0", "marginRight":"0"})
-
-def generate_rolling_volatility_kpis(latest_vol, avg_vol, colors):
-    return dbc.Row([
-        dbc.Col(
-            dbc.Card([
-                dbc.CardBody([
-                    html.H6(f"{ticker} Rolling Volatility", className="card-title text-center"),
-                    html.P(f"Latest: {latest_vol[ticker]*100:.2f}%", className="card-text text-center mb-1"),
-                    html.P(f"Avg: {avg_vol[ticker]*100:.2f}%", className="card-text text-center")
-                ])
-            ], style={"backgroundColor": colors[i], "border": "none", "borderRadius": "10px"}),
-            width=4
-        )
-        for i, ticker in enumerate(tickers + ["Portfolio"])
-    ], className="mb-4", justify="between")
-
-def return_rolling_kpi_group(ticker, color):
+def return_rolling_kpi_group(s, ticker, color, stats=None):
+    # Averages over the selected period (the full history by default)
+    stats = stats or period_stats(s).query()
     try:
-        sharpe_avg = rolling_sharpe[ticker].mean()
-        sharpe_latest = rolling_sharpe[ticker].iloc[-1]
-        var_avg = rolling_var[ticker].mean() * 100
-        var_latest = rolling_var[ticker].iloc[-1] * 100
+        sharpe_avg = stats["rolling_sharpe"][ticker]
+        sharpe_latest = s.rolling_sharpe[ticker].iloc[-1]
+        var_avg = stats["rolling_var"][ticker] * 100
+        var_latest = s.rolling_var[ticker].iloc[-1] * 100
+        cvar_latest = s.rolling_cvar[ticker].iloc[-1] * 100
     except Exception as e:
-        sharpe_avg = sharpe_latest = var_avg = var_latest = None
+        sharpe_avg = sharpe_latest = var_avg = var_latest = cvar_latest = None
 
     return dbc.Card([
         dbc.CardBody([
@@ -203,194 +137,93 @@ def return_rolling_kpi_group(ticker, color):
             html.P(f"Sharpe Avg: {sharpe_avg:.2f}" if sharpe_avg is not None else "Sharpe Avg: N/A", className="card-text text-center"),
             html.P(f"Sharpe Latest: {sharpe_latest:.2f}" if sharpe_latest is not None else "Sharpe Latest: N/A", className="card-text text-center"),
             html.P(f"VaR Avg: {var_avg:.2f}%" if var_avg is not None else "VaR Avg: N/A", className="card-text text-center"),
-            html.P(f"VaR Latest: {var_latest:.2f}%" if var_latest is not None else "VaR Latest: N/A", className="card-text text-center")
+            html.P(f"VaR Latest: {var_latest:.2f}%" if var_latest is not None else "VaR Latest: N/A", className="card-text text-center"),
+            html.P(f"CVaR Latest: {cvar_latest:.2f}%" if cvar_latest is not None else "CVaR Latest: N/A", className="card-text text-center")
         ])
     ], style={
         "backgroundColor": color,
         "border": "none",
         "borderRadius": "10px",
         "marginBottom": "0px",
-        "height": "190px"
+        "height": "225px"
     })
 
-def stacked_rolling_return_kpis():
-    return dbc.Col([
-        return_rolling_kpi_group("JPM", pastel_colors[0]),
-        return_rolling_kpi_group("NFLX", pastel_colors[1]),
-        return_rolling_kpi_group("BA", pastel_colors[2]),
-        return_rolling_kpi_group("Portfolio", "#f4e2d8")
-    ], width=2, style={"paddingRight": "0", "marginRight":"0"})
-
-
-
-adjusted_close_figure = go.Figure()
-for ticker in tickers:
-    adjusted_close_figure.add_trace(go.Scatter(
-        x=price_data.index,
-        y=price_data[ticker],
-        name=ticker,
-        line=dict(width=3, color=ticker_colors[ticker]),
-        fill='tozeroy',
-        fillcolor=ticker_fillcolors[ticker]
-    ))
-adjusted_close_figure.update_layout(title=dict(text="Adjusted Close Prices", x=0.5, xanchor= 'center'), plot_bgcolor="#fffdf5", height = 350, margin=dict(l=10, r=10, t=40, b=10), legend=dict(x=0.15, y=1.00, orientation="h"))
-
-cumulative_returns_figure = go.Figure()
-for ticker in tickers:
-    cumulative_returns_figure.add_trace(go.Scatter(
-        x=cumulative_returns.index,
-        y=cumulative_returns[ticker],
-        name=ticker,
-        line=dict(width=3, color=ticker_colors[ticker]),
-        fill='tozeroy',
-        fillcolor=ticker_fillcolors[ticker]
-    ))
-cumulative_returns_figure.update_layout(title=dict(text="Cumulative Returns", x=0.5, xanchor='center'), plot_bgcolor="#fffdf5", height = 350, margin=dict(l=10, r=10, t=40, b=10), legend=dict(x=0.15, y=1.00, orientation="h"))
-
-drawdowns = calculate_drawdowns(cumulative_returns)
-drawdowns_figure = go.Figure()
-for ticker in tickers:
-    drawdowns_figure.add_trace(go.Scatter(
-        x=drawdowns.index,
-        y=drawdowns[ticker],
-        name=ticker,
-        line=dict(width=3, color=ticker_colors[ticker])
-    ))
-drawdowns_figure.update_layout(title=dict(text="Drawdowns", x=0.5, xanchor='center'),  plot_bgcolor="#fffdf5", height = 350, margin=dict(l=10, r=10, t=40, b=10), legend=dict(x=0.25, y=1.06, orientation="h"))
-
-correlation = returns.corr()
-correlation_figure = go.Figure(data=go.Heatmap(
-    z=correlation.values,
-    x=correlation.columns,
-    y=correlation.index,
-    colorscale='blues'
-))
-correlation_figure.update_layout(title=dict(text="Correlation Matrix", x=0.5, xanchor='center'), plot_bgcolor="#fffdf5", height = 350, margin=dict(l=10, r=10, t=40, b=10))
+def rolling_kpi_stack(s, stats=None):
+    return [
+        return_rolling_kpi_group(s, "Portfolio", "#f4e2d8", stats)
+    ] + [
+        return_rolling_kpi_group(s, ticker, pastel_colors[i % len(pastel_colors)], stats)
+        for i, ticker in enumerate(kpi_tickers())
+    ]
+
+def rolling_volatility_kpis(s, stats=None):
+    stats = stats or period_stats(s).query()
+    return [
+        dbc.Col(kpi_card(f"{ticker} Rolling Volatility",
+                         f"Avg: {stats['rolling_volatility'][ticker]:.2%} | Latest: {s.rolling_volatility[ticker].iloc[-1]:.2%}",
+                         pastel_colors[i % len(pastel_colors)]), width=kpi_width())
+        for i, ticker in enumerate(kpi_tickers())
+    ]
+
+# --- Date Range ---
+def period_picker(s):
+    # One id on every page that has it, remembered for the session, so the
+    # chosen period follows the user between pages
+    first, last = s.returns.index[0].date(), s.returns.index[-1].date()
+    return html.Div([
+        html.Span("Period: ", style={"fontWeight": "bold", "marginRight": "8px"}),
+        dcc.DatePickerRange(id="period-range", min_date_allowed=first, max_date_allowed=last,
+                            start_date=first, end_date=last, display_format="YYYY-MM-DD",
+                            persistence=True, persistence_type="session")
+    ], className="mb-3")
+
+def period_kpi_card(stats, ticker, color):
+    return dbc.Card([
+        dbc.CardBody([
+            html.H6(ticker, className="card-title text-center"),
+            html.P(f"Return: {stats['cumulative'][ticker]:.2%}", className="card-text text-center mb-1"),
+            html.P(f"Max Drawdown: {stats['max_drawdown'][ticker]:.2%}", className="card-text text-center mb-1"),
+            html.P(f"Volatility: {stats['volatility'][ticker]:.2%} | Sharpe: {stats['sharpe'][ticker]:.2f}",
+                   className="card-text text-center mb-0")
+        ])
+    ], style={"backgroundColor": color, "border": "none", "borderRadius": "10px"})
 
+def period_kpis(stats):
+    # Period return, max drawdown and daily volatility / Sharpe for the KPI tickers and the portfolio
+    if stats is None:
+        return html.P("No trading days in the selected period.", style={"color": "gray"})
+    shown = kpi_tickers()
+    width = max(2, 12 // (len(shown) + 1))
+    return html.Div([
+        dbc.Row([
+            dbc.Col(period_kpi_card(stats, ticker, pastel_colors[i % len(pastel_colors)]), width=width)
+            for i, ticker in enumerate(shown)
+        ] + [
+            dbc.Col(period_kpi_card(stats, "Portfolio", "#f4e2d8"), width=width)
+        ], justify="between", className="mb-2"),
+        html.P(f"* {stats['start']:%Y-%m-%d} to {stats['end']:%Y-%m-%d}, {stats['rows']} trading days",
+               style={"fontSize": "13px", "color": "gray"})
+    ], className="mb-3")
 
-# --- Portfolio Graph ---
-def portfolio_graph():
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=portfolio_cumulative.index,
-        y=portfolio_cumulative,
-        name='Portfolio',
-        line=dict(color='black', width=3),
-        fill='tozeroy',
-        fillcolor='rgba(0,0,0,0.05)'
-    ))
-    
-    
-    for i, ticker in enumerate(tickers):
-        fig.add_trace(go.Scatter(
-            x=cumulative_returns.index,
-            y=cumulative_returns[ticker],
-            name=ticker,
-            line=dict(width=2, color=ticker_colors[ticker])
-        ))
-    
-    ## 
-    
-
-
-    fig.update_layout(title=dict(text="Portfolio Performance", x=0.5), margin=dict(t=60, b=20), height=400, 
-        plot_bgcolor = "#fffdf5",
-        paper_bgcolor="#bcd3f9",
-        legend=dict(orientation="h", x=0.5, xanchor="center", y=0.99),template="plotly_white")
-    return dcc.Graph(figure=fig)
-
-rolling_vol_fig = go.Figure()
-for t in rolling_volatility.columns:
-    rolling_vol_fig.add_trace(go.Scatter(
-        x=rolling_volatility.index,
-        y=rolling_volatility[t],
-        name=t,
-        line=dict(color=rolling_colors[t], width=3),
-        fill='tozeroy',
-        fillcolor=rolling_fillcolors[t]
-    ))
-rolling_vol_fig.update_layout(
-    title=dict(text="30-Day Rolling Volatility", x=0.5),
-    plot_bgcolor="#fffdf5", margin=dict(l=10, r=10, t=40, b=10),
-    legend=dict(orientation="v", y=0.95, x=0.17, xanchor='center')
-)
 
-rolling_sharpe_fig = go.Figure()
-for t in rolling_sharpe.columns:
-    rolling_sharpe_fig.add_trace(go.Scatter(
-        x=rolling_sharpe.index,
-        y=rolling_sharpe[t],
-        name=t,
-        line=dict(color=rolling_colors[t], width=3),
-        fill='tozeroy'
-    ))
-rolling_sharpe_fig.update_layout(
-    title=dict(text="30-Day Rolling Sharpe Ratio", x=0.5),
-    plot_bgcolor="#fffdf5", margin=dict(l=10, r=10, t=40, b=10),
-    legend=dict(orientation="h", y=1.02, x=0.5, xanchor='center')
-)
 
-rolling_var_fig = go.Figure()
-for t in rolling_var.columns:
-    rolling_var_fig.add_trace(go.Scatter(
-        x=rolling_var.index,
-        y=rolling_var[t],
-        name=t,
-        line=dict(color=rolling_colors[t], width=3),
-        fill='tozeroy'
-    ))
-rolling_var_fig.update_layout(
-    title=dict(text="30-Day Rolling VaR (95%)", x=0.5),
-    plot_bgcolor="#fffdf5", margin=dict(l=10, r=10, t=40, b=10), height = 450,
-    legend=dict(orientation="v", y=0.06, x=0.17, xanchor='center')
-)
+# --- Graphs ---
+def series_graph(name):
+    # Rendered empty; the figure arrives in its own callback after the KPIs paint
+    return dcc.Loading(dcc.Graph(id={"type": "series-graph", "name": name}), type="circle")
 
-rolling_corr_fig = go.Figure()
-
-# Define the pairs
-correlation_pairs = [
-    ("JPM", "NFLX"),
-    ("JPM", "BA"),
-    ("NFLX", "BA"),
-    ("JPM", "Portfolio"),
-    ("NFLX", "Portfolio"),
-    ("BA", "Portfolio")
-]
-
-# Define custom line and fill colors
-pair_colors = {
-    ("JPM", "NFLX"): ("#b8b8f3", "rgba(184, 184, 243, 0.2)"),
-    ("JPM", "BA"): ("#7db9e8", "rgba(125, 185, 232, 0.2)"),
-    ("NFLX", "BA"): ("#003f5c", "rgba(0, 63, 92, 0.2)"),
-    ("JPM", "Portfolio"): ("#cc8963", "rgba(204, 137, 99, 0.2)"),
-    ("NFLX", "Portfolio"): ("#a1c181", "rgba(161, 193, 129, 0.2)"),
-    ("BA", "Portfolio"): ("#6f1d1b", "rgba(111, 29, 27, 0.2)")
-}
-
-# Loop through each pair and compute rolling correlation
-for t1, t2 in correlation_pairs:
-    series1 = returns[t1]
-    series2 = portfolio_returns if t2 == "Portfolio" else returns[t2]
-
-    rolling_corr = series1.rolling(30).corr(series2)
-
-    color, fill = pair_colors[(t1, t2)]
-    rolling_corr_fig.add_trace(go.Scatter(
-        x=rolling_corr.index,
-        y=rolling_corr,
-        name=f"{t1}–{t2}",
-        line=dict(color=color, width=2),
-        fill='tozeroy',
-        fillcolor=fill
-    ))
-
-# Layout
-rolling_corr_fig.update_layout(
-    title=dict(text="30-Day Rolling Correlation", x=0.5),
-    plot_bgcolor="#fffdf5",
-    legend=dict(orientation="h", y=0.15, x=0.5, xanchor='center'),
-    margin=dict(l=10, r=10, t=40, b=10),
-    height=450 )
+# --- Portfolio Graph ---
+def portfolio_graph():
+    return series_graph("portfolio_figure")
+
+# --- Intraday Graph (streaming mode) ---
+def stream_graph():
+    # Starts empty with a fresh cursor on every mount; stream_update fills it
+    names = stream.bars.tickers
+    return html.Div([
+        dcc.Store(id={"type": "stream-cursor", "name": "intraday"}),
+        dcc.Graph(id={"type": "stream-graph", "name": "intraday"}, figure=intraday_figure(names))
+    ])
 
 
 
@@ -398,11 +231,17 @@ rolling_corr_fig.update_layout(
 sidebar = html.Div([ 
     html.H2("Dashboard", className="display-5", style={"color": "white"}),
     html.Hr(),
+    # Remembered per browser; the options are refreshed on navigation
+    dcc.Dropdown(id="portfolio-select", options=[], value=tenants.DEFAULT_ID, clearable=False,
+                 persistence=True, persistence_type="local", style={"marginBottom": "1rem"}),
 
     dbc.Nav([
         dbc.NavLink("Home", href="/", active="exact"),
         dbc.NavLink("Performance Metrics", href="/metrics", active="exact"),
         dbc.NavLink("Rolling Metrics", href="/rolling", active="exact"),
+        dbc.NavLink("What-If", href="/whatif", active="exact"),
+        dbc.NavLink("Optimization", href="/optimization", active="exact"),
+        dbc.NavLink("Benchmark", href="/benchmark", active="exact"),
         dbc.NavLink("About", href="/about", active="exact")
     ], vertical=True, pills=True),
 
@@ -434,108 +273,111 @@ style={
 })
 
 # --- Page Layouts ---
-home_layout = html.Div([
-    dbc.Container([
-        html.Div(style={"height": "40px"}),  # Top Spacer
-        generate_price_kpis(),
-        dbc.Row([
-            dbc.Col(portfolio_graph(), width=10),
-            stacked_return_kpis()
-        ], style={"marginBottom": "20px"}),
-        html.P("* Portfolio shows cumulative performance for past year with weights: JPM: 40%, NFLX: 30%, BA: 30%",
-               style={"fontSize": "13px", "color": "gray", "textAlign": "left", "marginTop": "-10px"})
-    ], style={"margin": "0","paddingLeft":"2rem", "paddingRight": "2rem", "overflowX": "hidden"})
-])
-
-metrics_layout = html.Div([
-    dbc.Container([
-        html.H2("PERFORMANCE METRICS",
-        className="text-center mb-4", style={"fontWeight":"bold"}),
-        # Horizontal KPI row (Cumulative Returns)
-        dbc.Row([
-            dbc.Col(kpi_card(f"{ticker} Cumulative Return", 
-                             f"{(cumulative_returns_latest[ticker] - 1) * 100:.2f}%", 
-                             pastel_colors[i]), width=4)
-            for i, ticker in enumerate(tickers)
-        ], justify="between", className="mb-4", style={"marginTop": "20px"}),
+def home_layout(s):
+    return html.Div([
+        dbc.Container([
+            html.Div(style={"height": "40px"}),  # Top Spacer
+            generate_price_kpis(s),
+            dbc.Row([
+                dbc.Col(portfolio_graph(), width=10),
+                stacked_return_kpis(s)
+            ], style={"marginBottom": "20px"}),
+            html.P(f"* Portfolio shows cumulative performance over {period_text(config['period'])} with weights: {weights_text(s.weights)} ({rebalance_text(s)})",
+                   style={"fontSize": "13px", "color": "gray", "textAlign": "left", "marginTop": "-10px"}),
+            stream_graph() if stream is not None else html.Div()
+        ], style={"margin": "0","paddingLeft":"2rem", "paddingRight": "2rem", "overflowX": "hidden"})
+    ])
+
+def metrics_layout(s):
+    return html.Div([
+        dbc.Container([
+            html.H2("PERFORMANCE METRICS",
+            className="text-center mb-4", style={"fontWeight":"bold"}),
+            # Period KPIs and correlation follow the date range (update_period_metrics)
+            period_picker(s),
+            html.Div(period_kpis(period_stats(s).query()), id="period-kpis"),
+
+            # Scrollable graph + fixed vertical KPI column
+            dbc.Row([
+                dbc.Col([
+                    html.Div([
+                        dbc.Row([
+                            dbc.Col(series_graph("adjusted_close_figure"), width=6),
+                            dbc.Col(series_graph("cumulative_returns_figure"), width=6)
+                        ], className="mb-4", style={"margin": "0"}),
+
+                        dbc.Row([
+                            dbc.Col(series_graph("drawdowns_figure"), width=6),
+                            dbc.Col(dcc.Loading(dcc.Graph(id="period-correlation-graph"), type="circle"), width=6)
+                        ], className="mb-4", style={"margin": "0"},
+                        )
+                    ], style={"height": "75vh", "overflowY": "auto", "paddingRight": "10px"})
+                ], width=10),
+
+                # Fixed vertical KPIs
+                dbc.Col([
+                    metrics_kpi_group(s, ticker, pastel_colors[i % len(pastel_colors)])
+                    for i, ticker in enumerate(kpi_tickers())
+                ], width=2, style={"position": "sticky", "top": "80px", "zIndex": 999})
+            ])
+        ], fluid=True, style={"marginLeft": "0rem", "marginRight": "1rem", "padding": "2rem"})
+    ])
 
-        # Scrollable graph + fixed vertical KPI column
-        dbc.Row([
-            dbc.Col([
-                html.Div([
-                    dbc.Row([
-                        dbc.Col(dcc.Graph(figure=adjusted_close_figure), width=6),
-                        dbc.Col(dcc.Graph(figure=cumulative_returns_figure), width=6)
-                    ], className="mb-4", style={"margin": "0"}),
-
-                    dbc.Row([
-                        dbc.Col(dcc.Graph(figure=drawdowns_figure), width=6),
-                        dbc.Col(dcc.Graph(figure=correlation_figure), width=6)
-                    ], className="mb-4", style={"margin": "0"},
-                    )
-                ], style={"height": "75vh", "overflowY": "auto", "paddingRight": "10px"})
-            ], width=10),
-
-            # Fixed vertical KPIs
-            dbc.Col([
-                return_kpi_group("JPM", pastel_colors[0]),
-                return_kpi_group("NFLX", pastel_colors[1]),
-                return_kpi_group("BA", pastel_colors[2])
-            ], width=2, style={"position": "sticky", "top": "80px", "zIndex": 999})
-        ])
-    ], fluid=True, style={"marginLeft": "0rem", "marginRight": "1rem", "padding": "2rem"})
-])
 
 
 
+def rolling_layout(s):
+    return html.Div([
+        dbc.Container([
+            html.H2("ROLLING METRICS",
+                    className="text-center mb-4", style={"fontWeight": "bold"}),
 
-rolling_layout = html.Div([
-    dbc.Container([
-        html.H2("ROLLING METRICS",
-                className="text-center mb-4", style={"fontWeight": "bold"}),
+            # Averages follow the date range (update_period_rolling_kpis)
+            period_picker(s),
+            # Horizontal KPI row (Rolling Volatility Avg & Latest)
+            dbc.Row(rolling_volatility_kpis(s), id="rolling-vol-kpis", justify="between", className="mb-4"),
 
-        # Horizontal KPI row (Rolling Volatility Avg & Latest)
-        dbc.Row([
-            dbc.Col(kpi_card(f"{ticker} Rolling Volatility", 
-                             f"Avg: {rolling_volatility[ticker].mean():.2%} | Latest: {rolling_volatility[ticker].iloc[-1]:.2%}", 
-                             pastel_colors[i]), width=4)
-            for i, ticker in enumerate(tickers)
-        ], justify="between", className="mb-4", style={"marginTop": "20px"}),
+            # Volatility, Sharpe and correlation are recomputed in the browser
+            # when the window changes (assets/rolling.js)
+            html.Div([
+                html.Span("Window: ", style={"fontWeight": "bold"}),
+                dcc.RadioItems([{"label": f"{w}D", "value": w} for w in config["rolling_windows"]], ROLLING_WINDOW,
+                               id="rolling-window", inline=True,
+                               inputStyle={"marginRight": "4px", "marginLeft": "12px"},
+                               style={"display": "inline-block"}),
+                dcc.Store(id="rolling-returns", data=rolling_payload(s))
+            ], className="mb-3"),
 
-        # Scrollable graph section + fixed vertical KPIs
-        dbc.Row([
-            # Left: Scrollable graph section
-            dbc.Col([
-                html.Div([
-                    dbc.Row([
-                        dbc.Col(dcc.Graph(figure=rolling_vol_fig), width=6),
-                        dbc.Col(dcc.Graph(figure=rolling_sharpe_fig), width=6)
-                    ], className="mb-4", style={"margin": "0"}),
-
-                    dbc.Row([
-                        dbc.Col(dcc.Graph(figure=rolling_var_fig), width=6),
-                        dbc.Col(dcc.Graph(figure=rolling_corr_fig), width=6)
-                    ], className="mb-4", style={"margin": "0"}),
-                ], style={"height": "100vh", "overflowY": "auto", "paddingRight": "10px"})
-            ], width=10),
-
-            # Right: Fixed vertical KPI stack
-            dbc.Col([
-                return_rolling_kpi_group("Portfolio", "#f4e2d8"),
-                return_rolling_kpi_group("JPM", pastel_colors[0]),
-                return_rolling_kpi_group("NFLX", pastel_colors[1]),
-                return_rolling_kpi_group("BA", pastel_colors[2])
-            ], width=2, style={"position": "sticky", "top": "10px", "zIndex": 999}),
+            # Scrollable graph section + fixed vertical KPIs
             dbc.Row([
+                # Left: Scrollable graph section
                 dbc.Col([
                     html.Div([
-                        html.H6("*Source: Yahoo Finance", style={"fontSize":"14px", "marginBottom":"0px"})
+                        dbc.Row([
+                            dbc.Col(dcc.Graph(id="rolling-vol-graph"), width=6),
+                            dbc.Col(dcc.Graph(id="rolling-sharpe-graph"), width=6)
+                        ], className="mb-4", style={"margin": "0"}),
+
+                        dbc.Row([
+                            dbc.Col(series_graph("rolling_var_fig"), width=6),
+                            dbc.Col(dcc.Graph(id="rolling-corr-graph"), width=6)
+                        ], className="mb-4", style={"margin": "0"}),
+                    ], style={"height": "100vh", "overflowY": "auto", "paddingRight": "10px"})
+                ], width=10),
+
+                # Right: Fixed vertical KPI stack
+                dbc.Col(rolling_kpi_stack(s), id="rolling-kpi-stack", width=2,
+                        style={"position": "sticky", "top": "10px", "zIndex": 999}),
+                dbc.Row([
+                    dbc.Col([
+                        html.Div([
+                            html.H6("*Source: Yahoo Finance", style={"fontSize":"14px", "marginBottom":"0px"})
+                        ])
                     ])
                 ])
             ])
-        ])
-    ], fluid=True, style={"marginLeft": "1rem", "marginRight": "1rem", "padding": "1rem"})
-])
+        ], fluid=True, style={"marginLeft": "1rem", "marginRight": "1rem", "padding": "1rem"})
+    ])
 
 
 
@@ -553,63 +395,269 @@ rolling_layout = html.Div([
 
 
 
-about_layout = html.Div([
-    dbc.Container([
-        html.H2("ABOUT DASHBOARD", className="text-center mb-5", style={"fontWeight": "bold"}),
+def whatif_layout(s):
+    # Sliders for the KPI tickers, plus one for everything else when the universe is larger
+    shown = kpi_tickers()
+    sliders = [(t, s.weights[tickers.index(t)]) for t in shown]
+    if len(shown) < len(tickers):
+        sliders.append(("Other", sum(w for t, w in zip(tickers, s.weights) if t not in shown)))
+    return html.Div([
+        dbc.Container([
+            html.H2("WHAT-IF WEIGHTS", className="text-center mb-4", style={"fontWeight": "bold"}),
+            dbc.Row([
+                dbc.Col([
+                    html.Div([
+                        html.H6(f"{name} weight", style={"marginBottom": "4px"}),
+                        dcc.Slider(0, 100, 1, value=round(w * 100), marks=None,
+                                   tooltip={"placement": "right", "always_visible": True},
+                                   id={"type": "whatif-weight", "ticker": name})
+                    ], style={"marginBottom": "18px"})
+                    for name, w in sliders
+                ] + [
+                    html.H6("Window", style={"marginTop": "10px"}),
+                    dcc.RadioItems(list(WHATIF_WINDOWS), "1Y", id="whatif-window", inline=True,
+                                   inputStyle={"marginRight": "4px", "marginLeft": "12px"})
+                ], width=5),
+                dbc.Col(html.Div(id="whatif-results"), width=7)
+            ])
+        ], fluid=True, style={"marginLeft": "0rem", "marginRight": "1rem", "padding": "2rem"})
+    ])
 
-        # About Dashboard
-        html.Div([
-            html.H5("About dashboard", style={"fontWeight": "bold", "marginBottom": "10px"}),
-            html.P("This is a mini dashboard designed to monitor live performance metrics for three selected sample stocks — JPMorgan Chase (JPM), Netflix (NFLX), and Boeing (BA). It offers both ticker-specific and portfolio-level insights through a snapshot of portfolio performance, stock-level insights, and risk-adjusted behavior through a fully interactive layout. The dashboard uses historical data spanning the past 10 years, to reflect a long-term perspective while also offering short-term and real-time insights via dynamic data update function."),
-        ], className="mb-4"),
 
-        # Live Financial Data
-        html.Div([
-            html.H5("Live financial data", style={"fontWeight": "bold", "marginBottom": "10px"}),
-            html.P("All prices and returns displayed across the dashboard are sourced in real time from Yahoo Finance using the yfinance API. Adjustments for dividends and stock splits are incorporated directly at the data ingestion stage through automatic parameterization. Each time the dashboard is loaded, it fetches the most recent market data, ensuring that the computations reflect current conditions without relying on static or outdated sources."),
-        ], className="mb-4"),
+def optimization_layout(s):
+    # All three charts come from one optimisation per snapshot, solved on the first request.
+    # The frontier is a scatter of portfolios, not a series, so it is sent whole rather than
+    # through the downsampling series-graph callback
+    return html.Div([
+        dbc.Container([
+            html.H2("OPTIMIZATION", className="text-center mb-4", style={"fontWeight": "bold"}),
+            dbc.Row([
+                dbc.Col(dcc.Graph(id="frontier-graph", figure=s.figure("frontier_fig")), width=6),
+                dbc.Col(series_graph("optimal_weights_fig"), width=6)
+            ], className="mb-4", style={"margin": "0"}),
+            dbc.Row([
+                dbc.Col(series_graph("rolling_weights_fig"), width=12)
+            ], className="mb-4", style={"margin": "0"}),
+            html.P("* Long-only weights from daily returns over trailing windows; risk parity equalises each "
+                   "asset's contribution to portfolio variance.",
+                   style={"fontSize": "13px", "color": "gray", "textAlign": "left"})
+        ], fluid=True, style={"marginLeft": "0rem", "marginRight": "1rem", "padding": "2rem"})
+    ])
 
-        # Stocks
-        html.Div([
-            html.H5("Stocks", style={"fontWeight": "bold", "marginBottom": "10px"}),
-            html.P("The chosen stocks span three distinct industries: banking and finance, technology & media, and aerospace and defense to allow for a natural diversification of the portfolio. It also facilitates insights into how different industries respond to market fluctuations. This selection offers contrast in volatility profiles and economic sensitivity."),
-        ], className="mb-4"),
 
-        # Weight Allocation
-        html.Div([
-            html.H5("Weight allocation", style={"fontWeight": "bold", "marginBottom": "10px"}),
-            html.P("The custom portfolio is constructed using weighted allocations: JPM: 40%; NFLX: 30%; BA: 30%. These weights apply across return calculations, cumulative metrics, and risk estimations."),
-        ], className="mb-4"),
+def relative_kpi_card(full, ticker, color):
+    return dbc.Card([
+        dbc.CardBody([
+            html.H6(ticker, className="card-title text-center"),
+            html.P(f"Beta: {full['beta'][ticker]:.2f}", className="card-text text-center mb-1"),
+            html.P(f"Alpha: {full['alpha'][ticker]:.2%}", className="card-text text-center mb-1"),
+            html.P(f"Tracking Error: {full['tracking_error'][ticker]:.2%}", className="card-text text-center mb-1"),
+            html.P(f"Info Ratio: {full['information_ratio'][ticker]:.2f}", className="card-text text-center mb-1"),
+            html.P(f"Capture: {full['up_capture'][ticker]:.0%} up / {full['down_capture'][ticker]:.0%} down",
+                   className="card-text text-center mb-0")
+        ])
+    ], style={"backgroundColor": color, "border": "none", "borderRadius": "10px"})
 
-        # Metrics
-        html.Div([
-            html.H5("Metrics", style={"fontWeight": "bold", "marginBottom": "10px"}),
-            html.P("The dashboard calculates twelve distinct metrics to capture various dimensions of performance and risk. These include adjusted closing prices, daily returns, cumulative returns, portfolio cumulative returns, drawdowns, and correlation matrices, as well as rolling 30-day volatility, rolling 30-day Sharpe ratios, rolling 30-day value at risk at a 95% confidence level, and rolling pairwise correlations between the tickers and the portfolio."),
-        ], className="mb-4"),
+def benchmark_layout(s):
+    benchmark = config["benchmark"]
+    if not has_benchmark(s):
+        reason = (f"No prices for the benchmark {benchmark}." if benchmark else
+                  'No benchmark configured: set "benchmark" in the config file or DASHBOARD_BENCHMARK.')
+        return html.Div([
+            dbc.Container([
+                html.H2("BENCHMARK", className="text-center mb-4", style={"fontWeight": "bold"}),
+                html.P(reason, style={"color": "gray", "textAlign": "center"})
+            ], fluid=True, style={"padding": "2rem"})
+        ])
+    full = relative_metrics(s)[1]
+    shown = kpi_tickers()
+    width = max(2, 12 // (len(shown) + 1))
+    return html.Div([
+        dbc.Container([
+            html.H2(f"BENCHMARK: {benchmark}", className="text-center mb-4", style={"fontWeight": "bold"}),
+            dbc.Row([
+                dbc.Col(relative_kpi_card(full, ticker, pastel_colors[i % len(pastel_colors)]), width=width)
+                for i, ticker in enumerate(shown)
+            ] + [
+                dbc.Col(relative_kpi_card(full, "Portfolio", "#f4e2d8"), width=width)
+            ], justify="between", className="mb-4", style={"marginTop": "20px"}),
+            dbc.Row([
+                dbc.Col(series_graph("benchmark_beta_fig"), width=6),
+                dbc.Col(series_graph("tracking_error_fig"), width=6)
+            ], className="mb-4", style={"margin": "0"}),
+            dbc.Row([
+                dbc.Col(series_graph("capture_fig"), width=12)
+            ], className="mb-4", style={"margin": "0"}),
+            html.P(f"* Cards and capture ratios cover the full history, charts {config['benchmark_window']}-day "
+                   "windows. Alpha, tracking error and information ratio are annualised over 252 days.",
+                   style={"fontSize": "13px", "color": "gray", "textAlign": "left"})
+        ], fluid=True, style={"marginLeft": "0rem", "marginRight": "1rem", "padding": "2rem"})
+    ])
+
+
+@cache
+def about_layout():
+    return html.Div([
+        dbc.Container([
+            html.H2("ABOUT DASHBOARD", className="text-center mb-5", style={"fontWeight": "bold"}),
+
+            # About Dashboard
+            html.Div([
+                html.H5("About dashboard", style={"fontWeight": "bold", "marginBottom": "10px"}),
+                html.P(f"This is a mini dashboard designed to monitor live performance metrics for a portfolio of {universe_text()}. It offers both ticker-specific and portfolio-level insights through a snapshot of portfolio performance, stock-level insights, and risk-adjusted behavior through a fully interactive layout. The dashboard uses historical data spanning {period_text(config['period'])}, to reflect a long-term perspective while also offering short-term and real-time insights via dynamic data update function."),
+            ], className="mb-4"),
+
+            # Live Financial Data
+            html.Div([
+                html.H5("Live financial data", style={"fontWeight": "bold", "marginBottom": "10px"}),
+                html.P("All prices and returns displayed across the dashboard are sourced in real time from Yahoo Finance using the yfinance API. Adjustments for dividends and stock splits are incorporated directly at the data ingestion stage through automatic parameterization. Each time the dashboard is loaded, it fetches the most recent market data, ensuring that the computations reflect current conditions without relying on static or outdated sources."),
+            ], className="mb-4"),
+
+            # Stocks
+            html.Div([
+                html.H5("Stocks", style={"fontWeight": "bold", "marginBottom": "10px"}),
+                html.P(f"The portfolio holds {universe_text()}, set by the tickers in the dashboard configuration. Stocks from different industries allow for a natural diversification of the portfolio. They also facilitate insights into how different industries respond to market fluctuations, with contrast in volatility profiles and economic sensitivity."),
+            ], className="mb-4"),
+
+            # Weight Allocation
+            html.Div([
+                html.H5("Weight allocation", style={"fontWeight": "bold", "marginBottom": "10px"}),
+                html.P(f"The custom portfolio is constructed using weighted allocations: {weights_text(weights, '; ')}. These weights apply across return calculations, cumulative metrics, and risk estimations."),
+            ], className="mb-4"),
+
+            # Metrics
+            html.Div([
+                html.H5("Metrics", style={"fontWeight": "bold", "marginBottom": "10px"}),
+                html.P(f"The dashboard calculates twelve distinct metrics to capture various dimensions of performance and risk. These include adjusted closing prices, daily returns, cumulative returns, portfolio cumulative returns, drawdowns, and correlation matrices, as well as rolling {ROLLING_WINDOW}-day volatility, rolling {ROLLING_WINDOW}-day Sharpe ratios, rolling {ROLLING_WINDOW}-day value at risk at a {config['var_confidence']:.0%} confidence level, and rolling pairwise correlations between the tickers and the portfolio. The Rolling Metrics page can also redraw volatility, Sharpe and correlation over {', '.join(map(str, config['rolling_windows']))}-day windows."),
+            ], className="mb-4"),
+
+            # KPIs
+            html.Div([
+                html.H5("KPIs", style={"fontWeight": "bold", "marginBottom": "10px"}),
+                html.P("Each page of the dashboard includes dedicated key performance indicators tailored to the focus of that section. These indicators condense key information into at-a-glance summaries."),
+                html.P("Homepage KPIs:\n • Horizontal: current prices for all stocks (live)\n • Vertical: daily and cumulative returns"),
+                html.P("Performance metrics page KPIs:\n • Horizontal: cumulative returns (latest)\n • Vertical: adjusted close price and drawdowns"),
+                html.P(f"Rolling metrics page KPIs:\n • Horizontal: rolling {ROLLING_WINDOW}-day volatility (average and latest)\n • Vertical: rolling Sharpe ratio and rolling value at risk (average and latest)"),
+            ], className="mb-4"),
+
+            # Graphs
+            html.Div([
+                html.H5("Graphs", style={"fontWeight": "bold", "marginBottom": "10px"}),
+                html.P(f"The dashboard features interactive graphs to visually summarize the performance and risk profiles for each ticker and the weighted portfolio. Overall, the dashboard visualizes the following metrics: adjusted close price trends, cumulative returns, portfolio return curves, drawdown paths, and correlation matrices, {ROLLING_WINDOW}-day rolling volatility, rolling Sharpe ratios, value at risk, and rolling pairwise correlations, including correlations between each ticker and the portfolio. All graphs include color-coded traces and shaded areas beneath each line to enhance readability and visual context. The interactive features allow for zooming, panning, hovering data for deeper exploration, selection and deselection of tickers."),
+            ], className="mb-5"),
+
+
+        ], fluid=True, style={"marginLeft": "0.6rem", "marginRight": "1rem", "padding": "0rem"})
+    ])
+
+
+def loading_layout(status):
+    return html.Div([
+        dbc.Container([
+            html.Div(style={"height": "40px"}),
+            html.H4("Loading market data…", className="text-center mb-4"),
+            dbc.Progress(value=int(status["progress"] * 100), striped=True, animated=True, className="mb-2"),
+            html.P(status["stage"] or "Starting", className="text-center", style={"color": "gray"}),
+            html.P(f"Last attempt failed: {status['error']}" if status["error"] else "",
+                   className="text-center", style={"color": "gray", "fontSize": "13px"})
+        ], style={"maxWidth": "40rem"})
+    ])
+
+
+# --- Data Loading ---
+pages = {"/": home_layout, "/metrics": metrics_layout, "/rolling": rolling_layout, "/whatif": whatif_layout,
+         "/optimization": optimization_layout, "/benchmark": benchmark_layout}
+
+def page_layout(s, pathname):
+    # Built on the first request to each route, then memoized per snapshot
+    if pathname not in pages:
+        pathname = "/"
+    return s.memo(("page", pathname), lambda: pages[pathname](s))
+
+# Lazy by default: workers serve a loading page while the pipeline runs in the
+# background. DASHBOARD_LAZY=0 makes start() build before serving. Either
+# way the snapshot is then rebuilt on a schedule and swapped in when complete.
+if SHARED_DIR:
+    # Attaching to the shared publisher's arrays is cheap, so check it often
+    shared_poll = float(os.environ.get("SHARED_POLL_SECONDS", "30"))
+    loader = BackgroundLoader(build_snapshot, refresh_interval=lambda: shared_poll, retry_delay=1.0, max_retry_delay=30.0)
+else:
+    loader = BackgroundLoader(build_snapshot, refresh_interval=market_hours_interval)
+
+# Intraday ticks, when a feed is configured
+stream = stream_from_config(config["stream"], kpi_tickers())
+
+_started = False
+
+def start():
+    # Starts the background work: the first load, the refresh schedule and the
+    # tick feed. Called by `python app.py` and gunicorn's post_worker_init hook
+    # rather than at import, so processes that re-import this module (the
+    # optimizer's spawned solvers) do not each start a loader and a fetch
+    global _started
+    if _started:
+        return
+    _started = True
+    # A prebuilt snapshot (python snapshot_artifact.py export) serves from the first
+    # request; without one, or when it is stale, the pipeline runs as usual
+    if not SHARED_DIR:
+        artifact = snapshot_artifact.load(config["snapshot_artifact"], config, config["snapshot_max_age"])
+        if artifact is not None:
+            loader.seed(artifact)
+    if os.environ.get("DASHBOARD_LAZY", "1") == "0" and not loader.ready:
+        loader.load_now()
+    loader.start()
+    if stream is not None:
+        stream.start()
+
+# Per-user portfolios: each is a view of the published snapshot with its own
+# portfolio series, cached by (portfolio, data version, definition revision)
+portfolio_store = PortfolioStore(config["portfolios_file"], tickers, {
+    "name": "Portfolio", "weights": None, "rebalance": config["rebalance"],
+    "rebalance_threshold": config["rebalance_threshold"], "transaction_cost": config["transaction_cost"],
+})
+portfolio_views = TTLCache(config["portfolio_cache_size"], config["portfolio_cache_ttl"])
+portfolio_view = tenants.make_views(portfolio_store, portfolio_views, portfolio_snapshot)
+tenants.install(server, portfolio_store, config["portfolios_token"])
+
+def current_snapshot(portfolio_id):
+    # One read of the published snapshot, so a page never mixes two refreshes
+    return portfolio_view(loader.result, portfolio_id)
+
+# Callback results that are pure functions of their inputs and the snapshot
+# version, shared by the workers through the disk tier
+callback_cache = CallbackCache(
+    config["callback_cache_dir"], config["callback_cache_entries"], config["callback_cache_mb"] * 2**20,
+    config["callback_cache_ttl"], config["callback_cache_disk_mb"] * 2**20,
+    namespace=json.dumps(config, sort_keys=True, default=str),
+)
 
-        # KPIs
-        html.Div([
-            html.H5("KPIs", style={"fontWeight": "bold", "marginBottom": "10px"}),
-            html.P("Each page of the dashboard includes dedicated key performance indicators tailored to the focus of that section. These indicators condense key information into at-a-glance summaries."),
-            html.P("Homepage KPIs:\n • Horizontal: current prices for all stocks (live)\n • Vertical: daily and cumulative returns"),
-            html.P("Performance metrics page KPIs:\n • Horizontal: cumulative returns (latest)\n • Vertical: adjusted close price and drawdowns"),
-            html.P("Rolling metrics page KPIs:\n • Horizontal: rolling 30-day volatility (average and latest)\n • Vertical: rolling Sharpe ratio and rolling value at risk (average and latest)"),
-        ], className="mb-4"),
+def portfolio_version(*args):
+    # Memo version for callbacks whose last argument is the selected portfolio
+    s = current_snapshot(args[-1])
+    return None if s is None else s.version
 
-        # Graphs
-        html.Div([
-            html.H5("Graphs", style={"fontWeight": "bold", "marginBottom": "10px"}),
-            html.P("The dashboard features interactive graphs to visually summarize the performance and risk profiles for each ticker and the weighted portfolio. Overall, the dashboard visualizes the following metrics: adjusted close price trends, cumulative returns, portfolio return curves, drawdown paths, and correlation matrices, 30-day rolling volatility, rolling Sharpe ratios, value at risk, and rolling pairwise correlations, including correlations between each ticker and the portfolio. All graphs include color-coded traces and shaded areas beneath each line to enhance readability and visual context. The interactive features allow for zooming, panning, hovering data for deeper exploration, selection and deselection of tickers."),
-        ], className="mb-5"),
+def body_value(body, component_id, prop="value"):
+    # A plain input or state value out of a raw Dash callback request
+    for item in body.get("inputs", []) + body.get("state", []):
+        if isinstance(item, dict) and item.get("id") == component_id and item.get("property") == prop:
+            return item.get("value")
+    return None
 
+# Spans, counters and /metrics (DASHBOARD_METRICS=1). Installed ahead of the
+# payload caches so cached responses are timed and counted too.
+instrumentation.install(server)
 
-    ], fluid=True, style={"marginLeft": "0.6rem", "marginRight": "1rem", "padding": "0rem"})
-])
+@server.route("/ready")
+def ready():
+    return jsonify(loader.status()), 200 if loader.ready else 503
 
 
 # --- App Layout ---
 app.layout = html.Div([
     dcc.Location(id="url"),
+    dcc.Interval(id="ready-poll", interval=1000, disabled=loader.ready),
+    dcc.Interval(id="stream-poll", interval=2000, disabled=stream is None),
     sidebar,
     html.Div(id="page-content", style = {
         "marginLeft": "16rem", "padding":"0","overflowX":"hidden","width":"calc(100vw-16rem)","maxWidth":"calc(100vw-16rem)"
@@ -619,18 +667,235 @@ app.layout = html.Div([
 
 # --- Callback ---
 @app.callback(
-    Output("page-content", "children"),
-    [Input("url", "pathname")]
+    [Output("page-content", "children"), Output("ready-poll", "disabled")],
+    [Input("url", "pathname"), Input("ready-poll", "n_intervals"), Input("portfolio-select", "value")]
 )
-def render_page_content(pathname):
-    if pathname == "/metrics":
-        return metrics_layout
-    elif pathname == "/rolling":
-        return rolling_layout
-    elif pathname == "/about":
-        return about_layout
-    return home_layout
+@instrumentation.timed("render_page_content")
+def render_page_content(pathname, n_intervals, portfolio_id):
+    if pathname == "/about":
+        return about_layout(), True
+    s = current_snapshot(portfolio_id)
+    if s is None:
+        return loading_layout(loader.status()), False
+    return page_layout(s, pathname), True
+
+@app.callback(Output("portfolio-select", "options"), Input("url", "pathname"))
+def portfolio_options(pathname):
+    return tenants.options(portfolio_store)
+
+# Each page is serialized once per snapshot version; repeat navigations are
+# answered from the compressed bytes
+page_payloads = PayloadCache()
+
+def page_payload_key(body):
+    s = current_snapshot(body_value(body, "portfolio-select"))
+    if s is None:
+        return None
+    pathname = body_value(body, "url", "pathname")
+    if pathname != "/about" and pathname not in pages:
+        pathname = "/"
+    return s.version, pathname
+
+install_payload_cache(server, page_payloads, "..page-content.children...ready-poll.disabled..", page_payload_key)
+
+def zoom_range(relayout):
+    if "xaxis.range[0]" in relayout:
+        return relayout["xaxis.range[0]"], relayout.get("xaxis.range[1]")
+    if "xaxis.range" in relayout:
+        return tuple(relayout["xaxis.range"])
+    return None
+
+def zoomed_version(relayout, graph_id, portfolio_id):
+    # Un-zoomed figures are kept as compressed payloads (figure_payloads below),
+    # so only zoomed ranges go through the callback cache
+    return None if relayout is None else portfolio_version(relayout, graph_id, portfolio_id)
+
+@app.callback(
+    Output({"type": "series-graph", "name": MATCH}, "figure"),
+    [Input({"type": "series-graph", "name": MATCH}, "relayoutData")],
+    [State({"type": "series-graph", "name": MATCH}, "id"), State("portfolio-select", "value")]
+)
+@callback_cache.memoize(zoomed_version)
+def update_series_graph(relayout, graph_id, portfolio_id):
+    # Initial call (no relayoutData yet) delivers the deferred figure; later
+    # calls re-fetch the zoomed range
+    s = current_snapshot(portfolio_id)
+    if s is None:
+        raise PreventUpdate
+    if relayout is None:
+        return series_figure(s, graph_id["name"])
+    x_range = zoom_range(relayout)
+    if x_range is None and not relayout.get("xaxis.autorange"):
+        raise PreventUpdate  # y-only zoom, drag mode change, autosize, etc.
+    fig = series_figure(s, graph_id["name"], x_range)
+    if x_range is not None:
+        fig["layout"]["xaxis"] = dict(fig["layout"].get("xaxis", {}), range=list(x_range), autorange=False)
+    return fig
+
+# Rolling window changes never reach the server: the figures are recomputed
+# from the page's returns payload in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace="rolling", function_name="figures"),
+    [Output("rolling-vol-graph", "figure"), Output("rolling-sharpe-graph", "figure"),
+     Output("rolling-corr-graph", "figure")],
+    [Input("rolling-window", "value"), Input("rolling-returns", "data")]
+)
+
+# Date range statistics come from per-snapshot prefix sums (see period_stats.py),
+# so a new range costs a few array lookups rather than a pass over the history
+@app.callback(
+    [Output("period-kpis", "children"), Output("period-correlation-graph", "figure")],
+    [Input("period-range", "start_date"), Input("period-range", "end_date")],
+    [State("portfolio-select", "value")]
+)
+@callback_cache.memoize(portfolio_version)
+def update_period_metrics(start, end, portfolio_id):
+    s = current_snapshot(portfolio_id)
+    if s is None:
+        raise PreventUpdate
+    fig = period_correlation_figure(s, start, end)
+    return period_kpis(period_stats(s).query(start, end)), fig if fig is not None else dash.no_update
+
+@app.callback(
+    [Output("rolling-vol-kpis", "children"), Output("rolling-kpi-stack", "children")],
+    [Input("period-range", "start_date"), Input("period-range", "end_date")],
+    [State("portfolio-select", "value")]
+)
+@callback_cache.memoize(portfolio_version)
+def update_period_rolling_kpis(start, end, portfolio_id):
+    s = current_snapshot(portfolio_id)
+    if s is None:
+        raise PreventUpdate
+    stats = period_stats(s).query(start, end)
+    if stats is None:
+        raise PreventUpdate
+    return rolling_volatility_kpis(s, stats), rolling_kpi_stack(s, stats)
+
+# Initial (un-zoomed) figure payloads are shared by every client, so cache them too
+figure_payloads = PayloadCache()
+
+def figure_payload_key(body):
+    s = loader.result
+    inputs = body.get("inputs") or [{}]
+    if s is None or inputs[0].get("value") is not None:
+        return None
+    name = inputs[0].get("id", {}).get("name")
+    if name not in figure_builders:
+        return None
+    # Ticker-only figures are the same for every portfolio
+    if name not in ticker_figures:
+        s = portfolio_view(s, body_value(body, "portfolio-select"))
+    return s.version, name
+
+install_payload_cache(server, figure_payloads, '{"name":["MATCH"],"type":"series-graph"}.figure', figure_payload_key)
+
+@instrumentation.collect
+def payload_cache_counters():
+    return [
+        (f"dashboard_payload_cache_{result}_total", {"cache": name}, getattr(cache, result))
+        for name, cache in (("pages", page_payloads), ("figures", figure_payloads), ("portfolios", portfolio_views))
+        for result in ("hits", "misses")
+    ] + [
+        ("dashboard_callback_cache_hits_total", {"tier": "memory"}, callback_cache.memory_hits),
+        ("dashboard_callback_cache_hits_total", {"tier": "disk"}, callback_cache.disk_hits),
+        ("dashboard_callback_cache_misses_total", {}, callback_cache.misses),
+    ]
+
+def live_price(s, prices, ticker):
+    price = prices.get(ticker, float("nan"))
+    return price if price == price else s.latest_prices[ticker]
+
+@app.callback(
+    [Output({"type": "live-price", "ticker": ALL}, "children"),
+     Output({"type": "live-close", "ticker": ALL}, "children"),
+     Output({"type": "live-drawdown", "ticker": ALL}, "children"),
+     Output({"type": "stream-graph", "name": ALL}, "extendData"),
+     Output({"type": "stream-cursor", "name": ALL}, "data")],
+    [Input("stream-poll", "n_intervals")],
+    [State({"type": "stream-cursor", "name": ALL}, "data")],
+    prevent_initial_call=True
+)
+def stream_update(n_intervals, cursors):
+    # Only the changed text and the newly closed bars go over the wire
+    s = loader.result
+    if s is None or stream is None:
+        raise PreventUpdate
+    price_ids, close_ids, drawdown_ids = (dash.callback_context.outputs_list[i] for i in range(3))
+    prices = stream.latest_prices()
+
+    def drawdown(ticker):
+        price = live_price(s, prices, ticker)
+        return price / max(s.price_data[ticker].max(), price) - 1
+
+    extends, new_cursors = [], []
+    for cursor in cursors:
+        times, closes, cursor = stream.poll(cursor)
+        new_cursors.append(cursor)
+        if not len(times):
+            extends.append(dash.no_update)
+            continue
+        x = times.strftime("%Y-%m-%d %H:%M").tolist()
+        ys = closes.T.tolist()
+        extends.append(({"x": [x] * len(ys), "y": ys}, list(range(len(ys))), stream.bars.capacity))
+
+    return (
+        [f"${live_price(s, prices, o['id']['ticker']):.2f}" for o in price_ids],
+        [f"Adj Close: ${live_price(s, prices, o['id']['ticker']):.2f}" for o in close_ids],
+        [f"Drawdown: {drawdown(o['id']['ticker']) * 100:.2f}%" for o in drawdown_ids],
+        extends,
+        new_cursors,
+    )
+
+def slider_weights(values, weights):
+    # Slider positions -> full weight vector; "Other" is spread over the hidden
+    # tickers in proportion to the portfolio's weights, or equally when the
+    # portfolio holds none of them
+    shown = kpi_tickers()
+    target = dict(zip(shown, values))
+    hidden = [t for t in tickers if t not in shown]
+    hidden_total = sum(weights[tickers.index(t)] for t in hidden)
+    other = values[len(shown)] if hidden else 0
+    share = (lambda i: weights[i] / hidden_total) if hidden_total > 0 else (lambda i: 1 / len(hidden))
+    w = np.array([target[t] if t in target else other * share(i)
+                  for i, t in enumerate(tickers)], dtype=float)
+    return w / w.sum() if w.sum() > 0 else None
+
+@app.callback(
+    Output("whatif-results", "children"),
+    [Input({"type": "whatif-weight", "ticker": ALL}, "value"), Input("whatif-window", "value")],
+    [State("portfolio-select", "value")]
+)
+@callback_cache.memoize(portfolio_version)
+def update_whatif(values, window, portfolio_id):
+    # Only the cached per-window moments are used here, never the price history
+    s = current_snapshot(portfolio_id)
+    if s is None:
+        raise PreventUpdate
+    w = slider_weights([v or 0 for v in values], s.weights)
+    if w is None:
+        return html.P("Set at least one weight above zero.", style={"color": "gray"})
+    m = whatif_moments(s)[window]
+    new, current = weight_metrics(m, w), weight_metrics(m, s.weights)
+    cards = [
+        ("Volatility (daily)", "volatility", "{:.2%}"),
+        ("Sharpe (daily)", "sharpe", "{:.3f}"),
+        ("VaR 95% (Gaussian)", "var", "{:.2%}"),
+        (f"Return ({window}, buy and hold)", "cumulative", "{:.2%}"),
+    ]
+    return html.Div([
+        dbc.Row([
+            dbc.Col(kpi_card(title, fmt.format(new[key]), pastel_colors[i % len(pastel_colors)]), width=6,
+                    style={"marginBottom": "16px"})
+            for i, (title, key, fmt) in enumerate(cards)
+        ]),
+        html.P(f"{s.portfolio_name} weights: " + ", ".join(f"{title.split(' (')[0]} {fmt.format(current[key])}"
+                                                   for title, key, fmt in cards),
+               style={"fontSize": "13px", "color": "gray"}),
+        html.P("Normalised weights: " + ", ".join(f"{t} {x:.0%}" for t, x in zip(tickers, w) if x >= 0.005),
+               style={"fontSize": "13px", "color": "gray"})
+    ])
 
 # --- Run ---
 if __name__ == '__main__':
+    start()
     app.run(debug=True)
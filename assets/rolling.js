@@ -0,0 +1,160 @@
+// Rolling Metrics window selector, computed in the browser.
+//
+// The server ships the page's daily returns once (pipeline.rolling_payload):
+// float32 values and int32 day numbers, base64 encoded, row-major. Changing
+// the window recomputes rolling volatility, Sharpe and pair correlations here
+// from prefix sums, so it costs no server CPU and no figure download. Each
+// trace is then cut to about the chart's pixel width (payload.points) with the
+// same min/max bucketing as downsample.minmax on the server.
+
+(function () {
+    function decode(b64, Type) {
+        var bytes = atob(b64);
+        var buffer = new ArrayBuffer(bytes.length);
+        var view = new Uint8Array(buffer);
+        for (var i = 0; i < bytes.length; i++) {
+            view[i] = bytes.charCodeAt(i);
+        }
+        return new Type(buffer);
+    }
+
+    // Decoded columns and prefix sums, kept for the payload last seen
+    var cached = {key: null};
+
+    function prepare(payload) {
+        if (cached.key === payload.returns) {
+            return cached;
+        }
+        var T = payload.rows, C = payload.columns.length;
+        var values = decode(payload.returns, Float32Array);
+        var days = decode(payload.dates, Int32Array);
+        var x = new Array(T);
+        for (var t = 0; t < T; t++) {
+            x[t] = new Date(days[t] * 86400000).toISOString().slice(0, 10);
+        }
+        // Centred columns (moments are shift-invariant) and their prefix sums
+        var cs = [], cs2 = [];
+        var centred = [];
+        for (var c = 0; c < C; c++) {
+            var mean = 0;
+            for (var t = 0; t < T; t++) mean += values[t * C + c];
+            mean /= T;
+            var col = new Float64Array(T), s = new Float64Array(T + 1), s2 = new Float64Array(T + 1);
+            for (var t = 0; t < T; t++) {
+                col[t] = values[t * C + c] - mean;
+                s[t + 1] = s[t] + col[t];
+                s2[t + 1] = s2[t] + col[t] * col[t];
+            }
+            centred.push({col: col, shift: mean});
+            cs.push(s);
+            cs2.push(s2);
+        }
+        var csp = payload.pairs.map(function (p) {
+            var a = centred[p[0]].col, b = centred[p[1]].col, s = new Float64Array(T + 1);
+            for (var t = 0; t < T; t++) s[t + 1] = s[t] + a[t] * b[t];
+            return s;
+        });
+        cached = {key: payload.returns, T: T, x: x, centred: centred, cs: cs, cs2: cs2,
+                  shown: payload.shown, pairs: payload.pairs, csp: csp};
+        return cached;
+    }
+
+    function rolling(data, w) {
+        // Sample std, mean / std of the charted columns and pair correlation
+        // per window, null until a full window fits
+        var T = data.T, out = {std: [], sharpe: [], corr: []};
+        data.cs.slice(0, data.shown).forEach(function (s, c) {
+            var s2 = data.cs2[c], shift = data.centred[c].shift;
+            var std = new Array(T).fill(null), sharpe = new Array(T).fill(null);
+            for (var t = w - 1; t < T; t++) {
+                var sum = s[t + 1] - s[t + 1 - w], sum2 = s2[t + 1] - s2[t + 1 - w];
+                var mean = sum / w;
+                var sd = Math.sqrt(Math.max((sum2 - sum * mean) / (w - 1), 0));
+                std[t] = sd;
+                sharpe[t] = sd > 0 ? (mean + shift) / sd : null;
+            }
+            out.std.push(std);
+            out.sharpe.push(sharpe);
+        });
+        data.csp.forEach(function (sp, k) {
+            var p = data.pairs[k];
+            var si = data.cs[p[0]], sj = data.cs[p[1]], qi = data.cs2[p[0]], qj = data.cs2[p[1]];
+            var corr = new Array(T).fill(null);
+            for (var t = w - 1; t < T; t++) {
+                var a = si[t + 1] - si[t + 1 - w], b = sj[t + 1] - sj[t + 1 - w];
+                var cov = sp[t + 1] - sp[t + 1 - w] - a * b / w;
+                var va = qi[t + 1] - qi[t + 1 - w] - a * a / w, vb = qj[t + 1] - qj[t + 1 - w] - b * b / w;
+                corr[t] = va > 0 && vb > 0 ? cov / Math.sqrt(va * vb) : null;
+            }
+            out.corr.push(corr);
+        });
+        return out;
+    }
+
+    function minmax(y, n) {
+        // Indices of the min and max of each of n / 2 buckets (nulls skipped),
+        // plus both ends so the x range is kept; null when y already fits
+        var T = y.length, buckets = Math.max(Math.floor(n / 2), 1);
+        if (!n || n >= T) {
+            return null;
+        }
+        var width = Math.ceil(T / buckets), keep = [0];
+        for (var b = 0; b < T; b += width) {
+            var lo = -1, hi = -1;
+            for (var t = b; t < Math.min(b + width, T); t++) {
+                if (y[t] === null) continue;
+                if (lo < 0 || y[t] < y[lo]) lo = t;
+                if (hi < 0 || y[t] > y[hi]) hi = t;
+            }
+            if (lo < 0) continue;
+            [Math.min(lo, hi), Math.max(lo, hi)].forEach(function (t) {
+                if (t > keep[keep.length - 1]) keep.push(t);
+            });
+        }
+        if (keep[keep.length - 1] !== T - 1) keep.push(T - 1);
+        return keep;
+    }
+
+    function figure(x, names, series, colors, fills, layout) {
+        return {
+            data: names.map(function (name, i) {
+                var full = series[i], keep = minmax(full, layout.points);
+                var tx = keep ? keep.map(function (t) { return x[t]; }) : x;
+                var ty = keep ? keep.map(function (t) { return full[t]; }) : full;
+                return {
+                    type: "scatter", x: tx, y: ty, name: name, fill: "tozeroy",
+                    line: {color: colors[i], width: layout.lineWidth || 3},
+                    fillcolor: fills ? fills[i] : undefined
+                };
+            }),
+            layout: Object.assign({
+                plot_bgcolor: "#fffdf5", margin: {l: 10, r: 10, t: 40, b: 10}
+            }, layout.base)
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        rolling: {
+            figures: function (w, payload) {
+                if (!payload || !w) {
+                    return [window.dash_clientside.no_update, window.dash_clientside.no_update,
+                            window.dash_clientside.no_update];
+                }
+                var data = prepare(payload);
+                var r = rolling(data, w), names = payload.columns, shown = names.slice(0, payload.shown);
+                var pairNames = payload.pairs.map(function (p) { return names[p[0]] + "–" + names[p[1]]; });
+                return [
+                    figure(data.x, shown, r.std, payload.colors, payload.fills, {points: payload.points, base: {
+                        title: {text: w + "-Day Rolling Volatility", x: 0.5},
+                        legend: {orientation: "v", y: 0.95, x: 0.17, xanchor: "center"}}}),
+                    figure(data.x, shown, r.sharpe, payload.colors, null, {points: payload.points, base: {
+                        title: {text: w + "-Day Rolling Sharpe Ratio", x: 0.5},
+                        legend: {orientation: "h", y: 1.02, x: 0.5, xanchor: "center"}}}),
+                    figure(data.x, pairNames, r.corr, payload.pair_colors, payload.pair_fills, {lineWidth: 2, points: payload.points, base: {
+                        title: {text: w + "-Day Rolling Correlation", x: 0.5}, height: 450,
+                        legend: {orientation: "h", y: 0.15, x: 0.5, xanchor: "center"}}})
+                ];
+            }
+        }
+    });
+})();
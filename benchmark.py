@@ -0,0 +1,239 @@
+
+#### benchmark
+# Times the dashboard's stages on synthetic prices, so the cost of a bigger
+# universe or a longer history can be measured before it ships:
+#
+#   python benchmark.py --tickers 200 --bars 2520
+#   python benchmark.py --save-baseline bench.json      # record
+#   python benchmark.py --baseline bench.json           # exit 1 on regression
+#
+# Prices come from a seeded factor model through a stub data source into a
+# throwaway price cache, so runs are repeatable and never touch the network.
+# Each stage reports its best time over --repeat runs, its peak traced
+# memory (a separate run under tracemalloc), and for figures and pages the
+# JSON payload size the browser would receive.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+
+# --- Synthetic Data ---
+def synthetic_tickers(n):
+    return [f"SYN{i:04d}" for i in range(n)]
+
+
+def synthetic_prices(tickers, bars, seed=0, end=None):
+    # One market factor plus idiosyncratic noise, so correlations look like equities
+    rng = np.random.default_rng(seed)
+    n = len(tickers)
+    index = pd.bdate_range(end=end or pd.Timestamp.now().normalize(), periods=bars)
+    beta = rng.uniform(0.5, 1.5, n)
+    vol = rng.uniform(0.01, 0.03, n)
+    market = rng.normal(0.0003, 0.01, (bars, 1))
+    returns = market * beta + rng.normal(0, 1, (bars, n)) * vol
+    return pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=index, columns=tickers)
+
+
+class SyntheticSource:
+    # Data source stub (see data_sources.py) serving a fixed frame of closes
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = 0
+
+    def __call__(self, tickers, start, interval="1d"):
+        self.calls += 1
+        present = [t for t in tickers if t in self.prices.columns]
+        return self.prices.loc[self.prices.index >= pd.Timestamp(start), present]
+
+
+# --- Measurement ---
+def measure(run, repeat, setup=None):
+    # (best seconds, peak traced MB, last result). The best run is the least
+    # disturbed by other processes; the traced run is separate because
+    # tracemalloc slows allocation-heavy code down. setup, if given, runs
+    # untimed before each run
+    setup = setup or (lambda: None)
+    times = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    setup()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak / 2**20, result
+
+
+def payload_size(obj):
+    import plotly
+
+    return len(json.dumps(obj, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def run_benchmark(n_tickers, bars, repeat=3, seed=0):
+    # Must run before pipeline / app are imported: both read the config at import
+    tickers = synthetic_tickers(n_tickers)
+    os.environ["DASHBOARD_TICKERS"] = ",".join(tickers)
+    os.environ["DASHBOARD_DATA_SOURCE"] = "offline"
+    os.environ["PRICE_CACHE_DIR"] = tempfile.mkdtemp(prefix="dashboard-bench-")
+    os.environ["DASHBOARD_CALLBACK_CACHE_DIR"] = ""
+    os.environ["DASHBOARD_SNAPSHOT"] = os.path.join(os.environ["PRICE_CACHE_DIR"], "snapshot.bundle")
+    # One more synthetic series stands in for the benchmark index
+    os.environ["DASHBOARD_BENCHMARK"] = "SYNBENCH"
+
+    import pipeline
+    from price_store import PriceStore
+
+    prices = synthetic_prices(tickers + ["SYNBENCH"], bars, seed)
+    pipeline.config["period"] = f"{bars // 252 + 2}y"
+    pipeline.price_store = PriceStore(os.environ["PRICE_CACHE_DIR"], fetch=SyntheticSource(prices))
+
+    stages = {}
+
+    def record(name, run, payload=False, setup=None):
+        seconds, peak, result = measure(run, repeat, setup)
+        stages[name] = {"seconds": round(seconds, 5), "peak_mb": round(peak, 2)}
+        if payload:
+            stages[name]["bytes"] = payload_size(result)
+        return result
+
+    def cold_start():
+        # A fresh process: empty history ring and nothing carried to extend
+        pipeline.price_history = None
+        pipeline._rolling_state = None
+        pipeline._var_state = None
+
+    # The first pull fills the price cache; later ones read it back
+    start = time.perf_counter()
+    pipeline.price_store.get_prices(tickers, period=pipeline.config["period"])
+    stages["fetch_cold"] = {"seconds": round(time.perf_counter() - start, 5)}
+
+    live = record("get_live_data", pipeline.get_live_data, setup=cold_start)
+    returns, portfolio_returns = live[6], live[9]
+    record("rolling_metrics", lambda: pipeline.compute_rolling_metrics(returns, portfolio_returns),
+           setup=cold_start)
+    record("var", lambda: pipeline.compute_var(returns, portfolio_returns))
+    snapshot = record("build_snapshot", pipeline.build_snapshot, setup=cold_start)
+    # A refresh in a running process, with the ring, rolling engine and VaR
+    # carried over from the last run (no new bars, so this is the fixed cost)
+    record("build_snapshot_warm", pipeline.build_snapshot)
+
+    # Let the app's loader finish its first build so it does not compete
+    # with the timings below
+    import app
+    app.start()
+    while not app.loader.ready:
+        time.sleep(0.05)
+
+    # Every run gets an empty memo, so each stage pays its full build cost
+    fresh = lambda: snapshot.replace()
+    record("optimization", lambda: pipeline.optimization(fresh()))
+    record("whatif_moments", lambda: pipeline.whatif_moments(fresh()))
+    # Index build plus one range query, as on the first date range change
+    middle = snapshot.returns.index[len(snapshot.returns) // 2]
+    record("period_stats", lambda: pipeline.period_stats(fresh()).query(middle, None))
+    record("relative_metrics", lambda: pipeline.relative_metrics(fresh()))
+    shared = fresh()
+    pipeline.optimization(shared)
+    pipeline.whatif_moments(shared)
+    for name in pipeline.figure_builders:
+        record(f"figure:{name}", lambda: app.series_figure(prebuilt(shared), name), payload=True)
+    for path in app.pages:
+        record(f"page:{path}", lambda: app.page_layout(prebuilt(shared), path), payload=True)
+
+    # Cold start from an exported artifact, as a new instance boots with one
+    import snapshot_artifact
+    snapshot_artifact.export(os.environ["DASHBOARD_SNAPSHOT"], shared, pipeline.config)
+    record("artifact_load", lambda: snapshot_artifact.load(os.environ["DASHBOARD_SNAPSHOT"], pipeline.config))
+
+    return {
+        "params": {"tickers": n_tickers, "bars": bars, "repeat": repeat, "seed": seed},
+        "stages": stages,
+    }
+
+
+def prebuilt(s):
+    # A copy of s with the shared solves (optimization, what-if moments) already
+    # in its memo, so figure and page timings do not include them
+    copy = s.replace()
+    for key in ("optimization", "whatif"):
+        if key in s._memo:
+            copy.memo(key, lambda: s._memo[key])
+    return copy
+
+
+# --- Baseline ---
+def compare(result, baseline, tolerance=0.5, min_seconds=0.005):
+    # Regressions beyond `tolerance` (0.5 = 50% slower / larger). Timings under
+    # min_seconds are too noisy to judge.
+    problems = []
+    if result["params"] != baseline["params"]:
+        problems.append(f"parameters differ from the baseline: {baseline['params']}")
+        return problems
+    for name, now in result["stages"].items():
+        before = baseline["stages"].get(name)
+        if before is None:
+            continue
+        if now["seconds"] > max(before["seconds"], min_seconds) * (1 + tolerance):
+            problems.append(f"{name}: {now['seconds']:.4f}s vs {before['seconds']:.4f}s")
+        for key, unit in (("peak_mb", "MB"), ("bytes", "B")):
+            if key in now and key in before and now[key] > max(before[key], 1) * (1 + tolerance):
+                problems.append(f"{name}: {now[key]:,}{unit} vs {before[key]:,}{unit}")
+    return problems
+
+
+def report(result):
+    lines = [f"{'stage':<34}{'seconds':>10}{'peak MB':>10}{'payload':>12}"]
+    for name, stage in result["stages"].items():
+        size = f"{stage['bytes']:,}" if "bytes" in stage else ""
+        peak = f"{stage['peak_mb']:.1f}" if "peak_mb" in stage else ""
+        lines.append(f"{name:<34}{stage['seconds']:>10.4f}{peak:>10}{size:>12}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the dashboard pipeline on synthetic prices")
+    parser.add_argument("--tickers", type=int, default=12)
+    parser.add_argument("--bars", type=int, default=2520)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="fail if slower or larger than this saved result")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    try:
+        result = run_benchmark(args.tickers, args.bars, args.repeat, args.seed)
+    finally:
+        shutil.rmtree(os.environ.get("PRICE_CACHE_DIR", ""), ignore_errors=True)
+    print(report(result))
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(result, json.load(f), args.tolerance)
+        if problems:
+            print("\nRegressions against", args.baseline)
+            print("\n".join("  " + p for p in problems))
+            return 1
+        print("\nNo regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
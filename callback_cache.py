@@ -0,0 +1,193 @@
+
+#### callback cache
+# Memoizes Dash callbacks whose output depends only on their arguments and the
+# data snapshot. Keys hash (callback, arguments, snapshot version), so a data
+# refresh or a portfolio edit simply misses. Two tiers:
+#   memory  per worker, LRU bounded by entry count and pickled bytes, with a TTL
+#   disk    one pickle per key in a directory shared by the workers on a host,
+#           expiring after the same TTL and pruned oldest-first past disk_bytes
+# Concurrent identical calls compute once: threads in a worker wait on a
+# per-key lock, and workers on a file lock striped by the key's first byte.
+#
+# The disk tier unpickles what it finds, so point it at a directory only the
+# dashboard can write to.
+
+import os
+import time
+import json
+import pickle
+import hashlib
+import logging
+import threading
+from functools import wraps
+from collections import OrderedDict
+from price_store import _FileLock
+
+logger = logging.getLogger(__name__)
+
+# Disk writes between scans for expired and excess files
+PRUNE_EVERY = 32
+
+
+class CallbackCache:
+    def __init__(self, root=None, max_entries=256, max_bytes=64 * 2**20, ttl=3600, disk_bytes=512 * 2**20,
+                 namespace=""):
+        # root: directory of the disk tier, None for memory only. namespace is
+        # mixed into every key: anything besides the data that changes results
+        # (e.g. the config), so a redeploy does not read its predecessor's files
+        self.root = root
+        self.namespace = hashlib.sha1(namespace.encode()).hexdigest()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_bytes = disk_bytes
+        self.entries = OrderedDict()   # key -> (expires, size, value)
+        self.size = 0
+        self.memory_hits = self.disk_hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._building = {}
+        self._writes = 0
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def key(self, name, args, version):
+        # Callback arguments are decoded JSON, so they serialize the same way every time
+        raw = json.dumps([self.namespace, name, args, version], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, key, build):
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                building = self._building.setdefault(key, threading.Lock())
+        if value is not None:
+            return value[0]
+        with building:
+            try:
+                with self._lock:
+                    value = self._lookup(key)
+                if value is not None:
+                    return value[0]
+                if not self.root:
+                    with self._lock:
+                        self.misses += 1
+                    return self._remember(key, build())
+                with _FileLock(os.path.join(self.root, f"lock-{key[:2]}")):
+                    value = self._read(key)
+                    if value is not None:
+                        with self._lock:
+                            self.disk_hits += 1
+                        self._remember(key, value[0], value[1])
+                        return value[0]
+                    with self._lock:
+                        self.misses += 1
+                    return self._remember(key, build(), write=True)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+
+    def _lookup(self, key):
+        # (value,) on a live memory hit, else None; caller holds the lock
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._drop(key)
+            return None
+        self.entries.move_to_end(key)
+        self.memory_hits += 1
+        return (entry[2],)
+
+    def _drop(self, key):
+        self.size -= self.entries.pop(key)[1]
+
+    def _remember(self, key, value, blob=None, write=False):
+        if blob is None:
+            try:
+                blob = pickle.dumps((time.time() + self.ttl, value), protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:  # not picklable: serve it uncached
+                logger.debug("Callback result not cached: %s", e)
+                return value
+        if write:
+            self._write(key, blob)
+        if len(blob) <= self.max_bytes:
+            with self._lock:
+                if key in self.entries:
+                    self._drop(key)
+                self.entries[key] = (time.monotonic() + self.ttl, len(blob), value)
+                self.size += len(blob)
+                while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                    self._drop(next(iter(self.entries)))
+        return value
+
+    # --- Disk Tier ---
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.pkl")
+
+    def _read(self, key):
+        # (value, blob) when a live file exists, else None
+        try:
+            with open(self._path(key), "rb") as f:
+                blob = f.read()
+            expires, value = pickle.loads(blob)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # torn or foreign file: rebuild it
+            logger.warning("Ignoring unreadable callback cache file for %s: %s", key, e)
+            return None
+        if expires < time.time():
+            return None
+        return value, blob
+
+    def _write(self, key, blob):
+        tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            logger.warning("Could not write the callback cache: %s", e)
+            return
+        with self._lock:
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self):
+        # Removes expired files, then the oldest until the tier fits in disk_bytes
+        now, files = time.time(), []
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.endswith(".pkl"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if mtime + self.ttl >= now and total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    # --- Decorator ---
+    def memoize(self, version, name=None):
+        # version(*args) -> the data version the result depends on, or None to
+        # call through uncached (e.g. while no snapshot is loaded)
+        def decorate(fn):
+            label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+            @wraps(fn)
+            def wrapper(*args):
+                v = version(*args)
+                if v is None:
+                    return fn(*args)
+                return self.get(self.key(label, args, v), lambda: fn(*args))
+            return wrapper
+        return decorate
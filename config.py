@@ -0,0 +1,143 @@
+
+#### config
+# Universe, weights and display limits. Read from the JSON file named by
+# DASHBOARD_CONFIG if set, then DASHBOARD_TICKERS / DASHBOARD_WEIGHTS
+# (comma-separated), DASHBOARD_DATA_SOURCE and DASHBOARD_STREAM override it. Example file:
+#
+#   {"tickers": ["JPM", "NFLX", "BA"], "weights": [0.4, 0.3, 0.3]}
+#
+# "weights" may also be a {"TICKER": weight} mapping; omitted weights mean an
+# equal-weight portfolio. Weights are normalised to sum to 1.
+
+import os
+import json
+
+DEFAULT_CONFIG = {
+    "tickers": ["JPM", "NFLX", "BA"],
+    "weights": [0.4, 0.3, 0.3],
+    "period": "10y",
+    # Portfolio NAV: "none", "monthly", "quarterly" or "threshold" rebalancing to
+    # the target weights; threshold is the largest allowed drift of any weight,
+    # transaction_cost a fraction of traded value, buys plus sells (0.001 = 10 bps)
+    "rebalance": "monthly",
+    "rebalance_threshold": 0.05,
+    "transaction_cost": 0.0,
+    # Extra weight sets drawn for comparison on the portfolio graph
+    "compare_weights": [],
+    # Optimization page: trailing window and step between windows (rows),
+    # frontier resolution, and solver processes (null = up to 4, 0 = in-process)
+    "optimizer_window": 252,
+    "optimizer_step": 21,
+    "frontier_points": 25,
+    "optimizer_workers": None,
+    # Windows offered on the Rolling Metrics page (computed in the browser)
+    "rolling_windows": [20, 30, 60, 120, 252],
+    # Benchmark for beta, alpha, tracking error, information ratio and capture
+    # (null = none), and the rolling window those are computed over
+    "benchmark": "SPY",
+    "benchmark_window": 60,
+    # Rolling VaR / CVaR: "historical", "gaussian", "cornish_fisher" or
+    # "monte_carlo". Monte Carlo simulates var_mc_paths joint returns of the
+    # tickers and the portfolio per window (Cholesky of the window covariance),
+    # re-solved every var_mc_step rows; var_mc_df sets Student-t tails (null = normal)
+    "var_method": "historical",
+    "var_confidence": 0.95,
+    "var_mc_paths": 100000,
+    "var_mc_step": 5,
+    "var_mc_df": None,
+    # Per-user portfolios (JSON file, see tenants.py) and how many derived
+    # portfolio views to keep, for how long (seconds). Writes over the API need
+    # portfolios_token as a bearer token (null = read-only)
+    "portfolios_file": "portfolios.json",
+    "portfolios_token": None,
+    "portfolio_cache_size": 32,
+    "portfolio_cache_ttl": 3600,
+    # Callback memo (see callback_cache.py): per-worker entries and MB, a disk
+    # tier shared by the workers (null = memory only) and its size, and the TTL
+    "callback_cache_entries": 256,
+    "callback_cache_mb": 64,
+    "callback_cache_dir": ".callback_cache",
+    "callback_cache_disk_mb": 512,
+    "callback_cache_ttl": 3600,
+    # Precomputed snapshot loaded at boot (see snapshot_artifact.py), ignored
+    # once older than snapshot_max_age seconds (null = any age)
+    "snapshot_artifact": "snapshot.bundle",
+    "snapshot_max_age": 86400,
+    # "yahoo", "offline" (price cache only) or a directory of CSV/Parquet files
+    "data_source": "yahoo",
+    # Intraday streaming, off by default: {"replay": "ticks.csv", "bar": "1m", "speed": 1}
+    "stream": None,
+    # Rendering limits that keep page cost bounded for large universes
+    "max_kpi_tickers": 6,
+    "max_corr_pairs": 10,
+    "max_heatmap_tickers": 150,
+    # Points per line trace sent to the browser ("lttb" or "minmax")
+    "downsample_points": 1000,
+    "downsample_method": "lttb",
+}
+
+
+def load_config(env=os.environ):
+    config = dict(DEFAULT_CONFIG)
+    path = env.get("DASHBOARD_CONFIG")
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        if "tickers" in overrides and "weights" not in overrides:
+            overrides["weights"] = None
+        config.update(overrides)
+
+    if env.get("DASHBOARD_TICKERS"):
+        config["tickers"] = [t.strip().upper() for t in env["DASHBOARD_TICKERS"].split(",") if t.strip()]
+        config["weights"] = None
+    if env.get("DASHBOARD_DATA_SOURCE"):
+        config["data_source"] = env["DASHBOARD_DATA_SOURCE"]
+    if env.get("DASHBOARD_STREAM"):
+        config["stream"] = {"replay": env["DASHBOARD_STREAM"], "bar": env.get("DASHBOARD_STREAM_BAR", "1m"),
+                            "speed": float(env.get("DASHBOARD_STREAM_SPEED", "1"))}
+    if env.get("DASHBOARD_PORTFOLIOS"):
+        config["portfolios_file"] = env["DASHBOARD_PORTFOLIOS"]
+    if env.get("DASHBOARD_PORTFOLIOS_TOKEN"):
+        config["portfolios_token"] = env["DASHBOARD_PORTFOLIOS_TOKEN"]
+    if "DASHBOARD_CALLBACK_CACHE_DIR" in env:
+        config["callback_cache_dir"] = env["DASHBOARD_CALLBACK_CACHE_DIR"] or None
+    if "DASHBOARD_BENCHMARK" in env:
+        config["benchmark"] = env["DASHBOARD_BENCHMARK"].strip().upper() or None
+    if env.get("DASHBOARD_SNAPSHOT"):
+        config["snapshot_artifact"] = env["DASHBOARD_SNAPSHOT"]
+    if env.get("DASHBOARD_VAR_METHOD"):
+        config["var_method"] = env["DASHBOARD_VAR_METHOD"]
+    if env.get("DASHBOARD_WEIGHTS"):
+        config["weights"] = [float(w) for w in env["DASHBOARD_WEIGHTS"].split(",")]
+
+    config["weights"] = normalise_weights(config["tickers"], config["weights"])
+    config["compare_weights"] = [normalise_weights(config["tickers"], w) for w in config["compare_weights"]]
+    # The latest optimizer window always draws a frontier
+    if type(config["frontier_points"]) is not int or config["frontier_points"] < 2:
+        raise ValueError(f"frontier_points must be an integer of at least 2, got {config['frontier_points']!r}")
+    # Student-t draws are scaled to unit variance, which needs df > 2
+    if config["var_mc_df"] is not None and not config["var_mc_df"] > 2:
+        raise ValueError(f"var_mc_df must be above 2 (or null for normal tails), got {config['var_mc_df']!r}")
+    return config
+
+
+def normalise_weights(tickers, weights):
+    if not tickers:
+        raise ValueError("The ticker universe is empty")
+    if len(set(tickers)) != len(tickers):
+        raise ValueError("Duplicate tickers in the universe")
+    if weights is None:
+        weights = [1.0] * len(tickers)
+    elif isinstance(weights, dict):
+        unknown = set(weights) - set(tickers)
+        if unknown:
+            raise ValueError(f"Weights given for tickers outside the universe: {sorted(unknown)}")
+        weights = [float(weights.get(t, 0.0)) for t in tickers]
+    if len(weights) != len(tickers):
+        raise ValueError(f"{len(weights)} weights given for {len(tickers)} tickers")
+    total = sum(weights)
+    if total <= 0:
+        raise ValueError("Weights must sum to a positive number")
+    if abs(total - 1) < 1e-9:
+        return [float(w) for w in weights]
+    return [w / total for w in weights]
@@ -0,0 +1,132 @@
+
+#### data sources
+# Where daily closes come from. A source is called as
+# source(tickers, start, interval) and returns a DataFrame of closes with one
+# column per ticker that returned data; tickers that failed are left out (and
+# logged) rather than failing the whole request, so the price store can keep
+# serving their cached history.
+
+import os
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def empty_closes():
+    return pd.DataFrame(index=pd.DatetimeIndex([]))
+
+
+class YahooSource:
+    # Large universes are split into chunks fetched in parallel (at most
+    # max_workers requests in flight). Tickers missing from a response are
+    # retried with exponential backoff; whatever still fails is dropped.
+    def __init__(self, chunk_size=50, max_workers=4, retries=3, backoff=1.0, timeout=30):
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def __call__(self, tickers, start, interval="1d"):
+        chunks = [tickers[i:i + self.chunk_size] for i in range(0, len(tickers), self.chunk_size)]
+        if len(chunks) == 1:
+            frames = [self.fetch_chunk(chunks[0], start, interval)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+                frames = list(pool.map(lambda chunk: self.fetch_chunk(chunk, start, interval), chunks))
+        frames = [f for f in frames if not f.empty]
+        return pd.concat(frames, axis=1) if frames else empty_closes()
+
+    def fetch_chunk(self, chunk, start, interval):
+        got = []
+        missing = list(chunk)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1) * (1 + random.random()))
+            try:
+                close = self.download(missing, start, interval)
+            except Exception as e:
+                logger.warning("Yahoo request for %d tickers failed (attempt %d): %s", len(missing), attempt + 1, e)
+                continue
+            close = close.dropna(axis=1, how="all")
+            got.append(close)
+            missing = [t for t in missing if t not in close.columns]
+            if not missing:
+                break
+        if missing:
+            logger.warning("No Yahoo data for %s after %d attempts", ", ".join(missing), self.retries + 1)
+        return pd.concat(got, axis=1) if got else empty_closes()
+
+    def download(self, tickers, start, interval):
+        import yfinance as yf
+
+        raw_data = yf.download(tickers, start=start, interval=interval, group_by='ticker',
+                               auto_adjust=True, progress=False, threads=False, timeout=self.timeout)
+        if raw_data is None or raw_data.empty:
+            return empty_closes()
+
+        if isinstance(raw_data.columns, pd.MultiIndex):
+            present = [t for t in tickers if t in raw_data.columns.get_level_values(0)]
+            close = pd.concat([raw_data[ticker]["Close"] for ticker in present], axis=1)
+            close.columns = present
+        else:
+            close = raw_data[["Close"]]
+            close.columns = tickers[:1]
+        return close
+
+
+class FileSource:
+    # Closes from local files, for tests and air-gapped runs: <root>/<TICKER>.parquet
+    # or <root>/<TICKER>.csv with a date column (or index) and a Close /
+    # Adj Close column. The interval is not checked; files hold whatever bars they hold.
+    def __init__(self, root):
+        self.root = root
+
+    def __call__(self, tickers, start, interval="1d"):
+        series = []
+        for ticker in tickers:
+            try:
+                close = self.read(ticker)
+            except Exception as e:
+                logger.warning("No file data for %s: %s", ticker, e)
+                continue
+            series.append(close[close.index >= pd.Timestamp(start)].rename(ticker))
+        return pd.concat(series, axis=1) if series else empty_closes()
+
+    def path(self, ticker):
+        safe = ticker.replace("/", "_").replace("^", "_")
+        for ext in (".parquet", ".csv"):
+            path = os.path.join(self.root, safe + ext)
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"no {safe}.parquet or {safe}.csv in {self.root}")
+
+    def read(self, ticker):
+        path = self.path(ticker)
+        if path.endswith(".parquet"):
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_csv(path)
+        date_column = next((c for c in frame.columns if str(c).lower() in ("date", "datetime")), None)
+        if date_column is not None:
+            frame = frame.set_index(date_column)
+        frame.index = pd.to_datetime(frame.index)
+        value_column = next((c for c in ("Close", "Adj Close", "close", "adj_close", ticker) if c in frame.columns), None)
+        if value_column is None:
+            raise ValueError(f"{path} has no Close column")
+        return frame[value_column].astype(float).sort_index()
+
+
+def make_source(spec):
+    # "yahoo", "offline" (cache only) or a directory of CSV/Parquet files
+    if spec in (None, "", "yahoo"):
+        return YahooSource()
+    if spec in ("offline", "none"):
+        return None
+    if not os.path.isdir(spec):
+        raise ValueError(f"Data source {spec!r} is not 'yahoo', 'offline' or a directory")
+    return FileSource(spec)
@@ -0,0 +1,123 @@
+
+#### downsampling
+# Reduce long line traces to roughly the chart's pixel width before they are
+# sent to the browser. LTTB (largest triangle three buckets) keeps the visual
+# shape of a line; min/max bucketing keeps every spike and is fully vectorized.
+
+import numpy as np
+import pandas as pd
+
+
+def lttb(x, y, n):
+    # Indices of the n points LTTB keeps; x, y are float arrays of equal length
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    keep = np.empty(n, dtype=int)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else size
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area)) if end > start else start
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(x, y, n):
+    # Indices of the min and max point in each of n/2 buckets, plus both ends
+    size = len(y)
+    buckets = max(n // 2, 1)
+    if n >= size:
+        return np.arange(size)
+    width = -(-size // buckets)
+    padded = np.full(buckets * width, np.nan)
+    padded[:size] = y
+    padded = padded.reshape(buckets, width)
+    offsets = np.arange(buckets) * width
+    valid = ~np.isnan(padded).all(axis=1)
+    lows = offsets[valid] + np.nanargmin(padded[valid], axis=1)
+    highs = offsets[valid] + np.nanargmax(padded[valid], axis=1)
+    return np.unique(np.concatenate([[0, size - 1], lows, highs]))
+
+
+methods = {"lttb": lttb, "minmax": minmax}
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype("int64").astype(float)
+    if x.dtype == object:
+        return pd.to_datetime(x).values.astype("int64").astype(float)
+    return x.astype(float)
+
+
+def _bound(value, like_datetime):
+    if value is None:
+        return None
+    return float(pd.Timestamp(value).value) if like_datetime else float(value)
+
+
+# Trace attributes holding one value per point, sliced along with x and y
+POINT_ARRAYS = ("text", "hovertext", "customdata", "ids", "textposition")
+NESTED_POINT_ARRAYS = {
+    "marker": ("color", "size", "symbol", "opacity"),
+    "error_x": ("array", "arrayminus"),
+    "error_y": ("array", "arrayminus"),
+}
+
+
+def downsample_indices(x, y, points, x_range=None, method="lttb"):
+    # Indices of the points to keep, or None when x is not sorted (e.g. a
+    # scatter of portfolios): bucketing and range search both need sorted x
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    xf = _as_float(x)
+    if len(xf) > 1 and not (np.diff(xf) >= 0).all():
+        return None
+    mask = np.isfinite(y)
+    if x_range is not None:
+        like_datetime = not np.issubdtype(x.dtype, np.number)
+        lo, hi = (_bound(v, like_datetime) for v in x_range)
+        # One point either side of the range so lines run to the plot edges
+        start = max(np.searchsorted(xf, lo, side="left") - 1, 0) if lo is not None else 0
+        stop = min(np.searchsorted(xf, hi, side="right") + 1, len(xf)) if hi is not None else len(xf)
+        mask[:start] = False
+        mask[stop:] = False
+    sel = np.flatnonzero(mask)
+    return sel[methods[method](xf[sel], y[sel], points)]
+
+
+def take(out, keep, size):
+    # Slices the other per-point arrays of a trace dict to the kept indices
+    def cut(value):
+        if isinstance(value, (list, tuple, np.ndarray)) and len(value) == size:
+            return np.asarray(value, dtype=object if isinstance(value, (list, tuple)) else None)[keep]
+        return value
+    for key in POINT_ARRAYS:
+        if key in out:
+            out[key] = cut(out[key])
+    for key, names in NESTED_POINT_ARRAYS.items():
+        if isinstance(out.get(key), dict):
+            out[key] = dict(out[key], **{name: cut(out[key][name]) for name in names if name in out[key]})
+    return out
+
+
+def downsample_figure(fig, points=1000, x_range=None, method="lttb"):
+    # Returns a plain figure dict; heatmaps, unsorted scatters and other
+    # traces pass through
+    data = []
+    for trace in fig.data:
+        out = trace.to_plotly_json()
+        if trace.type == "scatter" and trace.x is not None and trace.y is not None:
+            keep = downsample_indices(trace.x, trace.y, points, x_range, method)
+            if keep is not None:
+                out = take(out, keep, len(trace.x))
+                out["x"], out["y"] = np.asarray(trace.x)[keep], np.asarray(trace.y, dtype=float)[keep]
+        data.append(out)
+    return {"data": data, "layout": fig.layout.to_plotly_json()}
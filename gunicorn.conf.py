@@ -0,0 +1,38 @@
+
+#### gunicorn config
+# Loaded automatically by `gunicorn app:server` (see Procfile).
+#
+# With DASHBOARD_SHARED=1 the master starts one publisher process that fetches
+# prices and computes the metric frames into a file on /dev/shm. Workers then
+# mmap those arrays instead of each downloading and computing their own copy.
+
+import os
+import sys
+import subprocess
+
+publisher = None
+
+
+def on_starting(server):
+    global publisher
+    if os.environ.get("DASHBOARD_SHARED", "0") != "1":
+        return
+
+    import shared_arrays
+    root = os.environ.setdefault("DASHBOARD_SHARED_DIR", shared_arrays.default_root())
+    # A plain subprocess rather than multiprocessing: forked workers must not
+    # inherit it as a child they would try to join on exit
+    publisher = subprocess.Popen([sys.executable, shared_arrays.__file__, root],
+                                 cwd=os.path.dirname(os.path.abspath(shared_arrays.__file__)))
+    server.log.info("Shared snapshot publisher started (pid %s, %s)", publisher.pid, root)
+
+
+def post_worker_init(worker):
+    # Each worker starts its own loader (or shared-snapshot poller) once the app is loaded
+    import app
+    app.start()
+
+
+def on_exit(server):
+    if publisher is not None and publisher.poll() is None:
+        publisher.terminate()
@@ -0,0 +1,160 @@
+
+#### instrumentation
+# Timing spans and counters for the hot paths, served in the Prometheus text
+# format on /metrics. Off unless DASHBOARD_METRICS=1: span() then hands back a
+# shared no-op context, timed() returns the function undecorated and inc() /
+# observe() return straight away, so production pays one flag check at most.
+#
+# Each gunicorn worker keeps its own registry; scrape every worker (or use one
+# worker per scrape target) to see them all.
+
+import os
+import time
+import threading
+from contextlib import nullcontext
+from functools import wraps
+from flask import Response, request, g
+
+ENABLED = os.environ.get("DASHBOARD_METRICS", "0") == "1"
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_histograms = {}   # (name, labels) -> [count per bucket..., +Inf count, sum]
+_counters = {}     # (name, labels) -> value
+_collectors = []   # callables returning [(name, labels, value)] of counters read at scrape time
+_disabled = nullcontext()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, seconds, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+                break
+        else:
+            h[len(BUCKETS)] += 1
+        h[-1] += seconds
+
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class Span:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe("dashboard_span_seconds", time.perf_counter() - self.start, span=self.name, **self.labels)
+        return False
+
+
+def span(name, **labels):
+    return Span(name, labels) if ENABLED else _disabled
+
+
+def timed(name, **labels):
+    # Decorator form of span(); a no-op when instrumentation is off
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(name, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def collect(fn):
+    # Register a callable read at scrape time, for counters owned elsewhere
+    # (e.g. cache hit counts) that should not be touched on the hot path
+    _collectors.append(fn)
+    return fn
+
+
+# --- Exposition ---
+def _labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in items) + "}"
+
+
+def render():
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+    for fn in _collectors:
+        for name, labels, value in fn():
+            counters[_key(name, labels)] = value
+
+    lines, typed = [], set()
+    for (name, labels), h in sorted(histograms.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), h[:-1]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {h[-1]:.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    for (name, labels), value in sorted(counters.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def install(server, path="/metrics", callback_path="/_dash-update-component"):
+    # /metrics plus per-callback request time and response bytes, keyed by the
+    # callback's output (pattern-matching outputs keep their pattern, so the
+    # label set stays bounded). Nothing is installed when disabled.
+    if not ENABLED:
+        return
+
+    @server.route(path)
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+    @server.before_request
+    def start_timer():
+        if request.path == callback_path:
+            g.instrumentation_start = time.perf_counter()
+
+    @server.after_request
+    def record_callback(response):
+        start = g.pop("instrumentation_start", None)
+        if start is not None:
+            body = request.get_json(silent=True) or {}
+            output = body.get("output", "")
+            observe("dashboard_callback_seconds", time.perf_counter() - start, output=output)
+            inc("dashboard_callback_requests_total", output=output, status=response.status_code)
+            if not response.direct_passthrough:
+                inc("dashboard_payload_bytes_total", response.content_length or 0, output=output)
+        return response
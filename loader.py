@@ -0,0 +1,112 @@
+
+#### background loader
+# Runs a slow build function off the request path so workers can start serving
+# straight away, then keeps re-running it on a schedule. Each finished result
+# is published with a single reference swap, so readers never wait on a build.
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN, MARKET_CLOSE = dtime(9, 30), dtime(16, 0)
+REFRESH_MARKET_SECONDS = float(os.environ.get("REFRESH_MARKET_SECONDS", "300"))
+REFRESH_OFF_HOURS_SECONDS = float(os.environ.get("REFRESH_OFF_HOURS_SECONDS", "3600"))
+
+
+def market_hours_interval(now=None):
+    # Tighter refresh while NYSE is open, looser overnight and at weekends
+    now = datetime.now(MARKET_TZ) if now is None else now.astimezone(MARKET_TZ)
+    if now.weekday() < 5 and MARKET_OPEN <= now.time() <= MARKET_CLOSE:
+        return REFRESH_MARKET_SECONDS
+    return REFRESH_OFF_HOURS_SECONDS
+
+
+class BackgroundLoader:
+    def __init__(self, build, refresh_interval=None, retry_delay=5.0, max_retry_delay=300.0):
+        # build(progress, previous) -> result, where progress(stage, fraction) reports
+        # how far it got and previous is the currently published result (or None).
+        # refresh_interval() -> seconds until the next rebuild; None loads only once.
+        self.build = build
+        self.refresh_interval = refresh_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.result = None
+        self._status = {"state": "idle", "stage": None, "progress": 0.0, "error": None,
+                        "attempts": 0, "refreshes": 0, "last_refresh": None, "next_refresh": None}
+        self._started_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._started_at = time.time()
+                self._thread = threading.Thread(target=self._run, name="dashboard-loader", daemon=True)
+                self._thread.start()
+        return self
+
+    def seed(self, result):
+        # Publish a prebuilt result (e.g. a snapshot artifact) before start();
+        # the first build then waits for the refresh schedule
+        self._publish(result)
+        return self
+
+    def load_now(self):
+        # Eager mode: build on the calling thread and let errors propagate
+        self._started_at = time.time()
+        self._publish(self.build(self._progress, None))
+        return self.result
+
+    @property
+    def ready(self):
+        return self.result is not None
+
+    def status(self):
+        status = dict(self._status, version=getattr(self.result, "version", None))
+        if self._started_at is not None:
+            status["elapsed"] = round(time.time() - self._started_at, 3)
+        return status
+
+    def _progress(self, stage, fraction):
+        # While refreshing, the previous result is still published and served
+        state = "refreshing" if self.ready else "loading"
+        self._status = dict(self._status, state=state, stage=stage, progress=round(fraction, 3))
+
+    def _publish(self, result):
+        self.result = result
+        self._status = dict(self._status, state="ready", stage=None, progress=1.0, error=None,
+                            last_refresh=time.time())
+
+    def _run(self):
+        if not self.ready:
+            self._load_until_ready()
+        while self.refresh_interval is not None:
+            wait = self.refresh_interval()
+            self._status = dict(self._status, next_refresh=time.time() + wait)
+            time.sleep(wait)
+            try:
+                self._publish(self.build(self._progress, self.result))
+                self._status = dict(self._status, refreshes=self._status["refreshes"] + 1)
+            except Exception as e:
+                # Keep serving the last good result until the next scheduled attempt
+                logger.exception("Dashboard data refresh failed")
+                self._status = dict(self._status, state="ready", stage=None, error=str(e))
+
+    def _load_until_ready(self):
+        delay = self.retry_delay
+        while True:
+            self._status = dict(self._status, attempts=self._status["attempts"] + 1)
+            try:
+                self._publish(self.build(self._progress, None))
+                return
+            except Exception as e:
+                logger.exception("Dashboard data load failed, retrying in %.0fs", delay)
+                self._status = dict(self._status, state="error", error=str(e))
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
@@ -0,0 +1,141 @@
+
+#### metrics kernel
+# Batched metrics over a (T x N) returns matrix (portfolio included as a
+# column) for several window sizes at once. Rolling sums come from prefix
+# sums, quantiles from a partition over strided window views, and rolling
+# correlations from a chunked cross-product recurrence, so there is no
+# per-ticker or per-pair Python loop. Work is split into time chunks so peak
+# memory stays around chunk_bytes whatever N and T are.
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+CHUNK_BYTES = 64 << 20
+
+
+def cumulative_and_drawdowns(returns):
+    cumulative = np.cumprod(1 + returns, axis=0)
+    drawdowns = cumulative / np.maximum.accumulate(cumulative, axis=0) - 1
+    return cumulative, drawdowns
+
+
+def rolling_kernel(returns, windows=(30,), quantile=0.05, pairs=None, full_corr=False,
+                   chunk_bytes=CHUNK_BYTES):
+    # returns: (T, N) array without NaNs. pairs: list of (i, j) column indices
+    # whose rolling correlation is wanted. full_corr=True also returns the
+    # whole (T, N, N) tensor as float32 (T*N*N*4 bytes, so size it with care).
+    # Returns {window: metrics}; cumulative returns and drawdowns don't depend
+    # on the window and come from cumulative_and_drawdowns
+    returns = np.asarray(returns, dtype=float)
+    T, N = returns.shape
+    result = {}
+
+    # Rolling moments are shift-invariant, so centre first for accuracy
+    shift = returns.mean(axis=0)
+    x = returns - shift
+    cs = np.vstack([np.zeros(N), np.cumsum(x, axis=0)])
+    cs2 = np.vstack([np.zeros(N), np.cumsum(x * x, axis=0)])
+    if pairs:
+        pi, pj = np.array(pairs).T
+        csp = np.vstack([np.zeros(len(pairs)), np.cumsum(x[:, pi] * x[:, pj], axis=0)])
+
+    for w in windows:
+        out = {k: np.full((T, N), np.nan) for k in ("mean", "std", "sharpe", "var")}
+        if pairs is not None:
+            # Present whenever pairs are asked for, (T, 0) when the list is empty
+            out["pair_corr"] = np.full((T, len(pairs)), np.nan)
+        if T >= w:
+            s = cs[w:] - cs[:-w]
+            s2 = cs2[w:] - cs2[:-w]
+            mean = s / w
+            var = np.maximum((s2 - s * mean) / (w - 1), 0.0)
+            out["mean"][w - 1:] = mean + shift
+            out["std"][w - 1:] = np.sqrt(var)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out["sharpe"][w - 1:] = out["mean"][w - 1:] / out["std"][w - 1:]
+            out["var"][w - 1:] = rolling_quantile(returns, w, quantile, chunk_bytes)
+
+            if pairs:
+                sp = csp[w:] - csp[:-w]
+                cov = sp - s[:, pi] * s[:, pj] / w
+                sd = np.sqrt(var * (w - 1))
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    out["pair_corr"][w - 1:] = cov / (sd[:, pi] * sd[:, pj])
+            if full_corr:
+                out["corr"] = rolling_corr_tensor(x, w, chunk_bytes)
+        result[w] = out
+    return result
+
+
+def rolling_quantile(returns, w, q, chunk_bytes=CHUNK_BYTES):
+    # Linear interpolation between order statistics, as pandas rolling().quantile()
+    T, N = returns.shape
+    views = sliding_window_view(returns, w, axis=0)  # (T-w+1, N, w), no copy
+    h = q * (w - 1)
+    lo = int(np.floor(h))
+    hi = min(lo + 1, w - 1)
+    frac = h - lo
+
+    out = np.empty((T - w + 1, N))
+    step = max(1, chunk_bytes // (N * w * 8))
+    for a in range(0, T - w + 1, step):
+        part = np.partition(views[a:a + step], [lo, hi], axis=-1)
+        out[a:a + step] = part[..., lo] + (part[..., hi] - part[..., lo]) * frac
+    return out
+
+
+def rolling_corr_tensor(x, w, chunk_bytes=CHUNK_BYTES):
+    # C[t] = sum of x_k x_k^T over the window ending at t, advanced chunk by chunk:
+    # cumsum of (new outer product - dropped outer product) on top of an exact
+    # window cross-product recomputed at each chunk start
+    T, N = x.shape
+    out = np.full((T, N, N), np.nan, dtype=np.float32)
+    if T < w:
+        return out
+    step = max(1, chunk_bytes // (N * N * 8 * 2))
+    cs = np.vstack([np.zeros(N), np.cumsum(x, axis=0)])
+
+    for a in range(w - 1, T, step):
+        b = min(a + step, T)
+        window = x[a - w + 1:a + 1]
+        base = window.T @ window
+        if b - a > 1:
+            added = x[a + 1:b]
+            dropped = x[a + 1 - w:b - w]
+            delta = added[:, :, None] * added[:, None, :] - dropped[:, :, None] * dropped[:, None, :]
+            cross = np.concatenate([base[None], base + np.cumsum(delta, axis=0)])
+        else:
+            cross = base[None]
+        s = cs[a + 1:b + 1] - cs[a + 1 - w:b + 1 - w]
+        cov = cross - s[:, :, None] * s[:, None, :] / w
+        sd = np.sqrt(np.maximum(np.diagonal(cov, axis1=1, axis2=2), 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[a:b] = cov / (sd[:, :, None] * sd[:, None, :])
+    return out
+
+
+def cluster_order(corr):
+    # Leaf order of an average-linkage clustering on 1 - correlation, for
+    # heatmaps. When two clusters merge, they are joined at their most
+    # correlated ends. O(N²) work per merge, without scipy.
+    n = len(corr)
+    base = 1 - np.nan_to_num(np.asarray(corr, dtype=float), nan=0.0)
+    dist = base.copy()
+    np.fill_diagonal(dist, np.inf)
+    sizes = np.ones(n)
+    members = [[i] for i in range(n)]
+    root = 0
+    for _ in range(n - 1):
+        a, b = divmod(int(np.argmin(dist)), n)
+        merged = (dist[a] * sizes[a] + dist[b] * sizes[b]) / (sizes[a] + sizes[b])
+        dist[a], dist[:, a] = merged, merged
+        dist[b], dist[:, b] = np.inf, np.inf
+        dist[a, a] = np.inf
+
+        left, right = members[a], members[b]
+        joins = [(left, right), (left, right[::-1]), (left[::-1], right), (right, left)]
+        left, right = min(joins, key=lambda p: base[p[0][-1], p[1][0]])
+        members[a], members[b] = left + right, None
+        sizes[a] += sizes[b]
+        root = a
+    return members[root]
@@ -0,0 +1,178 @@
+
+#### optimizer
+# Long-only portfolio optimisation over rolling windows of daily returns:
+# the mean-variance efficient frontier, minimum variance, maximum Sharpe and
+# equal-risk-contribution (risk parity) weights. Plain NumPy, no solver
+# dependency: frontier points solve min w'Σw - γ μ'w on the simplex by
+# accelerated projected gradient, one γ per point. Max Sharpe is a golden-section
+# search over log γ along that frontier, and risk parity uses cyclical
+# coordinate descent.
+#
+# Every solver works on a batch of windows at once (leading axis K), so the
+# Python overhead per iteration is shared by the whole batch; batches are
+# spread over a process pool.
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+_pool = None
+_pool_workers = 0
+
+
+def project_simplex(v):
+    # Row-wise Euclidean projection onto {w >= 0, sum(w) = 1}
+    u = -np.sort(-v, axis=-1)
+    css = np.cumsum(u, axis=-1) - 1
+    k = np.arange(1, v.shape[-1] + 1)
+    rho = (u - css / k > 0).sum(axis=-1)
+    theta = np.take_along_axis(css, rho[..., None] - 1, axis=-1) / rho[..., None]
+    return np.maximum(v - theta, 0.0)
+
+
+def min_risk(cov, mean, gamma, lipschitz, w0=None, iters=5000, tol=1e-7):
+    # argmin w'Σw - γ μ'w over the long-only simplex for each window
+    # (FISTA with adaptive restart). cov (K, N, N), mean (K, N), gamma (K,).
+    # Windows drop out of the batch as they converge.
+    K, n = mean.shape
+    x = np.full((K, n), 1.0 / n) if w0 is None else w0.copy()
+    active = np.arange(K)
+    y, t = x.copy(), np.ones(K)
+    C, step_size, pull = cov, 1 / lipschitz[:, None], gamma[:, None] * mean
+    for _ in range(iters):
+        grad = 2 * np.matmul(C, y[:, :, None])[:, :, 0] - pull
+        x_new = project_simplex(y - grad * step_size)
+        step = x_new - x[active]
+        # Restart momentum where it points uphill
+        restart = np.einsum("ki,ki->k", y - x_new, step) > 0
+        t_new = np.where(restart, 1.0, (1 + np.sqrt(1 + 4 * t * t)) / 2)
+        y = x_new + np.where(restart, 0.0, (t - 1) / t_new)[:, None] * step
+        x[active], t = x_new, t_new
+
+        moving = np.abs(step).max(axis=1) >= tol
+        if not moving.any():
+            break
+        if moving.sum() <= 0.75 * len(moving):
+            # Compacting copies the covariances, so only do it once enough have converged
+            active, y, t = active[moving], y[moving], t[moving]
+            C, step_size, pull = C[moving], step_size[moving], pull[moving]
+    return x
+
+
+def risk_parity(cov, iters=500, tol=1e-10):
+    # Minimises ½ w'Σw - Σ log(w_i) / n, whose solution has w_i (Σw)_i equal for all i
+    K, n, _ = cov.shape
+    diag = np.diagonal(cov, axis1=1, axis2=2)
+    w = 1 / np.sqrt(diag)
+    w /= w.sum(axis=1, keepdims=True)
+    for _ in range(iters):
+        previous = w.copy()
+        for i in range(n):
+            b = np.einsum("kj,kj->k", cov[:, i], w) - diag[:, i] * w[:, i]
+            w[:, i] = (-b + np.sqrt(b * b + 4 * diag[:, i] / n)) / (2 * diag[:, i])
+        if (np.abs(w - previous).max(axis=1) < tol * w.max(axis=1)).all():
+            break
+    return w / w.sum(axis=1, keepdims=True)
+
+
+def sharpe(w, cov, mean):
+    vol = np.sqrt(np.maximum(np.einsum("ki,kij,kj->k", w, cov, w), 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(vol > 0, np.einsum("ki,ki->k", w, mean) / vol, -np.inf)
+
+
+def solve_windows(task):
+    # task: (mean (K, N), cov (K, N, N), frontier points). Returns per-window
+    # weights for each strategy, plus the frontier (K, P, N) when points > 0.
+    mean, cov, points = task
+    K = len(mean)
+    rows = np.arange(K)
+    lipschitz = 2 * np.linalg.eigvalsh(cov)[:, -1] + 1e-18
+    scale = lipschitz / np.maximum(np.abs(mean).max(axis=1), 1e-18)
+    grid = np.concatenate([[0.0], np.geomspace(1e-4, 10, max(points, 8) - 1)])
+    gammas = scale[:, None] * grid[None, :]                                      # (K, G)
+
+    # Frontier from minimum variance (γ = 0) to the highest-return corner, warm started
+    weights, w = [], None
+    for g in range(len(grid)):
+        w = min_risk(cov, mean, gammas[:, g], lipschitz, w)
+        weights.append(w)
+    weights = np.stack(weights, axis=1)                                          # (K, G, N)
+    ratios = np.stack([sharpe(weights[:, g], cov, mean) for g in range(len(grid))], axis=1)
+
+    # Golden-section search in log γ for the best Sharpe ratio between the best
+    # grid point's neighbours (Sharpe is unimodal along the frontier)
+    best = ratios.argmax(axis=1)
+    w_best, s_best = weights[rows, best], ratios[rows, best]
+    lo = np.log(np.maximum(gammas[rows, np.maximum(best - 1, 0)], gammas[:, 1] * 1e-2))
+    hi = np.log(gammas[rows, np.minimum(best + 1, len(grid) - 1)])
+
+    def evaluate(log_gamma):
+        nonlocal w_best, s_best
+        w = min_risk(cov, mean, np.exp(log_gamma), lipschitz, w_best)
+        s = sharpe(w, cov, mean)
+        better = s > s_best
+        w_best = np.where(better[:, None], w, w_best)
+        s_best = np.where(better, s, s_best)
+        return s
+
+    golden = (np.sqrt(5) - 1) / 2
+    a, b = hi - golden * (hi - lo), lo + golden * (hi - lo)
+    fa, fb = evaluate(a), evaluate(b)
+    for _ in range(8):
+        left = fa >= fb
+        hi, lo = np.where(left, b, hi), np.where(left, lo, a)
+        # The kept interior point carries over; one new probe per window
+        probe = np.where(left, hi - golden * (hi - lo), lo + golden * (hi - lo))
+        f_probe = evaluate(probe)
+        a, fa, b, fb = (np.where(left, probe, b), np.where(left, f_probe, fb),
+                        np.where(left, a, probe), np.where(left, fa, f_probe))
+
+    result = {"min_variance": weights[:, 0], "max_sharpe": w_best, "risk_parity": risk_parity(cov)}
+    if points:
+        result["frontier"] = {
+            "vol": np.sqrt(np.maximum(np.einsum("kpi,kij,kpj->kp", weights, cov, weights), 0.0)),
+            "ret": np.einsum("kpi,ki->kp", weights, mean),
+            "weights": weights,
+        }
+    return result
+
+
+def get_pool(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        # spawn, not fork: the dashboard process runs loader and server threads
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _pool_workers = workers
+    return _pool
+
+
+def optimize(returns, window=252, step=21, frontier_points=25, workers=None):
+    # Solves every `step` rows over trailing `window`-row windows. The latest
+    # window gets the full frontier on its own; the rest are split into one
+    # batch per worker. Returns {"ends": row after each window, "min_variance",
+    # "max_sharpe", "risk_parity": (K, N) weights, "frontier": latest window's}
+    R = np.asarray(returns, dtype=float)
+    T, N = R.shape
+    window = min(window, T)
+    ends = np.arange(T, window - 1, -step)[::-1]
+    views = np.stack([R[e - window:e] for e in ends])                           # (K, window, N)
+    mean = views.mean(axis=1)
+    centred = views - mean[:, None, :]
+    cov = np.einsum("kti,ktj->kij", centred, centred) / max(window - 1, 1)
+
+    workers = min(4, os.cpu_count() or 1) if workers is None else workers
+    batches = max(1, min(workers, len(ends) - 1))
+    tasks = [(mean[-1:], cov[-1:], frontier_points)]
+    tasks += [(m, c, 0) for m, c in zip(np.array_split(mean[:-1], batches), np.array_split(cov[:-1], batches)) if len(m)]
+    if workers > 1:
+        results = list(get_pool(workers).map(solve_windows, tasks))
+    else:
+        results = [solve_windows(task) for task in tasks]
+
+    latest, rest = results[0], results[1:]
+    out = {"ends": ends, "frontier": {k: v[0] for k, v in latest["frontier"].items()}}
+    for key in ("min_variance", "max_sharpe", "risk_parity"):
+        out[key] = np.concatenate([r[key] for r in rest] + [latest[key]])
+    return out
@@ -0,0 +1,95 @@
+
+#### payload cache
+# Serves repeat Dash callback responses from pre-compressed bytes. The first
+# response for a key is captured after Dash has serialized it; later requests
+# with the same key skip the callback and the Plotly JSON encode entirely.
+# Keys include the data snapshot version, so a refresh naturally misses.
+# Dash sends callbacks as POSTs, which browsers never revalidate, so there is
+# no ETag / 304 path: the saving is the skipped callback, encode and compression.
+
+import gzip
+import threading
+from collections import OrderedDict
+from flask import request, g, Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+class PayloadCache:
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def put(self, key, raw, mimetype):
+        entry = {
+            "raw": raw,
+            "gzip": gzip.compress(raw, compresslevel=6),
+            "br": brotli.compress(raw) if brotli is not None else None,
+            "mimetype": mimetype,
+        }
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+
+def respond(entry):
+    headers = {"Vary": "Accept-Encoding"}
+    accepted = request.accept_encodings
+    if entry["br"] is not None and accepted["br"]:
+        body, headers["Content-Encoding"] = entry["br"], "br"
+    elif accepted["gzip"]:
+        body, headers["Content-Encoding"] = entry["gzip"], "gzip"
+    else:
+        body = entry["raw"]
+    return Response(body, mimetype=entry["mimetype"], headers=headers)
+
+
+def install(server, cache, output, key_for, path="/_dash-update-component"):
+    # output: the Dash callback output string to cache (body["output"]);
+    # key_for(body) -> hashable key, or None to let the request through uncached
+    pending_attr = f"payload_cache_{id(cache)}"
+
+    @server.before_request
+    def serve_cached_payload():
+        if request.method != "POST" or not request.path.endswith(path):
+            return None
+        body = request.get_json(silent=True)
+        if not body or body.get("output") != output:
+            return None
+        key = key_for(body)
+        if key is None:
+            return None
+        entry = cache.get(key)
+        if entry is not None:
+            return respond(entry)
+        setattr(g, pending_attr, (key, body))
+
+    @server.after_request
+    def store_payload(response):
+        pending = g.pop(pending_attr, None)
+        if pending is None or response.status_code != 200 or response.direct_passthrough:
+            return response
+        key, body = pending
+        # Only keep it if the snapshot did not change while the callback ran
+        if key_for(body) == key and not response.headers.get("Content-Encoding"):
+            cache.put(key, response.get_data(), response.mimetype)
+        return response
@@ -0,0 +1,147 @@
+
+#### period statistics
+# Statistics for any date range of a (T x N) returns matrix, answered without
+# touching the rows inside the range:
+#   cumulative return   prefix sums of log returns, O(1)
+#   volatility, Sharpe  prefix sums of centred returns and squares, O(1)
+#   rolling averages    prefix sums of each rolling series and of its valid counts, O(1)
+#   max drawdown        a sparse table of (peak, trough, worst drop) over
+#                       power-of-two blocks of the log price, merged left to
+#                       right over at most log2(T) consecutive blocks, O(log T)
+#   correlation         centred cross-products summed at checkpoints every
+#                       `stride` rows, so a range is two checkpoints plus at
+#                       most 2 * stride edge rows, O(N² stride)
+# Dates map to rows by binary search on the index. Everything is built once
+# per snapshot; the checkpoint stride keeps the cross-product table within
+# table_bytes whatever N and T are.
+
+import numpy as np
+import pandas as pd
+
+
+def row_range(index, start, end):
+    # [a, b) rows of a sorted DatetimeIndex falling on start..end inclusive (None = open)
+    times = index.values
+    a = 0 if start is None else int(np.searchsorted(times, np.datetime64(pd.Timestamp(start)), "left"))
+    b = len(times) if end is None else int(np.searchsorted(times, np.datetime64(pd.Timestamp(end)), "right"))
+    return a, b
+
+
+def prefix(x):
+    return np.vstack([np.zeros((1,) + x.shape[1:]), np.cumsum(x, axis=0)])
+
+
+class PeriodStats:
+    # returns: (T x N) frame; series: {name: (T x N) frame on the same rows}
+    # whose range means are wanted (e.g. rolling volatility, NaN where undefined)
+    def __init__(self, returns, series=None):
+        self.index = returns.index
+        self.columns = list(returns.columns)
+        R = np.asarray(returns.values, dtype=float)
+        # Log price level at each point, point t being the close before row t
+        self.level = prefix(np.log1p(R))
+        # Moments are shift-invariant, so centre first for accuracy
+        self.shift = R.mean(axis=0)
+        x = R - self.shift
+        self.cs, self.cs2 = prefix(x), prefix(x * x)
+        self.series = {}
+        for name, frame in (series or {}).items():
+            values = np.asarray(frame.values, dtype=float)
+            valid = ~np.isnan(values)
+            self.series[name] = (prefix(np.where(valid, values, 0.0)), prefix(valid.astype(float)))
+        self.table = drop_table(self.level)
+
+    def query(self, start=None, end=None):
+        # {stat: Series by column} for the rows dated start..end, or None if the range is empty
+        a, b = row_range(self.index, start, end)
+        n = b - a
+        if n < 1:
+            return None
+        s = self.cs[b] - self.cs[a]
+        mean = s / n
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std = np.sqrt(np.maximum((self.cs2[b] - self.cs2[a] - s * mean) / (n - 1), 0.0)) if n > 1 \
+                else np.full(len(self.columns), np.nan)
+            stats = {
+                "cumulative": np.expm1(self.level[b] - self.level[a]),
+                "max_drawdown": np.expm1(-worst_drop(self.table, a, b)),
+                "volatility": std,
+                "sharpe": (mean + self.shift) / std,
+            }
+            for name, (total, count) in self.series.items():
+                stats[name] = (total[b] - total[a]) / (count[b] - count[a])
+        out = {k: pd.Series(v, index=self.columns) for k, v in stats.items()}
+        out.update(start=self.index[a], end=self.index[b - 1], rows=n)
+        return out
+
+
+# --- Max Drawdown ---
+def drop_table(level):
+    # Level k holds, for each run of points p..p + 2**k, its highest level,
+    # lowest level and worst peak-to-later-trough drop. Level k at p merges
+    # level k-1 at p and at p + 2**(k-1), which share their middle point.
+    first, second = level[:-1], level[1:]
+    table = [(np.maximum(first, second), np.minimum(first, second), np.maximum(first - second, 0.0))]
+    width = 1
+    while 2 * width < len(level):
+        hi, lo, drop = table[-1]
+        n = len(hi) - width
+        table.append((
+            np.maximum(hi[:n], hi[width:]),
+            np.minimum(lo[:n], lo[width:]),
+            np.maximum(np.maximum(drop[:n], drop[width:]), hi[:n] - lo[width:]),
+        ))
+        width *= 2
+    return table
+
+
+def worst_drop(table, a, b):
+    # Worst drop over points a..b (rows a..b-1 and the close before them):
+    # at most log2(T) runs of decreasing size, each starting where the last ended
+    peak, drop, p = None, None, a
+    while p < b:
+        k = min((b - p).bit_length() - 1, len(table) - 1)
+        hi, lo, d = (part[p] for part in table[k])
+        if peak is None:
+            peak, drop = hi, d
+        else:
+            drop = np.maximum(np.maximum(drop, d), peak - lo)
+            peak = np.maximum(peak, hi)
+        p += 1 << k
+    return drop
+
+
+# --- Correlation ---
+class PeriodCorrelation:
+    def __init__(self, returns, table_bytes=16 << 20):
+        self.index = returns.index
+        self.columns = list(returns.columns)
+        R = np.asarray(returns.values, dtype=float)
+        T, N = R.shape
+        self.x = R - R.mean(axis=0)
+        self.cs = prefix(self.x)
+        self.stride = max(1, -(-(T + 1) * N * N * 8 // table_bytes))
+        # Cross-product sums over rows [0, k * stride), one N x N matrix per checkpoint
+        blocks = [self.x[i:i + self.stride].T @ self.x[i:i + self.stride] for i in range(0, T, self.stride)]
+        self.checkpoints = prefix(np.asarray(blocks).reshape(-1, N, N)) if blocks else np.zeros((1, N, N))
+
+    def cross(self, a, b):
+        # Sum of x_t x_t^T over rows [a, b)
+        ca, cb = -(-a // self.stride), b // self.stride
+        if ca >= cb:
+            return self.x[a:b].T @ self.x[a:b]
+        head, tail = self.x[a:ca * self.stride], self.x[cb * self.stride:b]
+        return self.checkpoints[cb] - self.checkpoints[ca] + head.T @ head + tail.T @ tail
+
+    def query(self, start=None, end=None):
+        # Correlation frame for the rows dated start..end, or None with fewer than two rows
+        a, b = row_range(self.index, start, end)
+        n = b - a
+        if n < 2:
+            return None
+        s = self.cs[b] - self.cs[a]
+        cov = self.cross(a, b) - np.outer(s, s) / n
+        sd = np.sqrt(np.maximum(np.diag(cov), 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = np.clip(cov / np.outer(sd, sd), -1.0, 1.0)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
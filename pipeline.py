@@ -0,0 +1,990 @@
+
+#### data pipeline
+# Market data, metrics and figures for the dashboard. Nothing here runs at
+# import; build_snapshot() does the whole pass and reports progress as it goes.
+
+import os
+import json
+import time
+import logging
+import threading
+import base64
+import hashlib
+import colorsys
+from itertools import combinations
+import pandas as pd
+import numpy as np
+import plotly.graph_objs as go
+import shared_arrays
+from price_store import PriceStore
+from data_sources import make_source
+from rolling import RollingStats
+from ring_store import RingSeries
+from portfolio import portfolio_nav, window_moments
+from optimizer import optimize
+from risk import rolling_var as var_engine
+from metrics import rolling_kernel, cumulative_and_drawdowns, cluster_order
+from period_stats import PeriodStats, PeriodCorrelation
+from relative import relative_stats
+from downsample import downsample_figure
+from config import load_config
+from instrumentation import span, timed, inc
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+tickers = config["tickers"]
+weights = config["weights"]
+
+# Local cache of daily closes; only bars after the last cached date hit the source
+price_store = PriceStore(fetch=make_source(config["data_source"]))
+
+# Set (by gunicorn.conf.py) when workers attach to a shared snapshot
+SHARED_DIR = os.environ.get("DASHBOARD_SHARED_DIR")
+
+
+# --- Color Themes ---
+kpi_colors = ["#364c84", "#95b1ee", "#fffdf5"]
+pastel_colors = ["#364c84", "#95b1ee", "#fffdf5"]
+line_palette = ["#b8b8f3", "#7db9e8", "#003f5c"]
+pair_palette = ["#b8b8f3", "#7db9e8", "#003f5c", "#cc8963", "#a1c181", "#6f1d1b"]
+
+
+def generate_colors(n, palette):
+    # The hand-picked palette first, then evenly spread hues (golden angle)
+    colors = list(palette[:n])
+    for i in range(n - len(colors)):
+        r, g, b = colorsys.hls_to_rgb((i * 0.381966) % 1.0, 0.55, 0.55)
+        colors.append(f"#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}")
+    return colors
+
+
+def fill_color(color, alpha=0.2):
+    r, g, b = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+    return f"rgba({r}, {g}, {b}, {alpha})"
+
+
+ticker_colors = dict(zip(tickers, generate_colors(len(tickers), line_palette)))
+ticker_fillcolors = {t: fill_color(c) for t, c in ticker_colors.items()}
+rolling_colors = dict(ticker_colors, Portfolio="#111111")
+rolling_fillcolors = dict(ticker_fillcolors, Portfolio="rgba(0, 0, 0, 0.1)")
+
+
+def select_correlation_pairs(matrix, limit):
+    # Every ticker pair plus each ticker against the portfolio while that is
+    # few enough to draw; beyond that, the `limit` most correlated pairs
+    names = list(matrix.columns)
+    candidates = list(combinations(tickers, 2)) + [(t, "Portfolio") for t in tickers]
+    if len(candidates) <= limit:
+        return candidates
+
+    corr = np.corrcoef(matrix.values, rowvar=False)
+    i, j = np.triu_indices(len(names), k=1)
+    top = np.argsort(-np.abs(np.nan_to_num(corr[i, j])), kind="stable")[:limit]
+    return [(names[i[k]], names[j[k]]) for k in top]
+
+
+def kpi_tickers():
+    # KPI cards for the largest holdings only, so the page stays readable
+    order = sorted(range(len(tickers)), key=lambda i: -weights[i])[:config["max_kpi_tickers"]]
+    return [tickers[i] for i in sorted(order)]
+
+
+class Snapshot:
+    # Everything the pages need from one pipeline run. A published snapshot is
+    # never modified: a refresh builds a new one and it is swapped in whole.
+    # Figures and page layouts are derived lazily on first use and memoized on
+    # the snapshot, so they live exactly as long as the data they were built from.
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+        self.__dict__["_memo"] = {}
+        self.__dict__["_memo_lock"] = threading.Lock()
+        self.__dict__["_memo_building"] = {}
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot is immutable, use replace()")
+
+    def replace(self, **fields):
+        own = {k: v for k, v in self.__dict__.items() if k not in ("_memo", "_memo_lock", "_memo_building")}
+        return Snapshot(**dict(own, **fields))
+
+    def memo(self, key, build):
+        # Single flight: concurrent callers for one key wait for the first build,
+        # while builds of different keys run in parallel
+        kind, name = key if isinstance(key, tuple) else (key, "")
+        with self._memo_lock:
+            cached = key in self._memo
+            value = self._memo.get(key)
+            if not cached:
+                building = self._memo_building.setdefault(key, threading.Lock())
+        if cached:
+            inc("dashboard_memo_requests_total", kind=kind, result="hit")
+            return value
+        with building:
+            with self._memo_lock:
+                if key in self._memo:
+                    inc("dashboard_memo_requests_total", kind=kind, result="hit")
+                    return self._memo[key]
+            inc("dashboard_memo_requests_total", kind=kind, result="miss")
+            with span(kind, item=name):
+                value = build()
+            with self._memo_lock:
+                self._memo[key] = value
+                self._memo_building.pop(key, None)
+            return value
+
+    @property
+    def base(self):
+        # The shared snapshot a portfolio view was derived from (itself for the shared one)
+        return self.__dict__.get("base_snapshot", self)
+
+    def shared_memo(self, key, build):
+        # Ticker-only results are memoized on the base, so every portfolio view reuses them
+        return self.base.memo(key, build)
+
+    def figure(self, name):
+        owner = self.base if name in ticker_figures else self
+        return owner.memo(("figure", name), lambda: figure_builders[name](owner))
+
+
+def data_version(price_data, *series):
+    # Content hash, so every worker derives the same version from the same bars
+    digest = hashlib.sha1(price_data.index.values.astype("int64").tobytes())
+    digest.update(np.ascontiguousarray(price_data.values).tobytes())
+    for extra in series:
+        digest.update(np.ascontiguousarray(extra.values, dtype=float).tobytes())
+    return digest.hexdigest()[:12]
+
+
+# --- Price History ---
+# Aligned closes held in a fixed-capacity ring across refreshes, so a
+# long-running process appends only new bars and its memory stays flat
+HISTORY_HEADROOM = 256
+price_history = None
+
+
+def update_price_history(price_data):
+    # Returns price_data as a zero-copy frame over the ring. Bars before the
+    # period start are evicted and bars after the last held one appended; the
+    # ring is rebuilt when the held history no longer matches (other tickers,
+    # or a dividend/split adjustment that rescaled it).
+    global price_history
+    times = price_data.index.values.astype("datetime64[ns]").astype("int64")
+    values = price_data.values
+    h = price_history
+    if h is not None and h.columns == list(price_data.columns) and len(h) and len(times):
+        h.evict_before(times[0])
+        held = h.times()
+        k = int(np.searchsorted(times, held[-1], side="right")) if len(held) else 0
+        # An adjustment rescales the whole history, so the first and last held bars are enough to check
+        if (len(held) == k and np.array_equal(held[[0, -1]], times[[0, k - 1]])
+                and np.allclose(h.values()[[0, -1]], values[[0, k - 1]], rtol=1e-12, equal_nan=True)):
+            h.extend(times[k:], close=values[k:])
+            return h.frame()
+
+    h = RingSeries(price_data.columns, len(times) + HISTORY_HEADROOM)
+    h.extend(times, close=values)
+    price_history = h
+    return h.frame()
+
+
+# --- Utility Function ---
+@timed("get_live_data")
+def get_live_data():
+    # Already aligned across tickers by the store (see price_store.align_prices)
+    with span("fetch"):
+        price_data = update_price_history(
+            price_store.get_prices(tickers, period=config["period"], interval="1d"))
+
+    returns = price_data.pct_change().dropna()
+    # NAV from target weights of capital, rebalanced on the configured schedule.
+    # Comparison weight sets go through the same vectorized call.
+    with span("portfolio_nav"):
+        nav = portfolio_nav(returns, [weights] + config["compare_weights"], config["rebalance"],
+                            config["rebalance_threshold"], config["transaction_cost"])["nav"]
+    portfolio_prices = pd.Series(np.concatenate([[1.0], nav[:, 0]]), index=price_data.index)
+    portfolio_returns = portfolio_prices.pct_change().dropna()
+    portfolio_sets = pd.DataFrame(nav[:, 1:], index=returns.index,
+                                  columns=[f"Alt {i + 1}" for i in range(nav.shape[1] - 1)])
+
+    # Tickers and portfolio go through cumulative_and_drawdowns (metrics.py) together as one matrix
+    with span("cumulative_drawdowns"):
+        cumulative, drawdown = cumulative_and_drawdowns(returns.assign(Portfolio=portfolio_returns).values)
+    cumulative_returns = pd.DataFrame(cumulative[:, :-1], index=returns.index, columns=returns.columns)
+    portfolio_cumulative = pd.Series(cumulative[:, -1], index=returns.index)
+    drawdowns = pd.DataFrame(drawdown[:, :-1], index=returns.index, columns=returns.columns)
+
+    latest_prices = price_data.iloc[-1]
+    daily_returns = returns.iloc[-1]
+    cumulative_returns_latest = cumulative_returns.iloc[-1]
+
+    return (
+        latest_prices, daily_returns, cumulative_returns, cumulative_returns_latest,
+        portfolio_cumulative, drawdowns, returns, price_data,
+        portfolio_prices, portfolio_returns, portfolio_sets
+    )
+
+
+def get_benchmark_returns(price_data, returns):
+    # The benchmark comes through the same price store, in its own request so
+    # a benchmark without prices never holds up the dashboard: its returns are
+    # then NaN, as on days it has no bar (short gaps are carried forward)
+    symbol = config["benchmark"]
+    if not symbol:
+        return pd.Series(np.nan, index=returns.index)
+    try:
+        with span("fetch", item="benchmark"):
+            closes = price_store.get_prices([symbol], period=config["period"], interval="1d")[symbol]
+    except Exception as e:
+        logger.warning("No prices for benchmark %s: %s", symbol, e)
+        return pd.Series(np.nan, index=returns.index, name=symbol)
+    closes = closes.reindex(closes.index.union(price_data.index)).ffill(limit=5).reindex(price_data.index)
+    return (closes / closes.shift(1) - 1).reindex(returns.index).rename(symbol)
+
+
+ROLLING_WINDOW = 30
+# Quantile of the rolling engine's VaR, which is the historical VaR frame
+VAR_QUANTILE = 1 - config["var_confidence"]
+
+# Engine and frames from the last run, so a refresh only pushes the new bars
+_rolling_state = None
+
+
+@timed("rolling_metrics")
+def compute_rolling_metrics(returns, portfolio_returns):
+    global _rolling_state
+    matrix = returns.assign(Portfolio=portfolio_returns)
+
+    state = _rolling_state
+    # The pairs are chosen on a full computation and kept while the engine
+    # extends, so a refresh does not pay for a full-history correlation matrix
+    carried = _can_extend(state, matrix)
+    if carried:
+        pairs = state["pairs"]
+        frames = _extend_rolling(state, matrix, pairs, *carried)
+    else:
+        pairs = select_correlation_pairs(matrix, config["max_corr_pairs"])
+        frames = _full_rolling(matrix, pairs)
+        engine = RollingStats(matrix.columns, window=ROLLING_WINDOW, quantile=VAR_QUANTILE)
+        state = {"engine": engine.seed(matrix.values)}
+    state.update(frames=frames, columns=list(matrix.columns), pairs=pairs, matrix=matrix)
+    _rolling_state = state
+    return frames
+
+
+def _full_rolling(matrix, pairs):
+    # One batched pass over the (T x N+1) matrix for every metric and pair
+    col = {c: i for i, c in enumerate(matrix.columns)}
+    out = rolling_kernel(matrix.values, windows=(ROLLING_WINDOW,), quantile=VAR_QUANTILE,
+                         pairs=[(col[t1], col[t2]) for t1, t2 in pairs])[ROLLING_WINDOW]
+
+    frame = lambda values, columns: pd.DataFrame(values, index=matrix.index, columns=columns)
+    return (
+        frame(out["std"], matrix.columns),
+        frame(out["sharpe"], matrix.columns),
+        frame(out["var"], matrix.columns),
+        frame(out["pair_corr"], [f"{t1}–{t2}" for t1, t2 in pairs]),
+    )
+
+
+def _can_extend(state, matrix):
+    # Same columns, and the new data continues the last run: (start, dirty) as
+    # in _carried_rows, or None for a full pass
+    if state is None or state["columns"] != list(matrix.columns):
+        return None
+    return _carried_rows(state["matrix"], matrix)
+
+
+def _carried_rows(old, matrix):
+    # How matrix continues `old`, the matrix of the last run. Returns
+    # (start, dirty): rows from position `start` on are new, and rows before
+    # `dirty` need recomputing because a window they end changed. That happens
+    # when the history loses head rows: the portfolio NAV then starts later, so
+    # its returns up to the first rebalance move. None when a changed row is
+    # inside the last window (the engine holds it) or rows don't line up
+    last = old.index[-1]
+    if last not in matrix.index or matrix.index[0] > last:
+        return None
+    overlap, prior = matrix.loc[:last], old.loc[matrix.index[0]:]
+    if not overlap.index.equals(prior.index):
+        return None
+    start = len(overlap)
+    same = np.isclose(overlap.values, prior.values, rtol=1e-10, atol=0, equal_nan=True).all(axis=1)
+    changed = np.flatnonzero(~same)
+    if not len(changed):
+        return start, 0
+    if changed[-1] >= start - ROLLING_WINDOW:
+        return None
+    return start, changed[-1] + ROLLING_WINDOW
+
+
+def _extend_rolling(state, matrix, pairs, start, dirty):
+    engine = state["engine"]
+    new_rows = matrix.iloc[start:]
+    col = {c: i for i, c in enumerate(matrix.columns)}
+    vol, sharpe, var, corr = [], [], [], []
+    for row in new_rows.values:
+        engine.push(row)
+        vol.append(engine.std())
+        sharpe.append(engine.sharpe())
+        var.append(engine.var())
+        c = engine.corr()
+        corr.append([c[col[t1], col[t2]] for t1, t2 in pairs])
+
+    # Windows ending on changed head rows only reach back to the start
+    head = _full_rolling(matrix.iloc[:dirty], pairs) if dirty else None
+    frames = []
+    for i, (old, rows) in enumerate(zip(state["frames"], (vol, sharpe, var, corr))):
+        new = pd.DataFrame(rows, index=new_rows.index, columns=old.columns) if rows else old.iloc[:0]
+        frame = pd.concat([old, new]).loc[matrix.index[0]:]
+        # Match a full recompute: no value until a full window fits inside the history
+        frame.iloc[:ROLLING_WINDOW - 1] = np.nan
+        if dirty:
+            frame.iloc[:dirty] = head[i].values
+        frames.append(frame)
+    return tuple(frames)
+
+
+VAR_LABELS = {"historical": "Historical", "gaussian": "Gaussian", "cornish_fisher": "Cornish-Fisher",
+              "monte_carlo": "Monte Carlo"}
+
+
+@timed("var")
+def compute_var(returns, portfolio_returns, assets=True):
+    # VaR and CVaR frames for the tickers (unless assets=False) and the
+    # portfolio, by the configured method. The Portfolio column is always the
+    # NAV-based portfolio_returns. Monte Carlo simulates it jointly with the
+    # tickers even when only it is wanted, so its paths are the same draws
+    alpha = 1 - config["var_confidence"]
+    matrix = returns.assign(Portfolio=portfolio_returns)
+    mc = {}
+    if config["var_method"] == "monte_carlo":
+        mc = dict(paths=config["var_mc_paths"], step=config["var_mc_step"], df=config["var_mc_df"])
+    elif not assets:
+        matrix = matrix[["Portfolio"]]
+    var, cvar = var_engine(matrix.values, ROLLING_WINDOW, alpha, config["var_method"], **mc)
+    frame = lambda values: pd.DataFrame(values, index=matrix.index, columns=matrix.columns)
+    var, cvar = frame(var), frame(cvar)
+    if not assets:
+        return var[["Portfolio"]], cvar[["Portfolio"]]
+    return var, cvar
+
+
+# VaR frames from the last run, so a refresh only computes windows ending on new bars
+_var_state = None
+
+
+def update_var(returns, portfolio_returns, engine_var=None):
+    # compute_var for the pipeline's own refreshes. Windows ending on rows the
+    # last run already covered are carried over, so a refresh costs the new
+    # bars rather than the whole history. engine_var is the rolling engine's
+    # VaR frame, which already is the historical VaR, extended bar by bar
+    global _var_state
+    matrix = returns.assign(Portfolio=portfolio_returns)
+    key = (list(matrix.columns), config["var_method"], config["var_confidence"], config["var_mc_paths"],
+           config["var_mc_step"], config["var_mc_df"])
+    state = _var_state
+    start = dirty = 0
+    # Monte Carlo solves on a step grid counted back from the last row, so a
+    # new bar moves every solve: it is always recomputed in full
+    if config["var_method"] == "monte_carlo":
+        state = None
+    carried = _carried_rows(state["matrix"], matrix) if state is not None and state["key"] == key else None
+    if carried:
+        start, dirty = carried
+    # The first new window reaches ROLLING_WINDOW - 1 rows back
+    lead = max(start - (ROLLING_WINDOW - 1), 0)
+    var, cvar = compute_var(returns.iloc[lead:], portfolio_returns.iloc[lead:])
+    if start:
+        head = compute_var(returns.iloc[:dirty], portfolio_returns.iloc[:dirty]) if dirty else None
+        frames = []
+        for i, (old, new) in enumerate(((state["var"], var), (state["cvar"], cvar))):
+            frame = pd.concat([old, new.iloc[start - lead:]]).loc[matrix.index[0]:]
+            # Match a full recompute: no value until a full window fits inside the history
+            frame.iloc[:ROLLING_WINDOW - 1] = np.nan
+            if dirty:
+                frame.iloc[:dirty] = head[i].values
+            frames.append(frame)
+        var, cvar = frames
+    if config["var_method"] == "historical" and engine_var is not None:
+        var = engine_var
+    _var_state = {"key": key, "var": var, "cvar": cvar, "matrix": matrix}
+    return var, cvar
+
+
+# --- Portfolio Views ---
+# Another weight set over the same snapshot: only the Portfolio column of each
+# frame is recomputed, the per-ticker columns are shared with the base
+# snapshot (pandas copy-on-write keeps them uncopied).
+@timed("portfolio_view")
+def portfolio_snapshot(s, portfolio_id, definition):
+    w = np.asarray(definition["weights"], dtype=float)
+    nav = portfolio_nav(s.returns, [w], definition["rebalance"], definition["rebalance_threshold"],
+                        definition["transaction_cost"])["nav"][:, 0]
+    portfolio_prices = pd.Series(np.concatenate([[1.0], nav]), index=s.price_data.index)
+    portfolio_returns = portfolio_prices.pct_change().dropna()
+
+    # Rolling metrics of the portfolio column and of its pairs with tickers
+    pair_names = [name for name in s.rolling_corr.columns if name.endswith("–Portfolio")]
+    partners = [name[:-len("–Portfolio")] for name in pair_names]
+    matrix = s.returns[partners].assign(Portfolio=portfolio_returns)
+    out = rolling_kernel(matrix.values, windows=(ROLLING_WINDOW,),
+                         pairs=[(i, len(partners)) for i in range(len(partners))])[ROLLING_WINDOW]
+    var, cvar = compute_var(s.returns, portfolio_returns, assets=False)
+
+    column = lambda frame, values: frame.assign(Portfolio=values)
+    frames = dict(
+        portfolio_prices=portfolio_prices, portfolio_returns=portfolio_returns,
+        portfolio_cumulative=pd.Series(np.cumprod(1 + portfolio_returns.values), index=s.returns.index),
+        portfolio_sets=s.portfolio_sets.iloc[:, :0],
+        rolling_volatility=column(s.rolling_volatility, out["std"][:, -1]),
+        rolling_sharpe=column(s.rolling_sharpe, out["sharpe"][:, -1]),
+        rolling_var=column(s.rolling_var, var["Portfolio"].values),
+        rolling_cvar=column(s.rolling_cvar, cvar["Portfolio"].values),
+        rolling_corr=s.rolling_corr.assign(**dict(zip(pair_names, out.get("pair_corr", np.empty((0, 0))).T))),
+    )
+    return s.replace(
+        version=f"{s.version}/{portfolio_id}/{definition['revision']}", base_snapshot=s, stored_figures={},
+        weights=w, portfolio_id=portfolio_id, portfolio_name=definition["name"],
+        rebalance=definition["rebalance"], rebalance_threshold=definition["rebalance_threshold"],
+        **frames
+    )
+
+
+# --- Figures ---
+def adjusted_close_figure(s):
+    fig = go.Figure()
+    for ticker in tickers:
+        fig.add_trace(go.Scatter(
+            x=s.price_data.index,
+            y=s.price_data[ticker],
+            name=ticker,
+            line=dict(width=3, color=ticker_colors[ticker]),
+            fill='tozeroy',
+            fillcolor=ticker_fillcolors[ticker]
+        ))
+    fig.update_layout(title=dict(text="Adjusted Close Prices", x=0.5, xanchor= 'center'), plot_bgcolor="#fffdf5", height = 350, margin=dict(l=10, r=10, t=40, b=10), legend=dict(x=0.15, y=1.00, orientation="h"))
+    return fig
+
+
+def cumulative_returns_figure(s):
+    fig = go.Figure()
+    for ticker in tickers:
+        fig.add_trace(go.Scatter(
+            x=s.cumulative_returns.index,
+            y=s.cumulative_returns[ticker],
+            name=ticker,
+            line=dict(width=3, color=ticker_colors[ticker]),
+            fill='tozeroy',
+            fillcolor=ticker_fillcolors[ticker]
+        ))
+    fig.update_layout(title=dict(text="Cumulative Returns", x=0.5, xanchor='center'), plot_bgcolor="#fffdf5", height = 350, margin=dict(l=10, r=10, t=40, b=10), legend=dict(x=0.15, y=1.00, orientation="h"))
+    return fig
+
+
+def drawdowns_figure(s):
+    fig = go.Figure()
+    for ticker in tickers:
+        fig.add_trace(go.Scatter(
+            x=s.drawdowns.index,
+            y=s.drawdowns[ticker],
+            name=ticker,
+            line=dict(width=3, color=ticker_colors[ticker])
+        ))
+    fig.update_layout(title=dict(text="Drawdowns", x=0.5, xanchor='center'),  plot_bgcolor="#fffdf5", height = 350, margin=dict(l=10, r=10, t=40, b=10), legend=dict(x=0.25, y=1.06, orientation="h"))
+    return fig
+
+
+def heatmap_tickers():
+    # The largest holdings, so a heatmap stays at most max_heatmap_tickers² cells
+    limit = config["max_heatmap_tickers"]
+    if len(tickers) <= limit:
+        return list(tickers)
+    return [tickers[i] for i in sorted(range(len(tickers)), key=lambda i: -weights[i])[:limit]]
+
+
+def correlation_heatmap(correlation, title):
+    # Clustered so correlated groups sit together
+    if len(correlation) < len(tickers):
+        title += f" (top {len(correlation)} holdings)"
+    if len(correlation) > 3:
+        order = cluster_order(correlation.values)
+        correlation = correlation.iloc[order, order]
+
+    fig = go.Figure(data=go.Heatmap(
+        z=correlation.values,
+        x=correlation.columns,
+        y=correlation.index,
+        colorscale='blues'
+    ))
+    fig.update_layout(title=dict(text=title, x=0.5, xanchor='center'), plot_bgcolor="#fffdf5", height = 350, margin=dict(l=10, r=10, t=40, b=10))
+    return fig
+
+
+def correlation_figure(s):
+    shown = heatmap_tickers()
+    return correlation_heatmap(s.correlation.loc[shown, shown], "Correlation Matrix")
+
+
+def portfolio_figure(s):
+    fig = go.Figure()
+    # Comparison weight sets (config "compare_weights") as thin grey lines behind
+    for i, name in enumerate(s.portfolio_sets.columns):
+        fig.add_trace(go.Scatter(
+            x=s.portfolio_sets.index,
+            y=s.portfolio_sets[name],
+            name="Alternative weights" if i == 0 else name,
+            legendgroup="alternatives",
+            showlegend=i == 0,
+            line=dict(color="rgba(120, 120, 120, 0.35)", width=1)
+        ))
+    fig.add_trace(go.Scatter(
+        x=s.portfolio_cumulative.index,
+        y=s.portfolio_cumulative,
+        name='Portfolio',
+        line=dict(color='black', width=3),
+        fill='tozeroy',
+        fillcolor='rgba(0,0,0,0.05)'
+    ))
+
+    for i, ticker in enumerate(tickers):
+        fig.add_trace(go.Scatter(
+            x=s.cumulative_returns.index,
+            y=s.cumulative_returns[ticker],
+            name=ticker,
+            line=dict(width=2, color=ticker_colors[ticker])
+        ))
+
+    fig.update_layout(title=dict(text="Portfolio Performance", x=0.5), margin=dict(t=60, b=20), height=400,
+        plot_bgcolor = "#fffdf5",
+        paper_bgcolor="#bcd3f9",
+        legend=dict(orientation="h", x=0.5, xanchor="center", y=0.99),template="plotly_white")
+    return fig
+
+
+def rolling_vol_figure(s):
+    fig = go.Figure()
+    for t in s.rolling_volatility.columns:
+        fig.add_trace(go.Scatter(
+            x=s.rolling_volatility.index,
+            y=s.rolling_volatility[t],
+            name=t,
+            line=dict(color=rolling_colors[t], width=3),
+            fill='tozeroy',
+            fillcolor=rolling_fillcolors[t]
+        ))
+    fig.update_layout(
+        title=dict(text=f"{ROLLING_WINDOW}-Day Rolling Volatility", x=0.5),
+        plot_bgcolor="#fffdf5", margin=dict(l=10, r=10, t=40, b=10),
+        legend=dict(orientation="v", y=0.95, x=0.17, xanchor='center')
+    )
+    return fig
+
+
+def rolling_sharpe_figure(s):
+    fig = go.Figure()
+    for t in s.rolling_sharpe.columns:
+        fig.add_trace(go.Scatter(
+            x=s.rolling_sharpe.index,
+            y=s.rolling_sharpe[t],
+            name=t,
+            line=dict(color=rolling_colors[t], width=3),
+            fill='tozeroy'
+        ))
+    fig.update_layout(
+        title=dict(text=f"{ROLLING_WINDOW}-Day Rolling Sharpe Ratio", x=0.5),
+        plot_bgcolor="#fffdf5", margin=dict(l=10, r=10, t=40, b=10),
+        legend=dict(orientation="h", y=1.02, x=0.5, xanchor='center')
+    )
+    return fig
+
+
+def rolling_var_figure(s):
+    fig = go.Figure()
+    for t in s.rolling_var.columns:
+        fig.add_trace(go.Scatter(
+            x=s.rolling_var.index,
+            y=s.rolling_var[t],
+            name=t,
+            line=dict(color=rolling_colors[t], width=3),
+            fill='tozeroy'
+        ))
+    fig.add_trace(go.Scatter(
+        x=s.rolling_cvar.index,
+        y=s.rolling_cvar["Portfolio"],
+        name="Portfolio CVaR",
+        line=dict(color=rolling_colors["Portfolio"], width=2, dash="dot")
+    ))
+    fig.update_layout(
+        title=dict(text=f"{ROLLING_WINDOW}-Day Rolling VaR ({config['var_confidence']:.0%}, {VAR_LABELS[config['var_method']]})", x=0.5),
+        plot_bgcolor="#fffdf5", margin=dict(l=10, r=10, t=40, b=10), height = 450,
+        legend=dict(orientation="v", y=0.06, x=0.17, xanchor='center')
+    )
+    return fig
+
+
+def rolling_corr_figure(s):
+    fig = go.Figure()
+
+    # One trace per selected pair (at most max_corr_pairs)
+    colors = generate_colors(len(s.rolling_corr.columns), pair_palette)
+    for name, color in zip(s.rolling_corr.columns, colors):
+        rolling_corr = s.rolling_corr[name]
+
+        fig.add_trace(go.Scatter(
+            x=rolling_corr.index,
+            y=rolling_corr,
+            name=name,
+            line=dict(color=color, width=2),
+            fill='tozeroy',
+            fillcolor=fill_color(color)
+        ))
+
+    # Layout
+    fig.update_layout(
+        title=dict(text=f"{ROLLING_WINDOW}-Day Rolling Correlation", x=0.5),
+        plot_bgcolor="#fffdf5",
+        legend=dict(orientation="h", y=0.15, x=0.5, xanchor='center'),
+        margin=dict(l=10, r=10, t=40, b=10),
+        height=450 )
+    return fig
+
+
+# --- Client-side Rolling ---
+def rolling_payload(s):
+    # Daily returns for the Rolling Metrics page's in-browser window selector
+    # (assets/rolling.js): float32 values and int32 day numbers, row-major and
+    # base64 encoded, about a third the size of the same numbers as JSON floats.
+    # Only the charted columns are shipped: the KPI tickers and the portfolio
+    # (the first `shown` columns), then any other ticker in a correlation pair
+    def build():
+        charted = kpi_tickers()
+        pairs = [name.split("–") for name in s.rolling_corr.columns]
+        partners = [t for t in tickers if t not in charted and any(t in pair for pair in pairs)]
+        columns = charted + ["Portfolio"] + partners
+        matrix = s.returns[charted + partners].assign(Portfolio=s.portfolio_returns)[columns]
+        days = (matrix.index.values.astype("datetime64[D]").astype("int64")).astype("<i4")
+        pair_colors = generate_colors(len(pairs), pair_palette)
+        shown = columns[:len(charted) + 1]
+        return {
+            "rows": len(matrix), "columns": columns, "shown": len(shown),
+            "points": config["downsample_points"],
+            "dates": base64.b64encode(days.tobytes()).decode(),
+            "returns": base64.b64encode(np.ascontiguousarray(matrix.values, dtype="<f4").tobytes()).decode(),
+            "pairs": [[columns.index(a), columns.index(b)] for a, b in pairs],
+            "colors": [rolling_colors[c] for c in shown], "fills": [rolling_fillcolors[c] for c in shown],
+            "pair_colors": pair_colors, "pair_fills": [fill_color(c) for c in pair_colors],
+        }
+    return s.memo("rolling_payload", build)
+
+
+# --- Benchmark ---
+def has_benchmark(s):
+    return bool(s.benchmark_returns.notna().any())
+
+
+@timed("relative_metrics")
+def relative_metrics(s):
+    # (rolling, full): every ticker and the portfolio against the benchmark in
+    # one pass (see relative.py), as {stat: frame} and {stat: Series}
+    def build():
+        matrix = s.returns.assign(Portfolio=s.portfolio_returns)
+        rolling, full = relative_stats(matrix.values, s.benchmark_returns.values, config["benchmark_window"])
+        return (
+            {k: pd.DataFrame(v, index=matrix.index, columns=matrix.columns) for k, v in rolling.items()},
+            {k: pd.Series(v, index=matrix.columns) for k, v in full.items()},
+        )
+    return s.memo("relative", build)
+
+
+def relative_columns():
+    return kpi_tickers() + ["Portfolio"]
+
+
+def relative_line_figure(s, stat, title, fmt=None):
+    frame = relative_metrics(s)[0][stat]
+    fig = go.Figure()
+    for t in relative_columns():
+        fig.add_trace(go.Scatter(x=frame.index, y=frame[t], name=t,
+                                 line=dict(color=rolling_colors[t], width=3 if t == "Portfolio" else 2)))
+    fig.update_layout(
+        title=dict(text=f"{config['benchmark_window']}-Day Rolling {title} vs {config['benchmark']}", x=0.5),
+        yaxis=dict(tickformat=fmt) if fmt else {}, plot_bgcolor="#fffdf5", height=350,
+        margin=dict(l=10, r=10, t=40, b=10), legend=dict(orientation="h", y=1.02, x=0.5, xanchor="center")
+    )
+    return fig
+
+
+def benchmark_beta_figure(s):
+    return relative_line_figure(s, "beta", "Beta")
+
+
+def tracking_error_figure(s):
+    return relative_line_figure(s, "tracking_error", "Tracking Error (ann.)", ".0%")
+
+
+def capture_figure(s):
+    full = relative_metrics(s)[1]
+    columns = relative_columns()
+    fig = go.Figure()
+    for stat, name, color in (("up_capture", "Up Capture", "#a1c181"), ("down_capture", "Down Capture", "#cc8963")):
+        fig.add_trace(go.Bar(x=columns, y=full[stat][columns], name=name, marker_color=color))
+    fig.update_layout(
+        title=dict(text=f"Up / Down Capture vs {config['benchmark']} (full history)", x=0.5), barmode="group",
+        yaxis=dict(tickformat=".0%"), plot_bgcolor="#fffdf5", height=350,
+        margin=dict(l=10, r=10, t=40, b=10), legend=dict(orientation="h", y=1.02, x=0.5, xanchor="center")
+    )
+    return fig
+
+
+# --- Date Range ---
+def period_stats(s):
+    # Range statistics for the KPI tickers and the portfolio (see period_stats.py)
+    def build():
+        columns = kpi_tickers() + ["Portfolio"]
+        matrix = s.returns[kpi_tickers()].assign(Portfolio=s.portfolio_returns)
+        return PeriodStats(matrix, {name: getattr(s, name)[columns]
+                                    for name in ("rolling_volatility", "rolling_sharpe", "rolling_var")})
+    return s.memo("period_stats", build)
+
+
+def period_correlation(s):
+    return s.shared_memo("period_correlation", lambda: PeriodCorrelation(s.returns[heatmap_tickers()]))
+
+
+def period_correlation_figure(s, start=None, end=None):
+    correlation = period_correlation(s).query(start, end)
+    if correlation is None:
+        return None
+    return correlation_heatmap(correlation, "Correlation Matrix")
+
+
+# --- What-if ---
+WHATIF_WINDOWS = {"30D": ROLLING_WINDOW, "1Y": 252, "All": None}
+
+
+def whatif_moments(s):
+    # Mean / covariance / growth per window, built once per snapshot
+    return s.shared_memo("whatif", lambda: window_moments(s.returns, WHATIF_WINDOWS))
+
+
+# --- Optimization ---
+strategy_names = {"min_variance": "Min Variance", "max_sharpe": "Max Sharpe", "risk_parity": "Risk Parity"}
+strategy_colors = {"min_variance": "#364c84", "max_sharpe": "#cc8963", "risk_parity": "#a1c181"}
+
+
+def optimization(s):
+    # Solved once per snapshot, in a process pool (see optimizer.py)
+    return s.shared_memo("optimization", lambda: optimize(
+        s.returns, config["optimizer_window"], config["optimizer_step"],
+        config["frontier_points"], config["optimizer_workers"]))
+
+
+def latest_window_moments(s):
+    window = s.returns.values[-config["optimizer_window"]:]
+    return window.mean(axis=0), np.cov(window, rowvar=False).reshape(len(tickers), len(tickers))
+
+
+def frontier_figure(s):
+    opt = optimization(s)
+    mean, cov = latest_window_moments(s)
+    annual = lambda w: (np.sqrt(max(w @ cov @ w, 0.0) * 252), w @ mean * 252)
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=np.sqrt(np.diag(cov) * 252), y=mean * 252, text=tickers, name="Assets", mode="markers",
+        marker=dict(size=6, color="rgba(120, 120, 120, 0.5)"),
+        hovertemplate="%{text}<br>Vol %{x:.1%}<br>Return %{y:.1%}<extra></extra>"
+    ))
+    fig.add_trace(go.Scatter(
+        x=opt["frontier"]["vol"] * np.sqrt(252), y=opt["frontier"]["ret"] * 252,
+        name="Efficient frontier", mode="lines", line=dict(color="black", width=3)
+    ))
+    for key, name in strategy_names.items():
+        vol, ret = annual(opt[key][-1])
+        fig.add_trace(go.Scatter(x=[vol], y=[ret], name=name, mode="markers",
+                                 marker=dict(size=13, color=strategy_colors[key], symbol="diamond")))
+    vol, ret = annual(s.weights)
+    fig.add_trace(go.Scatter(x=[vol], y=[ret], name="Current weights", mode="markers",
+                             marker=dict(size=13, color="#111111", symbol="x")))
+    fig.update_layout(
+        title=dict(text=f"Efficient Frontier (last {config['optimizer_window']} days, annualised)", x=0.5),
+        xaxis=dict(title="Volatility", tickformat=".0%"), yaxis=dict(title="Return", tickformat=".0%"),
+        plot_bgcolor="#fffdf5", height=420, margin=dict(l=10, r=10, t=40, b=10),
+        legend=dict(orientation="h", y=-0.2, x=0.5, xanchor="center")
+    )
+    return fig
+
+
+def optimal_weights_figure(s, top=20):
+    opt = optimization(s)
+    latest = {key: opt[key][-1] for key in strategy_names}
+    # The assets that matter to any strategy, largest first
+    order = np.argsort(-np.max(np.vstack(list(latest.values())), axis=0))[:top]
+    fig = go.Figure()
+    for key, name in strategy_names.items():
+        fig.add_trace(go.Bar(x=[tickers[i] for i in order], y=latest[key][order], name=name,
+                             marker_color=strategy_colors[key]))
+    fig.update_layout(
+        title=dict(text="Optimal Weights (latest window)", x=0.5), barmode="group",
+        yaxis=dict(tickformat=".0%"), plot_bgcolor="#fffdf5", height=420,
+        margin=dict(l=10, r=10, t=40, b=10), legend=dict(orientation="h", y=1.02, x=0.5, xanchor="center")
+    )
+    return fig
+
+
+def rolling_weights_figure(s, strategy="max_sharpe", top=10):
+    opt = optimization(s)
+    history = opt[strategy]
+    dates = s.returns.index[opt["ends"] - 1]
+    order = np.argsort(-history.mean(axis=0))
+    shown, rest = order[:top], order[top:]
+
+    fig = go.Figure()
+    for i in shown:
+        fig.add_trace(go.Scatter(x=dates, y=history[:, i], name=tickers[i], stackgroup="weights",
+                                 line=dict(width=0.5, color=ticker_colors[tickers[i]])))
+    if len(rest):
+        fig.add_trace(go.Scatter(x=dates, y=history[:, rest].sum(axis=1), name="Other", stackgroup="weights",
+                                 line=dict(width=0.5, color="#bbbbbb")))
+    fig.update_layout(
+        title=dict(text=f"Rolling {strategy_names[strategy]} Weights ({config['optimizer_window']}-day windows)", x=0.5),
+        yaxis=dict(tickformat=".0%", range=[0, 1]), plot_bgcolor="#fffdf5", height=420,
+        margin=dict(l=10, r=10, t=40, b=10), legend=dict(orientation="h", y=-0.15, x=0.5, xanchor="center")
+    )
+    return fig
+
+
+# --- Served Figures ---
+def series_figure(s, name, x_range=None):
+    # Each line trace cut to about the chart's pixel width; zooming re-fetches the
+    # visible range at full resolution (see app.update_series_graph). The full
+    # view is memoized, and decoded from the snapshot artifact when it has one.
+    if x_range is not None:
+        return downsampled_figure(s, name, x_range)
+    owner = s.base if name in ticker_figures else s
+    stored = owner.stored_figures.get(name)
+    if stored is not None:
+        return owner.memo(("series", name), lambda: json.loads(stored.tobytes()))
+    return owner.memo(("series", name), lambda: downsampled_figure(owner, name))
+
+
+def downsampled_figure(s, name, x_range=None):
+    fig = downsample_figure(s.figure(name), config["downsample_points"], x_range, config["downsample_method"])
+    fig["layout"]["uirevision"] = name
+    return fig
+
+
+def intraday_figure(names):
+    # Empty traces that the streaming callback fills through extendData
+    fig = go.Figure()
+    for ticker in names:
+        fig.add_trace(go.Scatter(x=[], y=[], name=ticker, mode="lines", line=dict(width=2, color=ticker_colors[ticker])))
+    fig.update_layout(title=dict(text="Intraday Prices", x=0.5), plot_bgcolor="#fffdf5", height=300,
+                      margin=dict(l=10, r=10, t=40, b=10), legend=dict(orientation="h", y=1.02, x=0.5, xanchor="center"))
+    return fig
+
+
+# Figures without a portfolio series, built once and shared by every portfolio view
+ticker_figures = {"adjusted_close_figure", "cumulative_returns_figure", "drawdowns_figure", "correlation_figure",
+                  "optimal_weights_fig", "rolling_weights_fig"}
+
+figure_builders = {
+    "adjusted_close_figure": adjusted_close_figure,
+    "cumulative_returns_figure": cumulative_returns_figure,
+    "drawdowns_figure": drawdowns_figure,
+    "correlation_figure": correlation_figure,
+    "portfolio_figure": portfolio_figure,
+    "rolling_vol_fig": rolling_vol_figure,
+    "rolling_sharpe_fig": rolling_sharpe_figure,
+    "rolling_var_fig": rolling_var_figure,
+    "rolling_corr_fig": rolling_corr_figure,
+    "frontier_fig": frontier_figure,
+    "optimal_weights_fig": optimal_weights_figure,
+    "rolling_weights_fig": rolling_weights_figure,
+    "benchmark_beta_fig": benchmark_beta_figure,
+    "tracking_error_fig": tracking_error_figure,
+    "capture_fig": capture_figure,
+}
+
+
+# --- Pipeline ---
+def no_progress(stage, fraction):
+    pass
+
+
+# Everything compute_frames returns, i.e. what a shared or exported snapshot holds
+FRAME_NAMES = (
+    "price_data", "returns", "cumulative_returns", "portfolio_cumulative", "drawdowns", "portfolio_prices",
+    "portfolio_returns", "portfolio_sets", "rolling_volatility", "rolling_sharpe", "rolling_var", "rolling_cvar",
+    "rolling_corr", "correlation", "benchmark_returns",
+)
+
+
+def compute_frames(progress=no_progress, known_version=None):
+    # Returns (version, frames); frames is None when the prices are unchanged
+    (
+        latest_prices, daily_returns, cumulative_returns, cumulative_returns_latest,
+        portfolio_cumulative, drawdowns, returns, price_data,
+        portfolio_prices, portfolio_returns, portfolio_sets
+    ) = get_live_data()
+
+    benchmark_returns = get_benchmark_returns(price_data, returns)
+
+    version = data_version(price_data, benchmark_returns)
+    if version == known_version:
+        return version, None
+
+    progress("Computing rolling metrics", 0.4)
+    rolling_volatility, rolling_sharpe, engine_var, rolling_corr = compute_rolling_metrics(returns, portfolio_returns)
+    progress("Computing value at risk", 0.6)
+    rolling_var, rolling_cvar = update_var(returns, portfolio_returns, engine_var)
+
+    return version, dict(
+        price_data=price_data, returns=returns,
+        cumulative_returns=cumulative_returns, portfolio_cumulative=portfolio_cumulative,
+        drawdowns=drawdowns,
+        portfolio_prices=portfolio_prices, portfolio_returns=portfolio_returns, portfolio_sets=portfolio_sets,
+        rolling_volatility=rolling_volatility, rolling_sharpe=rolling_sharpe, rolling_var=rolling_var,
+        rolling_cvar=rolling_cvar, rolling_corr=rolling_corr, correlation=returns.corr(),
+        benchmark_returns=benchmark_returns,
+    )
+
+
+def load_frames(progress=no_progress, known_version=None):
+    # With DASHBOARD_SHARED_DIR set, a separate publisher process does the fetch
+    # and compute; this worker only maps the published arrays
+    if SHARED_DIR:
+        return shared_arrays.attach(SHARED_DIR, known_version)
+    return compute_frames(progress, known_version)
+
+
+@timed("build_snapshot")
+def build_snapshot(progress=no_progress, previous=None):
+    progress("Fetching market data", 0.0)
+    version, frames = load_frames(progress, previous.version if previous is not None else None)
+    if frames is None:
+        # No new bars since the last run: keep serving what is already built
+        return previous
+
+    # Figures are built on first request, see Snapshot.figure
+    return make_snapshot(version, frames)
+
+
+def make_snapshot(version, frames, created_at=None, stored_figures=None):
+    # The shared snapshot over a set of metric frames, fresh or from an artifact
+    # (see snapshot_artifact.py), whose stored_figures are {name: JSON bytes}
+    return Snapshot(
+        version=version, as_of=frames["price_data"].index[-1],
+        created_at=time.time() if created_at is None else created_at,
+        latest_prices=frames["price_data"].iloc[-1], daily_returns=frames["returns"].iloc[-1],
+        cumulative_returns_latest=frames["cumulative_returns"].iloc[-1],
+        weights=np.asarray(weights, dtype=float), portfolio_id="default", portfolio_name="Default",
+        rebalance=config["rebalance"], rebalance_threshold=config["rebalance_threshold"],
+        stored_figures=stored_figures or {}, **frames
+    )
+
+
+def run_shared_publisher(root, interval):
+    # Entry point for the publisher process (see gunicorn.conf.py)
+    shared_arrays.run_publisher(root, lambda known: compute_frames(known_version=known), interval)
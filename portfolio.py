@@ -0,0 +1,113 @@
+
+#### portfolio engine
+# NAV of portfolios held at target weights of capital (not share counts),
+# for many weight sets at once. Between rebalances each portfolio's holdings
+# drift with their own returns; on a rebalance they are reset to target and
+# the traded value pays `cost` (e.g. 0.001 = 10 bps). Traded value is
+# sum |drifted - target| of NAV, i.e. buys plus sells (two-way turnover).
+#
+# Calendar schedules are solved in closed form over segments: one matrix
+# product gives every portfolio's growth between consecutive rebalance dates.
+# Threshold rebalancing is path dependent, so it steps through the days, but
+# each step is a vectorized update over all portfolios.
+
+import numpy as np
+import pandas as pd
+
+SCHEDULES = ("none", "monthly", "quarterly", "threshold")
+
+
+def rebalance_rows(index, schedule):
+    # Rows after whose close a calendar rebalance happens (last trading day of each period)
+    if schedule == "none":
+        return np.array([], dtype=int)
+    freq = {"monthly": "M", "quarterly": "Q"}[schedule]
+    periods = pd.DatetimeIndex(index).to_period(freq)
+    return np.flatnonzero(periods[1:] != periods[:-1])
+
+
+def portfolio_nav(returns, weights, schedule="monthly", threshold=0.05, cost=0.0):
+    # returns: (T, N) DataFrame of asset returns; weights: (N,) or (P, N) targets.
+    # Returns {"nav": (T, P) NAV after each row, starting from 1 before the
+    # first, "turnover": (P,) total two-way turnover (buys plus sells, as a
+    # fraction of NAV), "rebalances": (P,) counts}
+    if schedule not in SCHEDULES:
+        raise ValueError(f"Unknown rebalance schedule {schedule!r}, expected one of {SCHEDULES}")
+    R = np.asarray(returns, dtype=float)
+    W = np.atleast_2d(np.asarray(weights, dtype=float))
+    W = W / W.sum(axis=1, keepdims=True)
+    if schedule == "threshold":
+        return _threshold_nav(R, W, threshold, cost)
+
+    T = len(R)
+    # growth[t] = value of 1 in each asset after t rows
+    growth = np.vstack([np.ones(R.shape[1]), np.cumprod(1 + R, axis=0)])
+    starts = np.concatenate([[0], rebalance_rows(returns.index, schedule) + 1])
+    starts = starts[starts < T]
+
+    # Value carried into each segment: growth over the previous segment, less costs
+    seg_growth = growth[starts[1:]] / growth[starts[:-1]]                       # (K-1, N)
+    seg_value = seg_growth @ W.T                                                # (K-1, P)
+    drifted = W[None] * seg_growth[:, None, :] / seg_value[:, :, None]          # (K-1, P, N)
+    turnover = np.abs(drifted - W[None]).sum(axis=2)                            # (K-1, P)
+    start_value = np.vstack([np.ones(len(W)), np.cumprod(seg_value * (1 - cost * turnover), axis=0)])
+
+    rows = np.arange(1, T + 1)
+    segment = np.searchsorted(starts, rows, side="right") - 1
+    # A rebalance row itself is valued after the rebalance, at the start of its segment
+    nav = start_value[segment] * ((growth[rows] / growth[starts[segment]]) @ W.T)
+    return {"nav": nav, "turnover": turnover.sum(axis=0), "rebalances": np.full(len(W), len(starts) - 1)}
+
+
+def _threshold_nav(R, W, threshold, cost):
+    # Rebalance a portfolio when any holding drifts more than `threshold` from target
+    T, P = len(R), len(W)
+    holdings = W.copy()           # capital in each asset, NAV = holdings.sum()
+    nav = np.empty((T, P))
+    turnover = np.zeros(P)
+    rebalances = np.zeros(P, dtype=int)
+    for t in range(T):
+        holdings *= 1 + R[t]
+        value = holdings.sum(axis=1)
+        gap = np.abs(holdings / value[:, None] - W)
+        drift = gap.sum(axis=1)
+        due = gap.max(axis=1) > threshold
+        if due.any():
+            value[due] *= 1 - cost * drift[due]
+            holdings[due] = W[due] * value[due, None]
+            turnover[due] += drift[due]
+            rebalances[due] += 1
+        nav[t] = value
+    return {"nav": nav, "turnover": turnover, "rebalances": rebalances}
+
+
+# --- What-if ---
+# Per-window sufficient statistics, so metrics for any weight vector are a few
+# small matrix products and never touch the price history again.
+def window_moments(returns, windows):
+    # windows: {label: trailing rows, or None for the whole history}
+    R = np.asarray(returns, dtype=float)
+    moments = {}
+    for label, w in windows.items():
+        x = R if w is None else R[-w:]
+        moments[label] = {
+            "mean": x.mean(axis=0),
+            "cov": np.cov(x, rowvar=False).reshape(R.shape[1], R.shape[1]),
+            "growth": np.prod(1 + x, axis=0),
+            "rows": len(x),
+        }
+    return moments
+
+
+def weight_metrics(m, weights, z=1.6448536):
+    # Daily volatility, Sharpe and Gaussian 95% VaR of a portfolio held at
+    # `weights` (rebalanced daily), and its buy-and-hold return over the window
+    w = np.asarray(weights, dtype=float)
+    mean = w @ m["mean"]
+    vol = np.sqrt(max(w @ m["cov"] @ w, 0.0))
+    return {
+        "volatility": vol,
+        "sharpe": mean / vol if vol > 0 else np.nan,
+        "var": mean - z * vol,
+        "cumulative": w @ m["growth"] - 1,
+    }
@@ -0,0 +1,204 @@
+
+#### price store
+# Persistent on-disk cache of daily closes, one memory-mapped .npy file per
+# (ticker, interval). Only the bars after the last cached date are fetched.
+# A .start file next to it records the earliest date a full fetch asked for,
+# so a ticker listed after the period start is not refetched from the start
+# on every refresh.
+
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from data_sources import YahooSource
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, locking is skipped there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get("PRICE_CACHE_DIR", ".price_cache")
+# Seconds after which a cached series is considered due for an incremental fetch.
+# Kept below the market-hours refresh interval so scheduled refreshes see new bars.
+REFRESH_AFTER = int(os.environ.get("PRICE_CACHE_REFRESH_AFTER", "240"))
+
+bar_dtype = np.dtype([("date", "<i8"), ("close", "<f8")])
+
+
+def period_start(period, now=None):
+    now = pd.Timestamp.now().normalize() if now is None else pd.Timestamp(now)
+    units = {"y": "years", "mo": "months", "wk": "weeks", "d": "days"}
+    for suffix, unit in units.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return now - pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+    raise ValueError(f"Unsupported period: {period!r}")
+
+
+# --- Store ---
+class PriceStore:
+    def __init__(self, root=CACHE_DIR, fetch=YahooSource(), refresh_after=REFRESH_AFTER):
+        # fetch: a data source (see data_sources.py); None runs fully offline
+        # from whatever is cached
+        self.root = root
+        self.fetch = fetch
+        self.refresh_after = refresh_after
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, ticker, interval):
+        safe = ticker.replace("/", "_").replace("^", "_")
+        return os.path.join(self.root, f"{safe}_{interval}.npy")
+
+    def load(self, ticker, interval="1d"):
+        path = self.path(ticker, interval)
+        if not os.path.exists(path):
+            return None
+        bars = np.load(path, mmap_mode="r")
+        return pd.Series(bars["close"], index=pd.to_datetime(bars["date"]), name=ticker)
+
+    def save(self, ticker, interval, series):
+        bars = np.empty(len(series), dtype=bar_dtype)
+        bars["date"] = series.index.values.astype("datetime64[ns]").astype("int64")
+        bars["close"] = series.values
+        path = self.path(ticker, interval)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, bars)
+        os.replace(tmp, path)
+
+    def searched_from(self, ticker, interval):
+        # Earliest date a full fetch of this series asked for, or None
+        try:
+            with open(self.path(ticker, interval) + ".start") as f:
+                return pd.Timestamp(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def mark_searched(self, ticker, interval, start):
+        path = self.path(ticker, interval) + ".start"
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(pd.Timestamp(start).isoformat())
+        os.replace(tmp, path)
+
+    def needs_history(self, ticker, interval, series, start):
+        # A full fetch from start is needed unless the cache reaches back to it, or
+        # an earlier full fetch from start or before found nothing older
+        if series is None:
+            return True
+        if series.index[0] <= start + pd.Timedelta(days=7):
+            return False
+        searched = self.searched_from(ticker, interval)
+        return searched is None or searched > start
+
+    def is_fresh(self, ticker, interval):
+        path = self.path(ticker, interval)
+        return os.path.exists(path) and time.time() - os.path.getmtime(path) < self.refresh_after
+
+    def get_prices(self, tickers, period="10y", interval="1d"):
+        start = period_start(period)
+        with self._lock():
+            cached = {ticker: self.load(ticker, interval) for ticker in tickers}
+            if self.fetch is not None:
+                self._refresh(tickers, cached, start, interval)
+
+        missing = [t for t in tickers if cached[t] is None]
+        if missing:
+            raise RuntimeError(f"No cached or fetched prices for: {', '.join(missing)}")
+
+        price_data = pd.concat([cached[t] for t in tickers], axis=1)
+        price_data.columns = tickers
+        return align_prices(price_data[price_data.index >= start])
+
+    def _refresh(self, tickers, cached, start, interval):
+        # Group tickers by the date they need fetching from, so each group is one request
+        groups = {}
+        for ticker in tickers:
+            series = cached[ticker]
+            if self.needs_history(ticker, interval, series, start):
+                groups.setdefault(start, []).append(ticker)
+            elif not self.is_fresh(ticker, interval):
+                # Refetch the last two cached bars: the last may have been partial, the
+                # one before anchors the dividend/split adjustment of the cached history
+                groups.setdefault(series.index[max(len(series) - 2, 0)], []).append(ticker)
+
+        for fetch_start, group in groups.items():
+            try:
+                fresh = self.fetch(group, fetch_start, interval)
+            except Exception as e:
+                logger.warning("Price fetch failed for %s, using cache: %s", group, e)
+                continue
+            for ticker in group:
+                if ticker not in fresh.columns:
+                    continue
+                new = fresh[ticker].dropna()
+                if new.empty:
+                    if cached[ticker] is not None:
+                        # Nothing new (e.g. market closed): mark the cache as checked
+                        os.utime(self.path(ticker, interval))
+                        if fetch_start == start:
+                            self.mark_searched(ticker, interval, start)
+                    continue
+                merged = merge_bars(cached[ticker], new)
+                self.save(ticker, interval, merged)
+                if fetch_start == start:
+                    self.mark_searched(ticker, interval, start)
+                cached[ticker] = merged
+
+    def _lock(self):
+        return _FileLock(os.path.join(self.root, ".lock"))
+
+
+def merge_bars(old, new):
+    if old is None:
+        return new
+    overlap = old.index.intersection(new.index)
+    kept = old[old.index < new.index[0]]
+    if len(overlap):
+        # auto_adjust rescales the whole history after dividends/splits, so carry
+        # the ratio seen on the first overlapping (completed) bar back over the cache
+        anchor = overlap[0]
+        ratio = new[anchor] / old[anchor]
+        if np.isfinite(ratio) and abs(ratio - 1) > 1e-9:
+            kept = kept * ratio
+    return pd.concat([kept, new])
+
+
+def align_prices(price_data, max_gap=5):
+    # Calendars differ between tickers (listings, halts, holidays abroad). Carry
+    # short gaps forward and trim to the common history, and say which ticker
+    # is responsible, rather than letting a blanket dropna() eat rows for all.
+    filled = price_data.ffill(limit=max_gap)
+    first = filled.apply(lambda col: col.first_valid_index())
+    start = first.max()
+    late = first[first > filled.index[0] + pd.Timedelta(days=7)]
+    for ticker, date in late.items():
+        logger.warning("%s has no prices before %s; history for all tickers starts there", ticker, date.date())
+    filled = filled[filled.index >= start]
+    gaps = filled.isna()
+    if gaps.values.any():
+        counts = gaps.sum()
+        logger.warning("Dropping %d rows with gaps longer than %d bars in: %s", int(gaps.any(axis=1).sum()),
+                       max_gap, ", ".join(f"{t} ({n})" for t, n in counts[counts > 0].items()))
+        filled = filled[~gaps.any(axis=1)]
+    return filled
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.f = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.f = open(self.path, "w")
+            fcntl.flock(self.f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.f is not None:
+            fcntl.flock(self.f, fcntl.LOCK_UN)
+            self.f.close()
+            self.f = None
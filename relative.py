@@ -0,0 +1,92 @@
+
+#### benchmark-relative metrics
+# Beta, alpha, tracking error, information ratio and up/down capture of every
+# column of a (T x M) returns matrix against one benchmark series, rolling
+# over a window and over the whole history. Every statistic comes from the
+# same few prefix sums (centred returns, squares and cross-products with the
+# benchmark, plus returns on up and down benchmark days), so one pass costs
+# O(T * M) whatever the window, and columns are processed in chunks so peak
+# memory stays around chunk_bytes.
+#
+# Alpha and the active return are annualised arithmetically (x 252), tracking
+# error by sqrt(252); capture ratios are mean column return over mean
+# benchmark return on the benchmark's up (or down) days. Rows where the
+# benchmark has no return are left out: a rolling window containing one is
+# NaN, and the full-history figures use the remaining rows.
+
+import numpy as np
+from metrics import CHUNK_BYTES
+
+PERIODS_PER_YEAR = 252
+RELATIVE_STATS = ("beta", "alpha", "tracking_error", "information_ratio", "up_capture", "down_capture")
+
+
+def relative_stats(returns, benchmark, window=60, chunk_bytes=CHUNK_BYTES):
+    # returns: (T, M) without NaNs; benchmark: (T,) with NaN where missing.
+    # Returns (rolling, full): {stat: (T, M) array, NaN until a full window}
+    # and {stat: (M,) array} over every row with a benchmark return.
+    R = np.asarray(returns, dtype=float)
+    b = np.asarray(benchmark, dtype=float)
+    T, M = R.shape
+    rolling = {k: np.full((T, M), np.nan) for k in RELATIVE_STATS}
+    full = {k: np.full(M, np.nan) for k in RELATIVE_STATS}
+    valid = np.isfinite(b)
+    if not valid.any():
+        return rolling, full
+
+    # Window bounds as prefix rows: rolling windows [t - window + 1, t], then the whole history
+    ends = np.arange(window, T + 1)
+    lo = np.concatenate([ends - window, [0]])
+    hi = np.concatenate([ends, [T]])
+
+    bench = np.where(valid, b, 0.0)
+    b_shift = bench[valid].mean()
+    bc = np.where(valid, b - b_shift, 0.0)[:, None]
+    up, down = (valid & (b > 0)).astype(float)[:, None], (valid & (b < 0)).astype(float)[:, None]
+    common = {name: window_sums(x, lo, hi) for name, x in (
+        ("n", valid.astype(float)[:, None]), ("sb", bc), ("sbb", bc * bc),
+        ("ub", bench[:, None] * up), ("db", bench[:, None] * down),
+    )}
+
+    # Each column costs about 8 prefix arrays of (T + 1) float64
+    step = max(1, chunk_bytes // (8 * (T + 1) * 8))
+    for a in range(0, M, step):
+        X = R[:, a:a + step] * valid[:, None]
+        x_shift = X.sum(axis=0) / valid.sum()
+        xc = np.where(valid[:, None], X - x_shift, 0.0)
+        sums = dict(common, **{name: window_sums(x, lo, hi) for name, x in (
+            ("sx", xc), ("sxx", xc * xc), ("sxb", xc * bc), ("ux", X * up), ("dx", X * down),
+        )})
+        stats = combine(sums, x_shift, b_shift)
+        for name, values in stats.items():
+            # Rolling windows need every row; the full history takes whatever rows it has
+            rolling[name][window - 1:, a:a + step] = np.where(sums["n"][:-1] == window, values[:-1], np.nan)
+            full[name][a:a + step] = values[-1]
+    return rolling, full
+
+
+def window_sums(x, lo, hi):
+    # Column sums of x over rows [lo, hi) for each pair of bounds
+    cs = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+    return cs[hi] - cs[lo]
+
+
+def combine(s, x_shift, b_shift):
+    n = s["n"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_x = s["sx"] / n + x_shift
+        mean_b = s["sb"] / n + b_shift
+        cov = s["sxb"] - s["sx"] * s["sb"] / n
+        var_b = s["sbb"] - s["sb"] ** 2 / n
+        var_x = s["sxx"] - s["sx"] ** 2 / n
+        beta = cov / var_b
+        active_var = np.maximum(var_x - 2 * cov + var_b, 0.0) / (n - 1)
+        tracking_error = np.sqrt(active_var * PERIODS_PER_YEAR)
+        return {
+            "beta": beta,
+            "alpha": (mean_x - beta * mean_b) * PERIODS_PER_YEAR,
+            "tracking_error": tracking_error,
+            "information_ratio": (mean_x - mean_b) * PERIODS_PER_YEAR / tracking_error,
+            "up_capture": s["ux"] / s["ub"],
+            "down_capture": s["dx"] / s["db"],
+        }
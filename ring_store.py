@@ -0,0 +1,90 @@
+
+#### ring store
+# Fixed-capacity time series for long-running processes. Storage is allocated
+# once: capacity x columns per field, plus the timestamps, each stored twice
+# back to back so that the live window is always one contiguous slice. Append
+# and evict-oldest are O(1), and times() / values() / frame() are zero-copy
+# NumPy views.
+#
+# A view stays intact until the ring writes over its rows. That happens only
+# after the ring has taken (capacity - len) more appends, so keep some
+# headroom above the longest window you need.
+
+import numpy as np
+import pandas as pd
+
+
+class RingSeries:
+    def __init__(self, columns, capacity, fields=("close",), dtype=float):
+        self.columns = list(columns)
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self._times = np.zeros(2 * capacity, dtype="i8")
+        self._data = {f: np.full((2 * capacity, len(self.columns)), np.nan, dtype=dtype) for f in self.fields}
+        self.head = 0
+        self.count = 0
+        self.total = 0  # rows ever appended, for cursors that survive eviction
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self._times.nbytes + sum(a.nbytes for a in self._data.values())
+
+    def append(self, time, **rows):
+        # rows: one array of len(columns) per field; evicts the oldest row when full
+        if self.count == self.capacity:
+            self.popleft()
+        slot = (self.head + self.count) % self.capacity
+        self._times[slot] = self._times[slot + self.capacity] = time
+        for field, row in rows.items():
+            data = self._data[field]
+            data[slot] = data[slot + self.capacity] = row
+        self.count += 1
+        self.total += 1
+
+    def extend(self, times, **rows):
+        # Vectorized append of many rows; only the last `capacity` of them can be kept
+        times = np.asarray(times)
+        added = len(times)
+        times = times[-self.capacity:]
+        n = len(times)
+        if n == 0:
+            return
+        self.popleft(max(self.count + n - self.capacity, 0))
+        slots = (self.head + self.count + np.arange(n)) % self.capacity
+        self._times[slots] = self._times[slots + self.capacity] = times
+        for field, values in rows.items():
+            data = self._data[field]
+            data[slots] = data[slots + self.capacity] = np.asarray(values)[-n:]
+        self.count += n
+        self.total += added
+
+    def popleft(self, n=1):
+        n = min(n, self.count)
+        self.head = (self.head + n) % self.capacity
+        self.count -= n
+
+    def evict_before(self, time):
+        # Drops rows older than `time`; O(log n) search over the contiguous window
+        self.popleft(int(np.searchsorted(self.times(), time, side="left")))
+
+    # --- Zero-copy views of the live window, oldest first ---
+    def times(self):
+        return self._times[self.head:self.head + self.count]
+
+    def values(self, field="close"):
+        return self._data[field][self.head:self.head + self.count]
+
+    def last(self, field="close"):
+        return self.values(field)[-1] if self.count else None
+
+    def since(self, cursor, field="close"):
+        # Rows appended after `cursor` (a previous `total`) that are still held
+        n = min(self.total - (cursor or 0), self.count)
+        return self.times()[self.count - n:], self.values(field)[self.count - n:]
+
+    def frame(self, field="close"):
+        return pd.DataFrame(self.values(field), index=pd.DatetimeIndex(self.times().view("datetime64[ns]")),
+                            columns=self.columns, copy=False)
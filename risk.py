@@ -0,0 +1,183 @@
+
+#### risk engines
+# Rolling value at risk and expected shortfall (CVaR) over trailing windows of
+# a (T x N) returns matrix, by one of four methods:
+#   historical      empirical quantile and tail mean of the window
+#   gaussian        mean - z * std
+#   cornish_fisher  the Gaussian quantile corrected for skew and excess kurtosis
+#   monte_carlo     joint returns of every column simulated from the window's
+#                   mean and covariance (Cholesky factor), so each simulated
+#                   path keeps the correlation between the columns
+# VaR and CVaR are reported as returns (negative numbers are losses), the same
+# sign as the quantile the dashboard has always shown.
+#
+# Everything is batched over windows. Monte Carlo reuses the same standard
+# normals for every window (common random numbers), so results don't jitter
+# between refreshes. Paths are simulated a chunk at a time and only each
+# column's running lower tail is kept, so memory stays a small multiple of
+# chunk_bytes however many paths there are. The work is windows x paths x columns², so
+# for large universes raise var_mc_step or lower var_mc_paths.
+
+from statistics import NormalDist
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from metrics import CHUNK_BYTES, rolling_quantile
+
+VAR_METHODS = ("historical", "gaussian", "cornish_fisher", "monte_carlo")
+
+# Quantile levels inside the tail, for averaging a parametric quantile into a CVaR
+TAIL_POINTS = 64
+
+
+def rolling_var(returns, window=30, alpha=0.05, method="historical", **mc):
+    # returns: (T, N) array without NaNs. Returns (var, cvar), each (T, N) with
+    # NaN until a full window fits. mc: Monte Carlo settings (see monte_carlo_var)
+    if method not in VAR_METHODS:
+        raise ValueError(f"Unknown VaR method {method!r}, expected one of {VAR_METHODS}")
+    R = np.asarray(returns, dtype=float)
+    if method == "historical":
+        return historical_var(R, window, alpha)
+    if method == "monte_carlo":
+        return monte_carlo_var(R, window, alpha, **mc)
+    return parametric_var(R, window, alpha, cornish_fisher=method == "cornish_fisher")
+
+
+def historical_var(R, window, alpha, chunk_bytes=CHUNK_BYTES):
+    T, N = R.shape
+    var, cvar = np.full((T, N), np.nan), np.full((T, N), np.nan)
+    if T < window:
+        return var, cvar
+    var[window - 1:] = rolling_quantile(R, window, alpha, chunk_bytes)
+
+    # Tail mean of the ceil(alpha * window) worst returns in each window
+    k = max(1, int(np.ceil(alpha * window)))
+    views = sliding_window_view(R, window, axis=0)
+    step = max(1, chunk_bytes // (N * window * 8))
+    for a in range(0, T - window + 1, step):
+        part = np.partition(views[a:a + step], k - 1, axis=-1)
+        cvar[window - 1 + a:window - 1 + a + len(part)] = part[..., :k].mean(axis=-1)
+    return var, cvar
+
+
+def rolling_moments(R, window):
+    # Mean, std, skew and excess kurtosis per window from prefix sums of centred powers
+    T, N = R.shape
+    out = [np.full((T, N), np.nan) for _ in range(4)]
+    if T < window:
+        return out
+    x = R - R.mean(axis=0)
+    sums = [np.vstack([np.zeros(N), np.cumsum(x ** p, axis=0)]) for p in (1, 2, 3, 4)]
+    s1, s2, s3, s4 = ((cs[window:] - cs[:-window]) / window for cs in sums)
+    m2 = np.maximum(s2 - s1 ** 2, 0.0)
+    m3 = s3 - 3 * s1 * s2 + 2 * s1 ** 3
+    m4 = s4 - 4 * s1 * s3 + 6 * s1 ** 2 * s2 - 3 * s1 ** 4
+    with np.errstate(divide="ignore", invalid="ignore"):
+        skew = np.where(m2 > 0, m3 / m2 ** 1.5, 0.0)
+        kurt = np.where(m2 > 0, m4 / m2 ** 2 - 3, 0.0)
+    out[0][window - 1:] = s1 + R.mean(axis=0)
+    out[1][window - 1:] = np.sqrt(m2 * window / max(window - 1, 1))
+    out[2][window - 1:] = skew
+    out[3][window - 1:] = kurt
+    return out
+
+
+def cornish_fisher_z(z, skew, kurt):
+    return (z + (z ** 2 - 1) * skew / 6 + (z ** 3 - 3 * z) * kurt / 24
+            - (2 * z ** 3 - 5 * z) * skew ** 2 / 36)
+
+
+def parametric_var(R, window, alpha, cornish_fisher=False):
+    mean, std, skew, kurt = rolling_moments(R, window)
+    # CVaR averages the quantile over the tail, at midpoints of (0, alpha)
+    levels = (np.arange(TAIL_POINTS) + 0.5) / TAIL_POINTS * alpha
+    inv = NormalDist().inv_cdf
+    z, tail = inv(alpha), np.array([inv(u) for u in levels])
+    if cornish_fisher:
+        var = mean + cornish_fisher_z(z, skew, kurt) * std
+        cvar = mean + std * np.mean([cornish_fisher_z(u, skew, kurt) for u in tail], axis=0)
+    else:
+        var = mean + z * std
+        cvar = mean + tail.mean() * std
+    return var, cvar
+
+
+def monte_carlo_var(R, window, alpha, paths=100_000, step=5, df=None, seed=0, chunk_bytes=CHUNK_BYTES):
+    # Simulates `paths` one-day returns of all N columns jointly per window,
+    # from the window's mean and covariance (multivariate Student-t with `df`
+    # degrees of freedom, scaled to the same covariance, when df is set), and
+    # takes each column's simulated quantile and tail mean. Windows are solved
+    # every `step` rows, always including the last, and held until the next solve.
+    if df is not None and df <= 2:
+        raise ValueError(f"Student-t VaR needs more than 2 degrees of freedom for a finite variance, got {df}")
+    T, N = R.shape
+    var, cvar = np.full((T, N), np.nan), np.full((T, N), np.nan)
+    if T < window:
+        return var, cvar
+    ends = np.arange(T - 1, window - 2, -step)[::-1]
+
+    k = max(1, int(np.ceil(alpha * paths)))
+    h = alpha * (paths - 1)
+    lo = int(np.floor(h))
+    hi = min(lo + 1, paths - 1)
+    keep = min(paths, k + 2)
+
+    # Paths per chunk and windows per batch, sized so the normals and the
+    # simulated block (with the kept tails) are each about half of chunk_bytes
+    size = int(min(paths, max(keep, chunk_bytes // (2 * 8 * N))))
+    batch = max(1, chunk_bytes // (2 * 8 * N * (keep + size)))
+    chunks = range(0, paths, size)
+    # The normals are kept when they fit, otherwise redrawn (identically) per batch
+    stored = {} if N * paths * 8 <= chunk_bytes // 2 else None
+
+    def draws(a):
+        if stored is not None and a in stored:
+            return stored[a]
+        n = min(size, paths - a)
+        rng = np.random.default_rng([seed, a])
+        z = rng.standard_normal((N, n))
+        if df is not None:
+            z *= np.sqrt((df - 2) / rng.chisquare(df, n))
+        if stored is not None:
+            stored[a] = z
+        return z
+
+    views = sliding_window_view(R, window, axis=0)
+    solved_var, solved_cvar = np.empty((len(ends), N)), np.empty((len(ends), N))
+    for b in range(0, len(ends), batch):
+        part = views[ends[b:b + batch] - window + 1]                                # (B, N, window)
+        mean = part.mean(axis=2)
+        centred = part - mean[:, :, None]
+        cov = np.einsum("bit,bjt->bij", centred, centred) / max(window - 1, 1)
+        root = factor(cov)
+        if len(chunks) == 1:
+            # All paths at once: keep the lowest `keep` values
+            tail = mean[:, :, None] + root @ draws(0)                                # (B, N, paths)
+            tail = np.partition(tail, keep - 1, axis=2)[:, :, :keep]
+        else:
+            # Merge each chunk into the lowest `keep` values simulated so far
+            tail = np.empty((len(part), N, 0))
+            for a in chunks:
+                tail = np.concatenate([tail, mean[:, :, None] + root @ draws(a)], axis=2)
+                if tail.shape[2] > keep:
+                    tail = np.partition(tail, keep - 1, axis=2)[:, :, :keep]
+        tail.sort(axis=2)
+        solved_var[b:b + batch] = tail[:, :, lo] + (tail[:, :, hi] - tail[:, :, lo]) * (h - lo)
+        solved_cvar[b:b + batch] = tail[:, :, :k].mean(axis=2)
+
+    # Hold each solve until the next one
+    rows = np.arange(window - 1, T)
+    held = np.searchsorted(ends, rows, side="right") - 1
+    var[window - 1:] = solved_var[held]
+    cvar[window - 1:] = solved_cvar[held]
+    return var, cvar
+
+
+def factor(cov):
+    # A (B, N, N) stack of L with L L' = cov: Cholesky, or the symmetric square
+    # root when a window is singular (e.g. a portfolio column that is a mix of
+    # the others, or a constant column)
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        vals, vecs = np.linalg.eigh(cov)
+        return vecs * np.sqrt(np.maximum(vals, 0.0))[:, None, :]
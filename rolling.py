@@ -0,0 +1,104 @@
+
+#### rolling statistics
+# Fixed-window rolling mean / std / Sharpe / quantile VaR / correlation that
+# are updated one bar at a time. Each push costs O(N²) for N columns (the
+# cross-products) plus a sorted insert/remove per column for the quantile,
+# independent of how much history has been seen.
+
+from bisect import bisect_left, insort
+import numpy as np
+
+
+class RollingStats:
+    def __init__(self, columns, window=30, quantile=0.05, resync_every=1024):
+        n = len(columns)
+        self.columns = list(columns)
+        self.window = window
+        self.quantile = quantile
+        self.resync_every = resync_every
+        # Ring of the last `window` rows; pos is where the next row goes
+        self.buf = np.zeros((window, n))
+        self.pos = 0
+        self.count = 0
+        self.pushes = 0
+        self.sum = np.zeros(n)
+        self.sumsq = np.zeros(n)
+        self.cross = np.zeros((n, n))
+        # Per-column sorted window values, for order statistics
+        self.sorted = [[] for _ in range(n)]
+
+    @property
+    def ready(self):
+        return self.count == self.window
+
+    def seed(self, rows):
+        for row in np.asarray(rows, dtype=float)[-self.window:]:
+            self.push(row)
+        return self
+
+    def push(self, row):
+        row = np.asarray(row, dtype=float)
+        if self.count == self.window:
+            old = self.buf[self.pos]
+            self.sum -= old
+            self.sumsq -= old * old
+            self.cross -= np.outer(old, old)
+            for values, v in zip(self.sorted, old):
+                del values[bisect_left(values, v)]
+        else:
+            self.count += 1
+
+        self.buf[self.pos] = row
+        self.pos = (self.pos + 1) % self.window
+        self.sum += row
+        self.sumsq += row * row
+        self.cross += np.outer(row, row)
+        for values, v in zip(self.sorted, row):
+            insort(values, v)
+
+        self.pushes += 1
+        if self.pushes % self.resync_every == 0:
+            self._resync()
+
+    def _resync(self):
+        # Running sums drift after many add/remove cycles; rebuild them from the window
+        rows = self.buf[:self.count]
+        self.sum = rows.sum(axis=0)
+        self.sumsq = (rows * rows).sum(axis=0)
+        self.cross = rows.T @ rows
+
+    # --- Statistics (NaN until the window is full, like pandas min_periods) ---
+    def mean(self):
+        if not self.ready:
+            return np.full(len(self.columns), np.nan)
+        return self.sum / self.count
+
+    def std(self):
+        if not self.ready:
+            return np.full(len(self.columns), np.nan)
+        n = self.count
+        var = (self.sumsq - self.sum * self.sum / n) / (n - 1)
+        return np.sqrt(np.maximum(var, 0.0))
+
+    def sharpe(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.mean() / self.std()
+
+    def var(self):
+        # Historical VaR: the `quantile` order statistic, linearly interpolated as pandas does
+        if not self.ready:
+            return np.full(len(self.columns), np.nan)
+        h = self.quantile * (self.count - 1)
+        lo = int(np.floor(h))
+        hi = min(lo + 1, self.count - 1)
+        frac = h - lo
+        return np.array([v[lo] + (v[hi] - v[lo]) * frac for v in self.sorted])
+
+    def corr(self):
+        if not self.ready:
+            return np.full(self.cross.shape, np.nan)
+        n = self.count
+        cov = self.cross - np.outer(self.sum, self.sum) / n
+        scale = np.sqrt(np.maximum(np.diag(cov), 0.0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return cov / np.outer(scale, scale)
@@ -0,0 +1,156 @@
+
+#### shared arrays
+# One process computes the metric frames and writes them into a single file on
+# tmpfs (/dev/shm); gunicorn workers mmap that file and wrap the arrays in
+# pandas objects without copying, so N workers share one copy of the data.
+
+import os
+import json
+import glob
+import time
+import mmap
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DASHARR1"
+ALIGN = 64
+
+
+def default_root():
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "dashboard")
+
+
+# --- Bundle File ---
+def write_bundle(path, arrays, meta=None):
+    # Layout: MAGIC, 8-byte header length, JSON header, then each array at a
+    # 64-byte aligned offset so it can be viewed straight out of the mmap
+    entries, offset = {}, 0
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        entries[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += -(-arr.nbytes // ALIGN) * ALIGN
+    header = json.dumps({"arrays": entries, "meta": meta or {}}).encode()
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, arr in arrays.items():
+            f.seek(start + entries[name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+
+def open_bundle(path):
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buf[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not an array bundle")
+    size = int.from_bytes(buf[len(MAGIC):len(MAGIC) + 8], "little")
+    header = json.loads(buf[len(MAGIC) + 8:len(MAGIC) + 8 + size])
+    start = -(-(len(MAGIC) + 8 + size) // ALIGN) * ALIGN
+
+    arrays = {}
+    for name, e in header["arrays"].items():
+        count = int(np.prod(e["shape"]))
+        arrays[name] = np.frombuffer(buf, dtype=e["dtype"], count=count,
+                                     offset=start + e["offset"]).reshape(e["shape"])
+    return arrays, header["meta"]
+
+
+# --- Frames <-> Arrays ---
+def frames_to_arrays(frames):
+    arrays, layout = {}, {}
+    for name, obj in frames.items():
+        entry = {"kind": "frame" if isinstance(obj, pd.DataFrame) else "series"}
+        arrays[name] = obj.values
+        if isinstance(obj.index, pd.DatetimeIndex):
+            arrays[f"{name}.index"] = obj.index.values.astype("datetime64[ns]").astype("int64")
+        else:
+            entry["index"] = list(obj.index)
+        if entry["kind"] == "frame":
+            entry["columns"] = list(obj.columns)
+        else:
+            entry["name"] = obj.name
+        layout[name] = entry
+    return arrays, layout
+
+
+def arrays_to_frames(arrays, layout):
+    frames = {}
+    for name, entry in layout.items():
+        if f"{name}.index" in arrays:
+            index = pd.DatetimeIndex(arrays[f"{name}.index"].view("datetime64[ns]"))
+        else:
+            index = pd.Index(entry["index"])
+        if entry["kind"] == "frame":
+            frames[name] = pd.DataFrame(arrays[name], index=index, columns=entry["columns"], copy=False)
+        else:
+            frames[name] = pd.Series(arrays[name], index=index, name=entry["name"], copy=False)
+    return frames
+
+
+# --- Publish / Attach ---
+def publish(root, version, frames, keep=2):
+    os.makedirs(root, exist_ok=True)
+    arrays, layout = frames_to_arrays(frames)
+    write_bundle(os.path.join(root, f"{version}.bundle"), arrays,
+                 {"version": version, "layout": layout, "created_at": time.time()})
+
+    pointer = os.path.join(root, "current")
+    with open(f"{pointer}.tmp", "w") as f:
+        f.write(version)
+    os.replace(f"{pointer}.tmp", pointer)
+
+    # Workers still mapping an older bundle keep it alive after it is unlinked
+    bundles = sorted(glob.glob(os.path.join(root, "*.bundle")), key=os.path.getmtime)
+    for old in bundles[:-keep]:
+        os.remove(old)
+
+
+def current_version(root):
+    try:
+        with open(os.path.join(root, "current")) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        raise RuntimeError(f"No shared snapshot published in {root} yet")
+
+
+def attach(root, known_version=None):
+    # Returns (version, frames); frames is None when known_version is still current
+    version = current_version(root)
+    if version == known_version:
+        return version, None
+    arrays, meta = open_bundle(os.path.join(root, f"{version}.bundle"))
+    return version, arrays_to_frames(arrays, meta["layout"])
+
+
+def run_publisher(root, compute, interval, retry_delay=5.0):
+    # compute(known_version) -> (version, frames or None). Runs in its own process.
+    logging.basicConfig(level=logging.INFO)
+    version = None
+    while True:
+        try:
+            new_version, frames = compute(version)
+            if frames is not None:
+                publish(root, new_version, frames)
+                logger.info("Published shared snapshot %s", new_version)
+            version = new_version
+            time.sleep(interval())
+        except Exception:
+            logger.exception("Shared snapshot build failed, retrying in %.0fs", retry_delay)
+            time.sleep(retry_delay)
+
+
+if __name__ == "__main__":
+    # Publisher process: python shared_arrays.py <root>
+    import sys
+    import pipeline
+    from loader import market_hours_interval
+    pipeline.run_shared_publisher(sys.argv[1] if len(sys.argv) > 1 else default_root(), market_hours_interval)
@@ -0,0 +1,120 @@
+
+#### snapshot artifact
+# A fully computed snapshot in one file, so a deploy or a new instance can
+# serve straight away instead of re-running the fetch and every metric:
+#
+#   python snapshot_artifact.py export                  # writes snapshot.bundle
+#   python snapshot_artifact.py export -o /data/snap.bundle
+#   python snapshot_artifact.py info snapshot.bundle
+#
+# The file is a shared_arrays bundle: the metric frames the pipeline produces,
+# plus the served (downsampled) JSON of every figure as byte arrays. app.py
+# maps it at boot (snapshot_artifact / DASHBOARD_SNAPSHOT) without copying,
+# then refreshes on its usual schedule. The artifact is skipped, and the live
+# pipeline runs, when it is missing, from another format, built with a
+# different config, or older than snapshot_max_age seconds.
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import numpy as np
+from plotly.io.json import to_json_plotly
+import shared_arrays
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 1
+FIGURE_PREFIX = "figure:"
+
+# Config keys the stored frames and figures depend on. Where the prices come
+# from does not matter, so an artifact built online can serve an offline deploy.
+SNAPSHOT_KEYS = (
+    "tickers", "weights", "period", "rebalance", "rebalance_threshold", "transaction_cost", "compare_weights",
+    "optimizer_window", "optimizer_step", "frontier_points", "var_method", "var_confidence", "var_mc_paths",
+    "var_mc_step", "var_mc_df", "benchmark", "benchmark_window", "max_kpi_tickers", "max_corr_pairs",
+    "max_heatmap_tickers", "downsample_points", "downsample_method",
+)
+
+
+def config_fingerprint(config):
+    relevant = {key: config.get(key) for key in SNAPSHOT_KEYS}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def export(path, s, config):
+    # Writes snapshot s, with every figure rendered, to path (atomically)
+    import pipeline
+
+    arrays, layout = shared_arrays.frames_to_arrays({name: getattr(s, name) for name in pipeline.FRAME_NAMES})
+    for name in pipeline.figure_builders:
+        # The encoder Dash itself uses, so a stored figure is served byte for byte as a fresh one
+        raw = to_json_plotly(pipeline.series_figure(s, name)).encode()
+        arrays[FIGURE_PREFIX + name] = np.frombuffer(raw, dtype=np.uint8)
+    shared_arrays.write_bundle(path, arrays, {
+        "format": FORMAT, "version": s.version, "created_at": s.created_at, "as_of": str(s.as_of),
+        "config": config_fingerprint(config), "layout": layout,
+    })
+
+
+def load(path, config, max_age=None):
+    # The snapshot stored at path, or None when there is none or it is stale
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        arrays, meta = shared_arrays.open_bundle(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring snapshot artifact %s: %s", path, e)
+        return None
+    reason = None
+    if meta.get("format") != FORMAT:
+        reason = f"format {meta.get('format')}, expected {FORMAT}"
+    elif meta.get("config") != config_fingerprint(config):
+        reason = "built with a different config"
+    elif max_age is not None and time.time() - meta["created_at"] > max_age:
+        reason = f"older than {max_age:.0f}s"
+    if reason:
+        logger.info("Ignoring snapshot artifact %s: %s", path, reason)
+        return None
+
+    import pipeline
+
+    figures = {name[len(FIGURE_PREFIX):]: arr for name, arr in arrays.items() if name.startswith(FIGURE_PREFIX)}
+    frames = shared_arrays.arrays_to_frames(arrays, meta["layout"])
+    logger.info("Loaded snapshot %s (as of %s) from %s", meta["version"], meta["as_of"], path)
+    return pipeline.make_snapshot(meta["version"], frames, meta["created_at"], figures)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or inspect a precomputed dashboard snapshot")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export", help="run the pipeline and write the artifact")
+    export_cmd.add_argument("-o", "--output", help="artifact path (default: the configured snapshot_artifact)")
+    info_cmd = commands.add_parser("info", help="print an artifact's header")
+    info_cmd.add_argument("path")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "info":
+        arrays, meta = shared_arrays.open_bundle(args.path)
+        meta = dict(meta, layout=sorted(meta["layout"]),
+                    figures=sorted(n[len(FIGURE_PREFIX):] for n in arrays if n.startswith(FIGURE_PREFIX)))
+        print(json.dumps(meta, indent=2))
+        return 0
+
+    import pipeline
+
+    path = args.output or pipeline.config["snapshot_artifact"]
+    start = time.perf_counter()
+    s = pipeline.build_snapshot()
+    export(path, s, pipeline.config)
+    print(f"Wrote snapshot {s.version} (as of {s.as_of:%Y-%m-%d}) to {path}: "
+          f"{os.path.getsize(path) / 2**20:.1f} MB in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
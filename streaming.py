@@ -0,0 +1,159 @@
+
+#### streaming
+# Intraday mode: ticks from a pluggable feed are aggregated into fixed-width
+# OHLC bars held in a RingSeries (see ring_store.py), so memory stays flat however long the
+# process runs. The app polls it for the latest prices and for bars closed
+# since its last poll, and appends those to the chart with extendData.
+
+import csv
+import time
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from ring_store import RingSeries
+
+logger = logging.getLogger(__name__)
+
+BAR_SECONDS = {"1m": 60, "5m": 300}
+
+
+# --- Feeds ---
+# A feed is any iterable of (timestamp, ticker, price) ticks, timestamps in
+# epoch seconds and non-decreasing.
+class ReplayFeed:
+    # Replays a CSV of timestamp,ticker,price rows (timestamps as epoch seconds
+    # or anything pandas parses). speed=60 plays one minute of ticks per second;
+    # speed=0 replays as fast as possible.
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+
+    def __iter__(self):
+        previous = None
+        with open(self.path, newline="") as f:
+            for row in csv.DictReader(f):
+                ts = parse_timestamp(row["timestamp"])
+                if previous is not None and self.speed > 0 and ts > previous:
+                    time.sleep((ts - previous) / self.speed)
+                previous = ts
+                yield ts, row["ticker"], float(row["price"])
+
+
+def parse_timestamp(value):
+    try:
+        return float(value)
+    except ValueError:
+        return pd.Timestamp(value).timestamp()
+
+
+# --- Bars ---
+class BarAggregator:
+    def __init__(self, tickers, bar_seconds=60, capacity=1440):
+        n = len(tickers)
+        self.tickers = list(tickers)
+        self.column = {t: i for i, t in enumerate(tickers)}
+        self.bar_seconds = bar_seconds
+        # Closed bars, stamped with their start time (ns)
+        self.ring = RingSeries(tickers, capacity, fields=("open", "high", "low", "close"))
+        # The bar still forming
+        self.current_start = None
+        self.current = np.full((4, n), np.nan)
+        self.last_price = np.full(n, np.nan)
+        self.last_tick = None
+        self.dropped = 0
+
+    @property
+    def capacity(self):
+        return self.ring.capacity
+
+    @property
+    def closed(self):
+        return self.ring.total
+
+    def push(self, ts, ticker, price):
+        i = self.column.get(ticker)
+        if i is None or not np.isfinite(price):
+            return
+        start = int(ts // self.bar_seconds * self.bar_seconds)
+        if self.current_start is None:
+            self.current_start = start
+        elif start > self.current_start:
+            self.close_bar()
+            self.current_start = start
+        elif start < self.current_start:
+            self.dropped += 1  # late tick for a bar already closed
+            return
+
+        o, h, l, c = self.current
+        if np.isnan(o[i]):
+            o[i] = h[i] = l[i] = price
+        else:
+            h[i] = max(h[i], price)
+            l[i] = min(l[i], price)
+        c[i] = price
+        self.last_price[i] = price
+        self.last_tick = ts
+
+    def close_bar(self):
+        if self.current_start is None:
+            return
+        o, h, l, c = self.current
+        # Tickers without a tick in this bar carry their last price flat
+        quiet = np.isnan(c)
+        for field in (o, h, l, c):
+            field[quiet] = self.last_price[quiet]
+        self.ring.append(self.current_start * 10**9, open=o, high=h, low=l, close=c)
+        self.current = np.full(self.current.shape, np.nan)
+        self.current_start = None
+
+    def bars_since(self, cursor):
+        # (starts, closes, new cursor) for bars closed after `cursor`; a cursor
+        # older than the ring (or None) gets everything still held
+        starts, closes = self.ring.since(cursor)
+        return starts, closes, self.ring.total
+
+
+class StreamEngine:
+    # Consumes a feed on a background thread; readers take the lock briefly
+    def __init__(self, feed, tickers, bar="1m", capacity=1440):
+        self.feed = feed
+        self.bars = BarAggregator(tickers, BAR_SECONDS[bar], capacity)
+        self.finished = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="dashboard-stream", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for ts, ticker, price in self.feed:
+                with self._lock:
+                    self.bars.push(ts, ticker, price)
+        except Exception:
+            logger.exception("Tick feed stopped")
+        with self._lock:
+            self.bars.close_bar()
+            self.finished = True
+
+    def latest_prices(self):
+        with self._lock:
+            return dict(zip(self.bars.tickers, self.bars.last_price.tolist()))
+
+    def poll(self, cursor):
+        # Bars closed since `cursor` (times, closes of shape (bars, tickers)) and the new cursor
+        with self._lock:
+            starts, closes, cursor = self.bars.bars_since(cursor)
+            return pd.to_datetime(starts), closes.copy(), cursor
+
+
+def stream_from_config(stream, tickers):
+    # stream: None, or {"replay": path, "bar": "1m" | "5m", "speed": float}
+    if not stream:
+        return None
+    feed = ReplayFeed(stream["replay"], float(stream.get("speed", 1.0)))
+    return StreamEngine(feed, tickers, stream.get("bar", "1m"), int(stream.get("capacity", 1440)))
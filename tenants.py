@@ -0,0 +1,235 @@
+
+#### tenants
+# Named portfolios over the shared ticker universe, so each user or team can
+# view their own weights. Definitions live in one JSON file shared by all
+# workers; each view of a snapshot is derived by pipeline.portfolio_snapshot
+# (only the portfolio series are recomputed) and kept in a bounded LRU/TTL
+# cache keyed by (portfolio, data version, definition revision).
+#
+# The "default" portfolio is the configured one and is never stored: it is
+# the shared snapshot itself. Writes need the portfolios_token as a bearer
+# token; without one configured the API is read-only.
+
+import os
+import hmac
+import json
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from flask import jsonify, request
+from config import normalise_weights
+from portfolio import SCHEDULES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ID = "default"
+FIELDS = ("name", "weights", "rebalance", "rebalance_threshold", "transaction_cost")
+# Seconds between checks of the file for another worker's changes
+RELOAD_EVERY = 2.0
+
+
+class PortfolioStore:
+    # {id: {"name", "weights", "rebalance", "rebalance_threshold", "transaction_cost"}}.
+    # The file is re-read, at most every RELOAD_EVERY seconds, when another
+    # worker has changed it.
+    def __init__(self, path, tickers, defaults):
+        self.path = path
+        self.tickers = tickers
+        self.defaults = defaults
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked = None
+        self._definitions = {}
+        self._invalid = {}    # raw entries that failed validation, kept in the file as they are
+
+    def _reload(self, force=False):
+        now = time.monotonic()
+        if not force and self._checked is not None and now - self._checked < RELOAD_EVERY:
+            return
+        self._checked = now
+        mtime = os.path.getmtime(self.path) if self.path and os.path.exists(self.path) else None
+        if mtime != self._mtime:
+            raw = {}
+            if mtime is not None:
+                with open(self.path) as f:
+                    raw = json.load(f)
+            # One bad entry (e.g. weights for an older universe) only hides that portfolio
+            definitions, invalid = {}, {}
+            for pid, d in raw.items():
+                try:
+                    definitions[pid] = self.validate(d)
+                except (ValueError, TypeError) as e:
+                    logger.warning("Skipping portfolio %r in %s: %s", pid, self.path, e)
+                    invalid[pid] = d
+            self._definitions, self._invalid = definitions, invalid
+            self._mtime = mtime
+
+    def validate(self, definition):
+        # Fills in the defaults and normalises the weights; raises ValueError when invalid
+        if not isinstance(definition, dict):
+            raise ValueError("A portfolio definition must be a JSON object")
+        definition = {k: v for k, v in definition.items() if k != "revision"}
+        unknown = set(definition) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown portfolio fields {sorted(unknown)}, expected {list(FIELDS)}")
+        d = dict(self.defaults, **definition)
+        if d["rebalance"] not in SCHEDULES:
+            raise ValueError(f"Unknown rebalance schedule {d['rebalance']!r}, expected one of {SCHEDULES}")
+        d["rebalance_threshold"] = number(d, "rebalance_threshold", 0.0, 1.0, low_open=True)
+        d["transaction_cost"] = number(d, "transaction_cost", 0.0, 1.0, high_open=True)
+        d["weights"] = normalise_weights(self.tickers, d["weights"])
+        d["name"] = str(d["name"])
+        # A content hash, so every worker agrees on the revision of a definition
+        d["revision"] = hashlib.sha1(json.dumps(d, sort_keys=True).encode()).hexdigest()[:10]
+        return d
+
+    def all(self):
+        with self._lock:
+            self._reload()
+            return dict(self._definitions)
+
+    def get(self, portfolio_id):
+        return self.all().get(portfolio_id)
+
+    def put(self, portfolio_id, definition):
+        if portfolio_id == DEFAULT_ID:
+            raise ValueError("The default portfolio comes from the dashboard config")
+        definition = self.validate(definition)
+        with self._lock:
+            self._reload(force=True)
+            self._definitions[portfolio_id] = definition
+            self._invalid.pop(portfolio_id, None)
+            self._save()
+        return definition
+
+    def delete(self, portfolio_id):
+        with self._lock:
+            self._reload(force=True)
+            found = self._definitions.pop(portfolio_id, None) is not None
+            found = self._invalid.pop(portfolio_id, None) is not None or found
+            if found:
+                self._save()
+        return found
+
+    def _save(self):
+        if not self.path:
+            return
+        raw = dict(self._invalid)
+        raw.update({pid: {k: v for k, v in d.items() if k != "revision"} for pid, d in self._definitions.items()})
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(raw, f, indent=2)
+        os.replace(tmp, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+
+def number(d, key, low, high, low_open=False, high_open=False):
+    # d[key] as a float within low..high (bounds excluded where open); ValueError otherwise
+    value = d[key]
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{key} must be a number, got {value!r}")
+    if value < low or value > high or (low_open and value == low) or (high_open and value == high):
+        raise ValueError(f"{key} must be within {'(' if low_open else '['}{low}, {high}{')' if high_open else ']'}, "
+                         f"got {value}")
+    return float(value)
+
+
+class TTLCache:
+    # Bounded LRU whose entries also expire `ttl` seconds after they were
+    # built. Concurrent requests for one missing key share a single build.
+    def __init__(self, max_entries=32, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()   # key -> (expires, value)
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._building = {}
+
+    def get(self, key, build):
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                building = self._building.setdefault(key, threading.Lock())
+        if value is not None:
+            return value[0]
+        with building:
+            with self._lock:
+                value = self._lookup(key)
+                if value is not None:
+                    return value[0]
+                self.misses += 1
+            try:
+                value = build()
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+            with self._lock:
+                self.entries[key] = (time.monotonic() + self.ttl, value)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            return value
+
+    def _lookup(self, key):
+        # (value,) on a live hit, else None; caller holds the lock
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return (entry[1],)
+
+
+# --- Views ---
+def make_views(store, cache, derive):
+    # derive(snapshot, portfolio_id, definition) -> portfolio view of the snapshot
+    def view(s, portfolio_id):
+        if s is None or not portfolio_id or portfolio_id == DEFAULT_ID:
+            return s
+        definition = store.get(portfolio_id)
+        if definition is None:
+            return s
+        return cache.get((portfolio_id, s.version, definition["revision"]),
+                         lambda: derive(s, portfolio_id, definition))
+    return view
+
+
+def options(store):
+    # Dropdown options, the configured portfolio first
+    return [{"label": "Default", "value": DEFAULT_ID}] + [
+        {"label": d["name"], "value": pid} for pid, d in sorted(store.all().items())
+    ]
+
+
+# --- API ---
+def install(server, store, token=None, path="/api/portfolios"):
+    # GET lists the definitions; PUT <id> with a JSON definition creates or
+    # replaces one ({"name": ..., "weights": {ticker: weight} or a list}); DELETE
+    # removes it. Writes need "Authorization: Bearer <token>", and are refused
+    # when no token is configured
+    @server.route(path, methods=["GET"])
+    def list_portfolios():
+        return jsonify(store.all())
+
+    @server.route(f"{path}/<portfolio_id>", methods=["GET", "PUT", "DELETE"])
+    def portfolio(portfolio_id):
+        if request.method in ("PUT", "DELETE"):
+            if not token:
+                return jsonify({"error": "portfolio writes are disabled: set portfolios_token"}), 403
+            given = request.headers.get("Authorization", "")
+            if not hmac.compare_digest(given.encode(), f"Bearer {token}".encode()):
+                return jsonify({"error": "unauthorized"}), 401
+        if request.method == "PUT":
+            try:
+                return jsonify(store.put(portfolio_id, request.get_json(force=True) or {}))
+            except (ValueError, TypeError) as e:
+                return jsonify({"error": str(e)}), 400
+        if request.method == "DELETE":
+            return ("", 204) if store.delete(portfolio_id) else (jsonify({"error": "not found"}), 404)
+        definition = store.get(portfolio_id)
+        return jsonify(definition) if definition else (jsonify({"error": "not found"}), 404)
@@ -0,0 +1,82 @@
+#### rolling refresh
+# A refresh that drops head rows and adds new bars must give the same rolling
+# frames and VaR as a full recompute. Dropping head rows moves the portfolio
+# NAV's first rebalance segment, so its early returns change too.
+
+import os
+import sys
+
+os.environ.update(DASHBOARD_TICKERS="S0,S1,S2,S3,S4", DASHBOARD_DATA_SOURCE="offline",
+                  DASHBOARD_BENCHMARK="", DASHBOARD_SNAPSHOT="", DASHBOARD_CALLBACK_CACHE_DIR="")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline
+from portfolio import portfolio_nav
+
+
+def nav_returns(returns):
+    # The portfolio as the pipeline builds it: NAV from the first row, rebalanced monthly
+    nav = portfolio_nav(returns, pipeline.weights, "monthly")["nav"][:, 0]
+    return pd.Series(nav / np.concatenate([[1.0], nav[:-1]]) - 1, index=returns.index)
+
+
+@pytest.fixture
+def history():
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range("2020-01-01", periods=400)
+    return pd.DataFrame(rng.standard_normal((400, 5)) * 0.01, index=index, columns=pipeline.tickers)
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    pipeline._rolling_state = pipeline._var_state = None
+    yield
+    pipeline._rolling_state = pipeline._var_state = None
+
+
+def refresh(returns):
+    portfolio_returns = nav_returns(returns)
+    frames = pipeline.compute_rolling_metrics(returns, portfolio_returns)
+    return frames, pipeline.update_var(returns, portfolio_returns, frames[2])
+
+
+def assert_same(got, expected):
+    for a, b in zip(got, expected):
+        pd.testing.assert_frame_equal(a, b, check_exact=False, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("method", ["historical", "gaussian"])
+@pytest.mark.parametrize("dropped, added", [(0, 3), (2, 3), (5, 0), (40, 1)])
+def test_refresh_matches_full_compute(history, monkeypatch, method, dropped, added):
+    monkeypatch.setitem(pipeline.config, "var_method", method)
+    refresh(history.iloc[:len(history) - added])
+    returns = history.iloc[dropped:]
+    assert pipeline._carried_rows(pipeline._rolling_state["matrix"],
+                                  returns.assign(Portfolio=nav_returns(returns))) is not None
+
+    frames, var = refresh(returns)
+    # The pairs are kept from the first run, so compare with them
+    pairs = pipeline._rolling_state["pairs"]
+    assert_same(frames, pipeline._full_rolling(returns.assign(Portfolio=nav_returns(returns)), pairs))
+
+    pipeline._rolling_state = pipeline._var_state = None
+    full_frames, full_var = refresh(returns)
+    assert_same(frames[:3], full_frames[:3])
+    assert_same(var, full_var)
+
+
+def test_changed_last_window_falls_back_to_full_pass(history):
+    refresh(history)
+    revised = history.copy()
+    revised.iloc[-5, 0] += 0.01
+    assert pipeline._carried_rows(pipeline._rolling_state["matrix"],
+                                  revised.assign(Portfolio=nav_returns(revised))) is None
+    frames, var = refresh(revised)
+    pipeline._rolling_state = pipeline._var_state = None
+    full_frames, full_var = refresh(revised)
+    assert_same(frames, full_frames)
+    assert_same(var, full_var)